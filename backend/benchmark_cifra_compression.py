@@ -0,0 +1,63 @@
+import sys
+import time
+
+from app import app, db
+from musica.musica_model.cifra_dictionary import CIFRA_DICTIONARIES, CIFRA_DICTIONARY_ID
+from musica.musica_model.musica_model import Musica
+from sqlalchemy import func
+from utils.compressed_text.compressed_text import encode_text, decode_text, zstandard
+
+# Tamanhos de resposta usados para estimar o custo de descompressão por requisição
+REQUEST_SIZES = [('lista com cifra (10)', 10), ('potpourri (50)', 50)]
+
+
+def _configs():
+    dictionary = CIFRA_DICTIONARIES[CIFRA_DICTIONARY_ID]
+    configs = [
+        ('none', 'none', b'', 0),
+        ('zlib', 'zlib', b'', 0),
+        (f'zlib + dicionário {CIFRA_DICTIONARY_ID}', 'zlib', dictionary, CIFRA_DICTIONARY_ID),
+    ]
+    if zstandard is not None:
+        configs.append(('zstd', 'zstd', b'', 0))
+        configs.append((f'zstd + dicionário {CIFRA_DICTIONARY_ID}', 'zstd', dictionary, CIFRA_DICTIONARY_ID))
+    return configs
+
+
+def benchmark(cifras):
+    bytes_originais = sum(len(cifra.encode('utf-8')) for cifra in cifras)
+    print(f"{len(cifras)} cifras, {bytes_originais / 1024:.1f} KiB em texto\n")
+
+    for nome, codec, dictionary, dictionary_id in _configs():
+        inicio = time.perf_counter()
+        valores = [encode_text(cifra, codec, None, dictionary, dictionary_id) for cifra in cifras]
+        encode_us = (time.perf_counter() - inicio) * 1e6 / len(cifras)
+
+        inicio = time.perf_counter()
+        for valor in valores:
+            decode_text(valor, CIFRA_DICTIONARIES)
+        decode_us = (time.perf_counter() - inicio) * 1e6 / len(cifras)
+
+        gravados = sum(len(valor) for valor in valores)
+        economia = 100 * (1 - gravados / bytes_originais) if bytes_originais else 0
+        por_requisicao = ', '.join(f"{rotulo}: {decode_us * n / 1000:.2f} ms" for rotulo, n in REQUEST_SIZES)
+        print(f"[{nome}] {gravados / 1024:.1f} KiB ({economia:.1f}% menor)")
+        print(f"    compressão {encode_us:.1f} µs/cifra, descompressão {decode_us:.1f} µs/cifra")
+        print(f"    descompressão por requisição: {por_requisicao}\n")
+
+
+# Mede, com as cifras do banco, quanto cada codec economiza e quanto custa descomprimir
+if __name__ == '__main__':
+    limite = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with app.app_context():
+        cifras = [
+            cifra for (cifra,) in db.session.query(Musica.cifra).filter(
+                Musica.cifra.isnot(None)
+            ).order_by(Musica.id).limit(limite)
+        ]
+        if not cifras:
+            raise SystemExit("Nenhuma cifra cadastrada para medir")
+
+        armazenado = db.session.query(func.sum(func.length(Musica.cifra))).scalar() or 0
+        print(f"Tamanho atual da coluna musicas.cifra: {armazenado / 1024:.1f} KiB\n")
+        benchmark(cifras)
@@ -0,0 +1,40 @@
+import io
+from flask import Blueprint, jsonify, request
+from catalog.catalog_services.catalog_services import CatalogService
+from utils.json_provider.json_provider import stream_ndjson
+
+catalog_bp = Blueprint('catalog_bp', __name__)
+
+
+@catalog_bp.route('/export', methods=['GET'])
+def export_catalog():
+    """Stream the whole catalog (musicas, potpourri and relations) as NDJSON"""
+    try:
+        return stream_ndjson(CatalogService.iter_export_records(), 'catalogo.ndjson')
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
+@catalog_bp.route('/import', methods=['POST'])
+def import_catalog():
+    """Import an NDJSON catalog produced by /api/export, reading the body line by line
+
+    With ?indexar_cifras=false the content index is skipped (rebuild it later with reindex_cifras.py).
+    """
+    try:
+        if not request.content_length and not request.headers.get('Transfer-Encoding'):
+            return jsonify({'message': 'Dados não fornecidos'}), 400
+
+        indexar_cifras = request.args.get('indexar_cifras', 'true').lower() == 'true'
+        # Sem buffer, ler o stream linha a linha faria uma chamada de leitura por byte
+        totais = CatalogService.import_catalog(
+            io.BufferedReader(request.stream, 1024 * 1024), indexar_cifras=indexar_cifras
+        )
+        return jsonify({
+            'message': 'Catálogo importado com sucesso',
+            **totais
+        }), 201
+
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
@@ -0,0 +1,244 @@
+from app import db
+from musica.musica_model.musica_model import Musica
+from potpourri.potpourri_model.potpourri_model import Potpourri
+from musicas_potpourri.musicas_potpourri_model.musicas_potpourri_model import MusicasPotpourri, POTPOURRI_ORDER_GAP
+from musica.musica_services.musica_services import STREAM_YIELD_PER
+from cifra_index.cifra_index_services.cifra_index_services import CifraIndexService
+from musica.musica_services.cifra_parser.cifra_parser import structure_cifra
+from suggest.suggest_services.suggest_services import SuggestService
+from sqlalchemy import insert, select, func
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+import json
+import os
+
+# Registros acumulados antes de cada INSERT em lote da importação
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '1000'))
+
+CATALOG_FORMAT_VERSION = 1
+
+TIPO_CATALOGO = 'catalogo'
+TIPO_MUSICA = 'musica'
+TIPO_POTPOURRI = 'potpourri'
+TIPO_MUSICA_POTPOURRI = 'musica_potpourri'
+
+MUSICA_COLUMNS = (
+    'id', 'nome', 'artista', 'link_musica', 'cifra', 'cifra_hash', 'velocidade_rolamento', 'created_at', 'updated_at'
+)
+POTPOURRI_COLUMNS = ('id', 'nome_potpourri', 'created_at', 'updated_at')
+# ordem_tocagem não é coluna: sai como a posição (1..n) da relação no potpourri
+MUSICA_POTPOURRI_COLUMNS = ('potpourri_id', 'musica_id', 'created_at', 'updated_at')
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class _CatalogImport:
+    """Estado de uma importação: lotes pendentes e o mapa de ids do arquivo para ids do banco"""
+
+    def __init__(self, chunk_size: int, indexar_cifras: bool):
+        self.chunk_size = chunk_size
+        self.indexar_cifras = indexar_cifras
+        self.musicas: List[Dict[str, Any]] = []
+        self.potpourris: List[Dict[str, Any]] = []
+        self.relacoes: List[Dict[str, Any]] = []
+        self.musica_ids: Dict[int, int] = {}
+        self.potpourri_ids: Dict[int, int] = {}
+        self.totais = {
+            'musicas_criadas': 0,
+            'musicas_existentes': 0,
+            'potpourris_criados': 0,
+            'relacoes_criadas': 0
+        }
+
+    def add(self, numero_linha: int, record: Dict[str, Any]) -> None:
+        tipo = record.get('tipo')
+        if tipo == TIPO_CATALOGO:
+            if record.get('versao') != CATALOG_FORMAT_VERSION:
+                raise Exception(f"Linha {numero_linha}: versão do catálogo não suportada: {record.get('versao')}")
+        elif tipo == TIPO_MUSICA:
+            if not record.get('link_musica') or record.get('id') is None:
+                raise Exception(f"Linha {numero_linha}: música sem id ou link_musica")
+            self.musicas.append(record)
+            if len(self.musicas) >= self.chunk_size:
+                self.flush_musicas()
+        elif tipo == TIPO_POTPOURRI:
+            if not record.get('nome_potpourri') or record.get('id') is None:
+                raise Exception(f"Linha {numero_linha}: potpourri sem id ou nome_potpourri")
+            self.potpourris.append(record)
+            if len(self.potpourris) >= self.chunk_size:
+                self.flush_potpourris()
+        elif tipo == TIPO_MUSICA_POTPOURRI:
+            if None in (record.get('potpourri_id'), record.get('musica_id'), record.get('ordem_tocagem')):
+                raise Exception(f"Linha {numero_linha}: relação sem potpourri_id, musica_id ou ordem_tocagem")
+            record['linha'] = numero_linha
+            self.relacoes.append(record)
+            if len(self.relacoes) >= self.chunk_size:
+                self.flush_relacoes()
+        else:
+            raise Exception(f"Linha {numero_linha}: tipo de registro desconhecido: {tipo}")
+
+    def flush_musicas(self) -> None:
+        if not self.musicas:
+            return
+        lote, self.musicas = self.musicas, []
+
+        # Links já cadastrados reaproveitam a música existente em vez de duplicá-la
+        links = {record['link_musica'] for record in lote}
+        existentes = dict(db.session.execute(
+            select(Musica.link_musica, Musica.id).where(Musica.link_musica.in_(links))
+        ).all())
+
+        novas: Dict[str, Dict[str, Any]] = {}
+        for record in lote:
+            if record['link_musica'] in existentes:
+                self.musica_ids[record['id']] = existentes[record['link_musica']]
+                self.totais['musicas_existentes'] += 1
+            elif record['link_musica'] not in novas:
+                novas[record['link_musica']] = {
+                    'nome': record.get('nome'),
+                    'artista': record.get('artista'),
+                    'link_musica': record['link_musica'],
+                    'cifra': record.get('cifra'),
+                    'cifra_hash': record.get('cifra_hash'),
+                    # Derivada da cifra: recalculada aqui em vez de viajar no arquivo
+                    'cifra_estruturada': structure_cifra(record.get('cifra')),
+                    'velocidade_rolamento': record.get('velocidade_rolamento', 1.0),
+                    'created_at': _parse_datetime(record.get('created_at')) or datetime.utcnow(),
+                    'updated_at': _parse_datetime(record.get('updated_at')) or datetime.utcnow()
+                }
+        if novas:
+            # link_musica é único: mapeia pelo link, sem depender da ordem do RETURNING
+            ids_por_link = dict(db.session.execute(
+                insert(Musica).returning(Musica.link_musica, Musica.id), list(novas.values())
+            ).all())
+            if self.indexar_cifras:
+                CifraIndexService.index_new_musicas(
+                    [(ids_por_link[link], row['cifra']) for link, row in novas.items()]
+                )
+            self.totais['musicas_criadas'] += len(novas)
+        else:
+            ids_por_link = {}
+
+        for record in lote:
+            if record['link_musica'] in ids_por_link:
+                self.musica_ids[record['id']] = ids_por_link[record['link_musica']]
+
+    def flush_potpourris(self) -> None:
+        if not self.potpourris:
+            return
+        lote, self.potpourris = self.potpourris, []
+
+        # Sem chave natural: os ids novos precisam voltar na ordem dos parâmetros
+        novos_ids = db.session.scalars(
+            insert(Potpourri).returning(Potpourri.id, sort_by_parameter_order=True),
+            [
+                {
+                    'nome_potpourri': record['nome_potpourri'],
+                    'created_at': _parse_datetime(record.get('created_at')) or datetime.utcnow(),
+                    'updated_at': _parse_datetime(record.get('updated_at')) or datetime.utcnow()
+                }
+                for record in lote
+            ]
+        ).all()
+        for record, novo_id in zip(lote, novos_ids):
+            self.potpourri_ids[record['id']] = novo_id
+        self.totais['potpourris_criados'] += len(lote)
+
+    def flush_relacoes(self) -> None:
+        if not self.relacoes:
+            return
+        # As relações podem apontar para músicas e potpourris ainda nos lotes pendentes
+        self.flush_musicas()
+        self.flush_potpourris()
+        lote, self.relacoes = self.relacoes, []
+
+        rows = []
+        for record in lote:
+            if record['musica_id'] not in self.musica_ids:
+                raise Exception(f"Linha {record['linha']}: música {record['musica_id']} ausente no arquivo")
+            if record['potpourri_id'] not in self.potpourri_ids:
+                raise Exception(f"Linha {record['linha']}: potpourri {record['potpourri_id']} ausente no arquivo")
+            rows.append({
+                'potpourri_id': self.potpourri_ids[record['potpourri_id']],
+                'musica_id': self.musica_ids[record['musica_id']],
+                'chave_ordem': record['ordem_tocagem'] * POTPOURRI_ORDER_GAP,
+                'created_at': _parse_datetime(record.get('created_at')) or datetime.utcnow(),
+                'updated_at': _parse_datetime(record.get('updated_at')) or datetime.utcnow()
+            })
+        db.session.execute(insert(MusicasPotpourri), rows)
+        self.totais['relacoes_criadas'] += len(rows)
+
+    def finish(self) -> None:
+        self.flush_musicas()
+        self.flush_potpourris()
+        self.flush_relacoes()
+
+
+class CatalogService:
+
+    @staticmethod
+    def _iter_rows(tipo: str, columns: Iterable[Any], order_by: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+        # Só colunas (sem objetos ORM), lidas do cursor do servidor em lotes de STREAM_YIELD_PER
+        result = db.session.execute(
+            select(*columns).order_by(*order_by).execution_options(yield_per=STREAM_YIELD_PER)
+        )
+        for row in result.mappings():
+            yield {'tipo': tipo, **row}
+
+    @staticmethod
+    def iter_export_records() -> Iterator[Dict[str, Any]]:
+        """Every musica, potpourri and musicas_potpourri row, in the order the import expects"""
+        yield {'tipo': TIPO_CATALOGO, 'versao': CATALOG_FORMAT_VERSION, 'exportado_em': datetime.utcnow()}
+        yield from CatalogService._iter_rows(
+            TIPO_MUSICA, [getattr(Musica, column) for column in MUSICA_COLUMNS], [Musica.id]
+        )
+        yield from CatalogService._iter_rows(
+            TIPO_POTPOURRI, [getattr(Potpourri, column) for column in POTPOURRI_COLUMNS], [Potpourri.id]
+        )
+        posicao = func.row_number().over(
+            partition_by=MusicasPotpourri.potpourri_id,
+            order_by=(MusicasPotpourri.chave_ordem, MusicasPotpourri.id)
+        ).label('ordem_tocagem')
+        yield from CatalogService._iter_rows(
+            TIPO_MUSICA_POTPOURRI,
+            [getattr(MusicasPotpourri, column) for column in MUSICA_POTPOURRI_COLUMNS] + [posicao],
+            [MusicasPotpourri.potpourri_id, MusicasPotpourri.chave_ordem, MusicasPotpourri.id]
+        )
+
+    @staticmethod
+    def import_catalog(
+        lines: Iterable[bytes],
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        indexar_cifras: bool = True
+    ) -> Dict[str, int]:
+        """Import an NDJSON export in chunked bulk INSERTs, remapping ids, inside one transaction
+
+        Musicas whose link_musica already exists are reused instead of duplicated. The cifra
+        content index is most of the import cost; indexar_cifras=False leaves it for reindex_all.
+        """
+        importacao = _CatalogImport(chunk_size, indexar_cifras)
+        try:
+            for numero_linha, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    raise Exception(f"Linha {numero_linha}: JSON inválido")
+                if not isinstance(record, dict):
+                    raise Exception(f"Linha {numero_linha}: cada linha deve ser um objeto")
+                importacao.add(numero_linha, record)
+            importacao.finish()
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Erro ao importar catálogo: {str(e)}")
+        except Exception:
+            db.session.rollback()
+            raise
+
+        SuggestService.on_catalog_imported()
+        return importacao.totais
@@ -0,0 +1,40 @@
+from app import app, db
+from sqlalchemy import text
+
+# Consultas quentes e o índice que cada uma deve usar após as migrações
+HOT_QUERIES = [
+    ('_validate_exists_music_in_app', 'ix_musicas_link_musica',
+     "SELECT id FROM musicas WHERE link_musica = 'https://www.cifraclub.com.br/x/y/' LIMIT 1"),
+    ('get_musicas_by_potpourri_id', 'ix_musicas_potpourri_potpourri_id_chave',
+     "SELECT * FROM musicas_potpourri WHERE potpourri_id = 1 ORDER BY chave_ordem, id LIMIT 50"),
+    ('relações por música', 'ix_musicas_potpourri_musica_id',
+     "SELECT id FROM musicas_potpourri WHERE musica_id = 1"),
+    ('get_all_musicas', 'ix_musicas_updated_at_id',
+     "SELECT id FROM musicas ORDER BY updated_at DESC, id DESC LIMIT 10"),
+    ('get_all_potpourri', 'ix_potpourri_updated_at_id',
+     "SELECT id FROM potpourri ORDER BY updated_at DESC, id DESC LIMIT 10"),
+]
+
+
+def explain(sql):
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return '\n'.join(str(row[-1]) for row in rows)
+    if db.engine.dialect.name == 'postgresql':
+        # Tabelas pequenas levam o planner a preferir seq scan; desliga para ver se o índice é elegível
+        db.session.execute(text("SET LOCAL enable_seqscan = off"))
+    rows = db.session.execute(text(f"EXPLAIN {sql}")).all()
+    return '\n'.join(str(row[0]) for row in rows)
+
+
+# Mostra o plano de cada consulta quente e se o índice esperado está sendo usado
+if __name__ == '__main__':
+    falhas = 0
+    with app.app_context():
+        for nome, indice, sql in HOT_QUERIES:
+            plano = explain(sql)
+            ok = indice in plano
+            falhas += 0 if ok else 1
+            print(f"[{'OK' if ok else 'SEM ÍNDICE'}] {nome} ({indice})\n{plano}\n")
+        db.session.rollback()
+    raise SystemExit(1 if falhas else 0)
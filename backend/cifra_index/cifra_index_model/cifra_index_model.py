@@ -0,0 +1,22 @@
+from app import db
+
+class CifraIndexTerm(db.Model):
+    __tablename__ = 'cifra_index_terms'
+    __table_args__ = (
+        db.Index('ix_cifra_index_terms_tipo_termo', 'tipo', 'termo'),
+    )
+
+    TIPO_LETRA = 'letra'
+    TIPO_ACORDE = 'acorde'
+    TIPO_PROGRESSAO = 'progressao'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    musica_id = db.Column(db.Integer, db.ForeignKey('musicas.id', ondelete='CASCADE'), nullable=False, index=True)
+    tipo = db.Column(db.String(12), nullable=False)
+    termo = db.Column(db.String(100), nullable=False)
+    posicao = db.Column(db.Integer, nullable=False)  # posição na sequência de palavras ou de acordes
+    linha = db.Column(db.Integer, nullable=False)
+    coluna = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<CifraIndexTerm {self.tipo}:{self.termo} musica_id={self.musica_id}>'
@@ -0,0 +1,230 @@
+import os
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Tuple
+
+from app import db
+from cifra_index.cifra_index_model.cifra_index_model import CifraIndexTerm
+from musica.musica_model.musica_model import Musica
+from musica.musica_services.cifra_parser.cifra_parser import (
+    parse_lines, normalize_chord, normalize_word, is_chord, LINE_CHORDS, LINE_LYRICS, WORD_RE
+)
+from sqlalchemy import insert, delete, func, exists
+from sqlalchemy.orm import undefer, aliased
+from sqlalchemy.exc import SQLAlchemyError
+
+# Máximo de candidatas consideradas por busca; acima disso o total informado é uma estimativa
+CIFRA_SEARCH_MAX_CANDIDATES = int(os.getenv('CIFRA_SEARCH_MAX_CANDIDATES', '1000'))
+# Teto do lote de candidatas cujas posições são carregadas e conferidas por vez
+CIFRA_SEARCH_BATCH_SIZE = int(os.getenv('CIFRA_SEARCH_BATCH_SIZE', '1000'))
+MAX_HITS_PER_MUSICA = 20
+
+
+class CifraIndexService:
+
+    @staticmethod
+    def build_terms(musica_id: int, cifra: str) -> List[Dict[str, Any]]:
+        """Extract the lyric tokens and chord n-grams (unigrams and bigrams) of a cifra"""
+        rows: List[Dict[str, Any]] = []
+        posicao_palavra = 0
+        acordes: List[Tuple[str, int, int]] = []
+
+        for linha, kind, _, tokens in parse_lines(cifra):
+            if kind == LINE_LYRICS:
+                for palavra, coluna in tokens:
+                    rows.append({
+                        'musica_id': musica_id, 'tipo': CifraIndexTerm.TIPO_LETRA,
+                        'termo': normalize_word(palavra)[:100], 'posicao': posicao_palavra,
+                        'linha': linha, 'coluna': coluna
+                    })
+                    posicao_palavra += 1
+            elif kind == LINE_CHORDS:
+                acordes.extend((normalize_chord(acorde), linha, coluna) for acorde, coluna in tokens)
+
+        for posicao, (acorde, linha, coluna) in enumerate(acordes):
+            rows.append({
+                'musica_id': musica_id, 'tipo': CifraIndexTerm.TIPO_ACORDE,
+                'termo': acorde[:100], 'posicao': posicao, 'linha': linha, 'coluna': coluna
+            })
+            if posicao + 1 < len(acordes):
+                rows.append({
+                    'musica_id': musica_id, 'tipo': CifraIndexTerm.TIPO_PROGRESSAO,
+                    'termo': f'{acorde} {acordes[posicao + 1][0]}'[:100], 'posicao': posicao,
+                    'linha': linha, 'coluna': coluna
+                })
+        return rows
+
+    @staticmethod
+    def index_musica(musica: Musica) -> None:
+        """(Re)index a musica inside the caller's transaction; the caller commits"""
+        CifraIndexService.reindex_cifra(musica.id, musica.cifra)
+
+    @staticmethod
+    def reindex_cifra(musica_id: int, cifra: Optional[str]) -> None:
+        """Replace the terms of one musica, for writers that update the row without loading it"""
+        db.session.execute(delete(CifraIndexTerm).where(CifraIndexTerm.musica_id == musica_id))
+        rows = CifraIndexService.build_terms(musica_id, cifra)
+        if rows:
+            db.session.execute(insert(CifraIndexTerm), rows)
+
+    @staticmethod
+    def index_new_musicas(musicas: List[Tuple[int, Optional[str]]]) -> None:
+        """Index freshly inserted (musica_id, cifra) pairs with one bulk INSERT; the caller commits"""
+        rows = [row for musica_id, cifra in musicas for row in CifraIndexService.build_terms(musica_id, cifra)]
+        if rows:
+            # INSERT do Core direto na tabela: sem a etapa de bulk do ORM, que pesa com milhões de termos
+            db.session.execute(insert(CifraIndexTerm.__table__), rows)
+
+    @staticmethod
+    def _query_terms(search_term: str) -> Tuple[str, List[str]]:
+        """Decide se a busca é por progressão de acordes ou por trecho da letra"""
+        tokens = search_term.split()
+        if tokens and all(is_chord(t) for t in tokens):
+            acordes = [normalize_chord(t) for t in tokens]
+            if len(acordes) == 1:
+                return CifraIndexTerm.TIPO_ACORDE, acordes
+            bigramas = [f'{a} {b}' for a, b in zip(acordes, acordes[1:])]
+            return CifraIndexTerm.TIPO_PROGRESSAO, bigramas
+
+        palavras = [normalize_word(p) for p in WORD_RE.findall(search_term)]
+        return CifraIndexTerm.TIPO_LETRA, palavras
+
+    @staticmethod
+    def _match_sequence(
+        tipo: str, termos: List[str], distintos: List[str], candidatas: List[int]
+    ) -> List[Tuple[int, List[Tuple[int, int]]]]:
+        """Keep the candidates where the terms appear consecutively, with the (linha, coluna) of each start"""
+        postings: Dict[int, Dict[str, Dict[int, Tuple[int, int]]]] = defaultdict(lambda: defaultdict(dict))
+        for musica_id, termo, posicao, linha, coluna in db.session.query(
+            CifraIndexTerm.musica_id, CifraIndexTerm.termo, CifraIndexTerm.posicao,
+            CifraIndexTerm.linha, CifraIndexTerm.coluna
+        ).filter(
+            CifraIndexTerm.musica_id.in_(candidatas),
+            CifraIndexTerm.tipo == tipo,
+            CifraIndexTerm.termo.in_(distintos)
+        ):
+            postings[musica_id][termo][posicao] = (linha, coluna)
+
+        # Confirma a sequência: o termo j precisa estar na posição inicial + j
+        resultados: List[Tuple[int, List[Tuple[int, int]]]] = []
+        for musica_id in candidatas:
+            por_termo = postings[musica_id]
+            hits = [
+                por_termo[termos[0]][inicio]
+                for inicio in sorted(por_termo[termos[0]])
+                if all(inicio + j in por_termo[termo] for j, termo in enumerate(termos))
+            ]
+            if hits:
+                resultados.append((musica_id, hits))
+        return resultados
+
+    @staticmethod
+    def _candidates(tipo: str, distintos: List[str]) -> Tuple[List[int], bool]:
+        """Musicas that contain every term, rarest term first, ranked by its occurrences; (ids, capped)
+
+        The occurrences of the rarest term bound how many times the whole sequence can appear,
+        so the best candidates come first. At most CIFRA_SEARCH_MAX_CANDIDATES are returned.
+        """
+        frequencias = dict(db.session.query(CifraIndexTerm.termo, func.count()).filter(
+            CifraIndexTerm.tipo == tipo,
+            CifraIndexTerm.termo.in_(distintos)
+        ).group_by(CifraIndexTerm.termo).all())
+        if len(frequencias) < len(distintos):
+            return [], False
+
+        raro = min(distintos, key=lambda termo: frequencias[termo])
+        ocorrencias = func.count().label('ocorrencias')
+        query = db.session.query(CifraIndexTerm.musica_id, ocorrencias).filter(
+            CifraIndexTerm.tipo == tipo,
+            CifraIndexTerm.termo == raro
+        )
+        # Os demais termos só são conferidos nas músicas que já têm o mais raro
+        for termo in distintos:
+            if termo != raro:
+                outro = aliased(CifraIndexTerm)
+                query = query.filter(exists().where(
+                    outro.musica_id == CifraIndexTerm.musica_id, outro.tipo == tipo, outro.termo == termo
+                ))
+        ids = [row[0] for row in query.group_by(CifraIndexTerm.musica_id).order_by(
+            ocorrencias.desc(), CifraIndexTerm.musica_id
+        ).limit(CIFRA_SEARCH_MAX_CANDIDATES + 1)]
+        return ids[:CIFRA_SEARCH_MAX_CANDIDATES], len(ids) > CIFRA_SEARCH_MAX_CANDIDATES
+
+    @staticmethod
+    def search_content(
+        search_term: str, page: int = 1, per_page: int = 10, fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Search cifras by lyric fragment or chord progression, with line-level hits
+
+        Positions are loaded only for the candidates needed to fill the requested page (plus one
+        result, for has_next). When not every candidate was checked, or the candidate list was
+        capped, total is an estimate and total_estimado is True.
+        """
+        tipo, termos = CifraIndexService._query_terms(search_term)
+        if not termos:
+            raise Exception("Termo de busca é obrigatório")
+
+        distintos = list(set(termos))
+        necessarios = max(page, 1) * per_page + 1
+        resultados: List[Tuple[int, List[Tuple[int, int]]]] = []
+        verificadas = 0
+        try:
+            candidatas, limitadas = CifraIndexService._candidates(tipo, distintos)
+
+            # Lotes que dobram de tamanho: páginas iniciais leem poucas posições
+            tamanho = 2 * necessarios
+            while verificadas < len(candidatas) and len(resultados) < necessarios:
+                lote = candidatas[verificadas:verificadas + min(tamanho, CIFRA_SEARCH_BATCH_SIZE)]
+                resultados.extend(CifraIndexService._match_sequence(tipo, termos, distintos, lote))
+                verificadas += len(lote)
+                tamanho *= 2
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar nas cifras: {str(e)}")
+
+        estimado = limitadas or verificadas < len(candidatas)
+        total = len(resultados)
+        if estimado:
+            # Proporção de candidatas confirmadas até aqui aplicada às que faltaram conferir
+            total = max(total, round(len(resultados) * len(candidatas) / verificadas)) if verificadas else 0
+        inicio = (max(page, 1) - 1) * per_page
+        pagina = resultados[inicio:inicio + per_page]
+
+        musicas = {
+            m.id: m for m in Musica.query.options(undefer(Musica.cifra)).filter(Musica.id.in_([r[0] for r in pagina]))
+        } if pagina else {}
+        items = []
+        for musica_id, hits in pagina:
+            musica = musicas[musica_id]
+            linhas = (musica.cifra or '').splitlines()
+            items.append({
+                'musica': musica.to_dict(fields),
+                'total_hits': len(hits),
+                'hits': [
+                    {'linha': linha, 'coluna': coluna, 'trecho': linhas[linha] if linha < len(linhas) else None}
+                    for linha, coluna in hits[:MAX_HITS_PER_MUSICA]
+                ]
+            })
+
+        return {
+            'tipo_busca': tipo,
+            'items': items,
+            'total': total,
+            'total_estimado': estimado,
+            'has_next': len(resultados) > inicio + per_page
+        }
+
+    @staticmethod
+    def reindex_all(chunk_size: int = 200) -> int:
+        """Rebuild the index for every musica, chunk by chunk"""
+        ultimo_id = 0
+        total = 0
+        while True:
+            musicas = Musica.query.options(undefer(Musica.cifra)).filter(
+                Musica.id > ultimo_id
+            ).order_by(Musica.id).limit(chunk_size).all()
+            if not musicas:
+                return total
+            for musica in musicas:
+                CifraIndexService.index_musica(musica)
+            db.session.commit()
+            ultimo_id = musicas[-1].id
+            total += len(musicas)
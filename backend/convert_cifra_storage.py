@@ -0,0 +1,13 @@
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from app import app, db
+from musica.musica_model.cifra_storage import reconcile_cifra_column
+
+# Aplica uma troca de CIFRA_COMPRESSION num banco já migrado: converte a coluna da cifra
+# para TEXT (none) ou para o formato binário comprimido (zlib/zstd)
+if __name__ == '__main__':
+    with app.app_context():
+        with db.engine.begin() as conn:
+            convertida = reconcile_cifra_column(Operations(MigrationContext.configure(conn)), conn)
+        print("Coluna da cifra convertida" if convertida else "A coluna da cifra já segue CIFRA_COMPRESSION")
@@ -0,0 +1,40 @@
+from datetime import datetime
+from app import db
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_jobs'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    link_musica = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED)
+    musica_id = db.Column(db.Integer, db.ForeignKey('musicas.id', ondelete='SET NULL'), nullable=True)
+    erro = db.Column(db.Text, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    # Renovado pelo worker enquanto o job roda; vencido, o job volta para a fila
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<ImportJob {self.id} {self.status}>'
+
+    def to_dict(self):
+        """Convert model to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'link_musica': self.link_musica,
+            'status': self.status,
+            'musica_id': self.musica_id,
+            'musica_url': f'/api/musicas/{self.musica_id}' if self.musica_id else None,
+            'erro': self.erro,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
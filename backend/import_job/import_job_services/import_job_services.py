@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from flask import current_app
+
+from app import db
+from import_job.import_job_model.import_job_model import ImportJob
+from musica.musica_services.musica_services import MusicaService
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+# 'thread' executa os jobs num pool local; 'process' apenas enfileira para o worker.py
+IMPORT_JOBS_MODE = os.getenv('IMPORT_JOBS_MODE', 'thread')
+IMPORT_JOBS_WORKERS = int(os.getenv('IMPORT_JOBS_WORKERS', '2'))
+# Lease de um job em execução: o worker renova a cada IMPORT_JOBS_LEASE_SECONDS / 3;
+# só um job cujo lease venceu (worker morto ou travado) volta para a fila
+IMPORT_JOBS_LEASE_SECONDS = float(os.getenv('IMPORT_JOBS_LEASE_SECONDS', '60'))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_lease_monitor: Optional[threading.Thread] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_JOBS_WORKERS, thread_name_prefix='import-job')
+        return _executor
+
+
+class ImportJobService:
+
+    @staticmethod
+    def enqueue_import(data: Dict[str, Any]) -> ImportJob:
+        """Register an import job and schedule it in the background"""
+        link_musica = data.get('link_musica') if data else None
+        if not link_musica:
+            raise Exception("link_musica é obrigatório")
+
+        MusicaService._validate_exists_music_in_app(link_musica)
+
+        try:
+            job = ImportJob(link_musica=link_musica, status=ImportJob.STATUS_QUEUED)
+            db.session.add(job)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Erro ao criar job de importação: {str(e)}")
+
+        if IMPORT_JOBS_MODE == 'thread':
+            _get_executor().submit(ImportJobService._run_in_app_context, job.id)
+        return job
+
+    @staticmethod
+    def get_job_by_id(job_id: int) -> ImportJob:
+        """Get import job by ID"""
+        try:
+            job = ImportJob.query.get(job_id)
+            if not job:
+                raise Exception("Job de importação não encontrado")
+            return job
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar job de importação: {str(e)}")
+
+    @staticmethod
+    def _run_in_app_context(job_id: int) -> None:
+        from app import app
+
+        with app.app_context():
+            ImportJobService.run_job(job_id)
+
+    @staticmethod
+    def _lease_deadline() -> datetime:
+        return datetime.utcnow() + timedelta(seconds=IMPORT_JOBS_LEASE_SECONDS)
+
+    @staticmethod
+    def _claim(job_id: int) -> Optional[datetime]:
+        """Take a queued job; returns the claim's started_at, which identifies this run, or None"""
+        # O UPDATE condicional garante que apenas um worker execute cada job
+        agora = datetime.utcnow()
+        claimed = ImportJob.query.filter_by(
+            id=job_id, status=ImportJob.STATUS_QUEUED
+        ).update({
+            'status': ImportJob.STATUS_RUNNING,
+            'started_at': agora,
+            'lease_expires_at': ImportJobService._lease_deadline(),
+            'updated_at': agora
+        }, synchronize_session=False)
+        db.session.commit()
+        return agora if claimed == 1 else None
+
+    @staticmethod
+    def _owned(job_id: int, claimed_at: datetime) -> Any:
+        # Só a execução que fez o claim (mesmo started_at) ainda é dona do job
+        return ImportJob.query.filter_by(id=job_id, status=ImportJob.STATUS_RUNNING, started_at=claimed_at)
+
+    @staticmethod
+    def renew_lease(job_id: int, claimed_at: datetime) -> bool:
+        """Push the lease of a running job forward; False once this run no longer owns the job"""
+        try:
+            renewed = ImportJobService._owned(job_id, claimed_at).update({
+                'lease_expires_at': ImportJobService._lease_deadline()
+            }, synchronize_session=False)
+            db.session.commit()
+            return renewed == 1
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def _heartbeat(app: Any, job_id: int, claimed_at: datetime, stop: threading.Event) -> None:
+        # Roda numa thread ao lado do scrape, com sessão própria
+        while not stop.wait(IMPORT_JOBS_LEASE_SECONDS / 3):
+            with app.app_context():
+                try:
+                    if not ImportJobService.renew_lease(job_id, claimed_at):
+                        return
+                except SQLAlchemyError as e:
+                    app.logger.warning(f"Erro ao renovar o lease do job de importação {job_id}: {e}")
+
+    @staticmethod
+    def run_job(job_id: int) -> None:
+        """Execute a queued import job, renewing its lease while it runs and recording the outcome"""
+        claimed_at = ImportJobService._claim(job_id)
+        if claimed_at is None:
+            return
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=ImportJobService._heartbeat,
+            args=(current_app._get_current_object(), job_id, claimed_at, stop),
+            name=f'import-job-lease-{job_id}', daemon=True
+        )
+        heartbeat.start()
+        try:
+            link_musica = db.session.scalar(select(ImportJob.link_musica).where(ImportJob.id == job_id))
+            try:
+                musica = MusicaService.create_musica({'link_musica': link_musica})
+                resultado = {'status': ImportJob.STATUS_DONE, 'musica_id': musica.id}
+            except Exception as e:
+                db.session.rollback()
+                resultado = {'status': ImportJob.STATUS_FAILED, 'erro': str(e)}
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        agora = datetime.utcnow()
+        ImportJobService._owned(job_id, claimed_at).update({
+            **resultado, 'finished_at': agora, 'lease_expires_at': None, 'updated_at': agora
+        }, synchronize_session=False)
+        db.session.commit()
+
+    @staticmethod
+    def requeue_expired_jobs() -> List[int]:
+        """Put back in the queue the running jobs whose lease was not renewed in time; returns their ids"""
+        agora = datetime.utcnow()
+        try:
+            requeued = db.session.scalars(
+                update(ImportJob).where(
+                    ImportJob.status == ImportJob.STATUS_RUNNING,
+                    ImportJob.lease_expires_at < agora
+                ).values(
+                    status=ImportJob.STATUS_QUEUED, started_at=None, lease_expires_at=None, updated_at=agora
+                ).returning(ImportJob.id)
+            ).all()
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Erro ao recolocar jobs de importação na fila: {str(e)}")
+        if requeued:
+            print(f"{len(requeued)} job(s) de importação interrompido(s) voltaram para a fila")
+        return requeued
+
+    @staticmethod
+    def recover_jobs() -> None:
+        """Requeue jobs with an expired lease and, in thread mode, resubmit every queued job
+
+        Called by the entry points that run jobs (run.py and worker.py), never on import:
+        the executor lives only in the serving process, so jobs queued when it stopped
+        would otherwise never run. The conditional claim keeps a job from running twice.
+        """
+        ImportJobService.requeue_expired_jobs()
+        if IMPORT_JOBS_MODE != 'thread':
+            return
+
+        job_ids = db.session.scalars(
+            select(ImportJob.id).where(
+                ImportJob.status == ImportJob.STATUS_QUEUED
+            ).order_by(ImportJob.id)
+        ).all()
+        for job_id in job_ids:
+            _get_executor().submit(ImportJobService._run_in_app_context, job_id)
+
+    @staticmethod
+    def start_lease_monitor(app: Any) -> None:
+        """Thread mode: every lease period, requeue and resubmit the jobs whose lease expired
+
+        Covers runs that died while this process kept serving (or before a quick restart,
+        when the lease had not expired yet at recover_jobs time).
+        """
+        global _lease_monitor
+        if IMPORT_JOBS_MODE != 'thread' or _lease_monitor is not None:
+            return
+
+        def _monitor() -> None:
+            while True:
+                time.sleep(IMPORT_JOBS_LEASE_SECONDS)
+                with app.app_context():
+                    try:
+                        for job_id in ImportJobService.requeue_expired_jobs():
+                            _get_executor().submit(ImportJobService._run_in_app_context, job_id)
+                    except Exception as e:
+                        app.logger.warning(f"Erro ao verificar leases dos jobs de importação: {e}")
+
+        _lease_monitor = threading.Thread(target=_monitor, name='import-job-leases', daemon=True)
+        _lease_monitor.start()
+
+    @staticmethod
+    def run_next_queued() -> bool:
+        """Pick the oldest queued job and run it; returns False when the queue is empty"""
+        job = ImportJob.query.filter_by(
+            status=ImportJob.STATUS_QUEUED
+        ).order_by(ImportJob.id).first()
+        if not job:
+            return False
+
+        ImportJobService.run_job(job.id)
+        return True
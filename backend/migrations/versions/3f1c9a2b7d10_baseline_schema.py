@@ -0,0 +1,60 @@
+"""baseline schema
+
+Revision ID: 3f1c9a2b7d10
+Revises: 
+Create Date: 2026-10-18 12:00:00.000000
+
+As tabelas que o db.create_all criava antes das migrações. Um banco dessa época
+já tem este schema: marque-o com `flask db stamp 3f1c9a2b7d10` e depois rode
+`flask db upgrade`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2b7d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'musicas',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('nome', sa.String(length=255), nullable=True),
+        sa.Column('artista', sa.String(length=255), nullable=True),
+        sa.Column('link_musica', sa.String(length=500), nullable=False),
+        sa.Column('cifra', sa.Text(), nullable=True),
+        sa.Column('velocidade_rolamento', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'potpourri',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('nome_potpourri', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'musicas_potpourri',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('potpourri_id', sa.Integer(), nullable=False),
+        sa.Column('musica_id', sa.Integer(), nullable=False),
+        sa.Column('ordem_tocagem', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['musica_id'], ['musicas.id']),
+        sa.ForeignKeyConstraint(['potpourri_id'], ['potpourri.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('musicas_potpourri')
+    op.drop_table('potpourri')
+    op.drop_table('musicas')
@@ -0,0 +1,76 @@
+"""import jobs, recrawl checkpoints, cifra content index and musicas.cifra_hash
+
+Revision ID: 5a2d8c1e9f30
+Revises: 3f1c9a2b7d10
+Create Date: 2026-10-18 12:05:00.000000
+
+Tabelas das importações em segundo plano, do recrawl incremental e do índice
+de conteúdo das cifras, mais o hash usado pelo recrawl para detectar mudanças.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a2d8c1e9f30'
+down_revision = '3f1c9a2b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('musicas', sa.Column('cifra_hash', sa.String(length=64), nullable=True))
+
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('link_musica', sa.String(length=500), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('musica_id', sa.Integer(), nullable=True),
+        sa.Column('erro', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['musica_id'], ['musicas.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'recrawl_checkpoints',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('ultimo_musica_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('processadas', sa.Integer(), nullable=False),
+        sa.Column('alteradas', sa.Integer(), nullable=False),
+        sa.Column('falhas', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'cifra_index_terms',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('musica_id', sa.Integer(), nullable=False),
+        sa.Column('tipo', sa.String(length=12), nullable=False),
+        sa.Column('termo', sa.String(length=100), nullable=False),
+        sa.Column('posicao', sa.Integer(), nullable=False),
+        sa.Column('linha', sa.Integer(), nullable=False),
+        sa.Column('coluna', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['musica_id'], ['musicas.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_cifra_index_terms_musica_id', 'cifra_index_terms', ['musica_id'])
+    op.create_index('ix_cifra_index_terms_tipo_termo', 'cifra_index_terms', ['tipo', 'termo'])
+
+
+def downgrade():
+    op.drop_index('ix_cifra_index_terms_tipo_termo', table_name='cifra_index_terms')
+    op.drop_index('ix_cifra_index_terms_musica_id', table_name='cifra_index_terms')
+    op.drop_table('cifra_index_terms')
+    op.drop_table('recrawl_checkpoints')
+    op.drop_table('import_jobs')
+    with op.batch_alter_table('musicas') as batch_op:
+        batch_op.drop_column('cifra_hash')
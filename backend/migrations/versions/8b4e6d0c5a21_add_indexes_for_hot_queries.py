@@ -0,0 +1,38 @@
+"""add indexes and constraints for hot queries
+
+Revision ID: 8b4e6d0c5a21
+Revises: 5a2d8c1e9f30
+Create Date: 2026-10-18 12:10:00.000000
+
+- link_musica único: _validate_exists_music_in_app e a importação em lote
+- (potpourri_id, ordem_tocagem) único: get_musicas_by_potpourri_id (filtro + ordenação)
+- musica_id: joins e remoções de músicas
+- (updated_at, id): listagens ordenadas por updated_at DESC e paginação por cursor
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d0c5a21'
+down_revision = '5a2d8c1e9f30'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_musicas_link_musica', 'musicas', ['link_musica'], True),
+    ('ix_musicas_updated_at_id', 'musicas', ['updated_at', 'id'], False),
+    ('ix_potpourri_updated_at_id', 'potpourri', ['updated_at', 'id'], False),
+    ('uq_musicas_potpourri_potpourri_id_ordem', 'musicas_potpourri', ['potpourri_id', 'ordem_tocagem'], True),
+    ('ix_musicas_potpourri_musica_id', 'musicas_potpourri', ['musica_id'], False),
+]
+
+
+def upgrade():
+    for name, table, columns, unique in INDEXES:
+        op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,129 @@
+"""add musicas.cifra_estruturada
+
+Revision ID: a9c3f5d8e214
+Revises: e4a1f7c3b952
+Create Date: 2026-10-18 17:10:00.000000
+
+Guarda a cifra já analisada (linhas, acordes com colunas e seções), servida com
+?format=structured. As linhas existentes são preenchidas em lotes de
+CIFRA_MIGRATION_BATCH_SIZE.
+
+O analisador abaixo é uma cópia congelada do cifra_parser na versão 1 do formato:
+mudanças futuras no analisador da aplicação não alteram o que esta migração grava.
+"""
+import os
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+from musica.musica_model.cifra_dictionary import CIFRA_DICTIONARIES
+from utils.compressed_text.compressed_text import decode_text
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3f5d8e214'
+down_revision = 'e4a1f7c3b952'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = int(os.getenv('CIFRA_MIGRATION_BATCH_SIZE', '500'))
+
+_CHORD_RE = re.compile(
+    r'^[A-G](?:#|b)?'
+    r'(?:maj|min|m|dim|aug|sus|add|M|º|°|\+)?'
+    r'[0-9]*'
+    r'(?:(?:maj|sus|add|dim|aug)?[#b+\-]?[0-9]+)*'
+    r'(?:\([^)\s]*\))?'
+    r'(?:/[A-G](?:#|b)?)?$'
+)
+_SECTION_RE = re.compile(r'^\s*\[([^\]]+)\]')
+_TOKEN_RE = re.compile(r'\S+')
+_CHORD_LINE_NOISE = {'|', '||', '-', '/', '(', ')', 'x', '2x', '3x', '4x', '(2x)', '(3x)', '(4x)'}
+
+
+def _parse_line(line):
+    if not line.strip():
+        return 'vazia', None, []
+
+    section = None
+    offset = 0
+    match = _SECTION_RE.match(line)
+    if match:
+        section = match.group(1).strip()
+        offset = match.end()
+
+    tokens = [(m.group(), m.start() + offset) for m in _TOKEN_RE.finditer(line[offset:])]
+    if not tokens:
+        return 'secao', section, []
+
+    chords = [(t, col) for t, col in tokens if t not in _CHORD_LINE_NOISE]
+    if chords and all(_CHORD_RE.match(t) for t, _ in chords):
+        return 'acordes', section, chords
+    return 'letra', section, []
+
+
+def _structure_cifra(cifra):
+    linhas = []
+    secoes = []
+    for index, texto in enumerate(cifra.splitlines()):
+        kind, section, tokens = _parse_line(texto)
+        linha = {'tipo': kind, 'texto': texto}
+        if section:
+            linha['secao'] = section
+            secoes.append({'nome': section, 'linha': index})
+        if kind == 'acordes':
+            linha['acordes'] = [{'acorde': acorde, 'coluna': coluna} for acorde, coluna in tokens]
+        linhas.append(linha)
+    return {'versao': 1, 'secoes': secoes, 'linhas': linhas}
+
+
+def _columns():
+    return {column['name']: column for column in sa.inspect(op.get_bind()).get_columns('musicas')}
+
+
+def _backfill(cifra_is_binary):
+    bind = op.get_bind()
+    musicas = sa.table(
+        'musicas',
+        sa.column('id', sa.Integer()),
+        sa.column('cifra', sa.LargeBinary() if cifra_is_binary else sa.Text()),
+        sa.column('cifra_estruturada', sa.JSON()),
+    )
+    update = sa.update(musicas).where(musicas.c.id == sa.bindparam('b_id')).values(
+        cifra_estruturada=sa.bindparam('b_estruturada', type_=sa.JSON())
+    )
+
+    ultimo_id = 0
+    preenchidas = 0
+    while True:
+        rows = bind.execute(
+            sa.select(musicas.c.id, musicas.c.cifra).where(
+                musicas.c.id > ultimo_id
+            ).order_by(musicas.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        valores = []
+        for musica_id, cifra in rows:
+            if cifra is None:
+                continue
+            texto = decode_text(cifra, CIFRA_DICTIONARIES) if cifra_is_binary else cifra
+            valores.append({'b_id': musica_id, 'b_estruturada': _structure_cifra(texto)})
+        if valores:
+            bind.execute(update, valores)
+        ultimo_id = rows[-1][0]
+        preenchidas += len(rows)
+        print(f"cifras estruturadas: {preenchidas}")
+
+
+def upgrade():
+    columns = _columns()
+    op.add_column('musicas', sa.Column('cifra_estruturada', sa.JSON(), nullable=True))
+    _backfill(isinstance(columns['cifra']['type'], sa.LargeBinary))
+
+
+def downgrade():
+    with op.batch_alter_table('musicas') as batch_op:
+        batch_op.drop_column('cifra_estruturada')
@@ -0,0 +1,111 @@
+"""accent-insensitive search index for musicas and potpourri
+
+Revision ID: b5e8d1f6c047
+Revises: a9c3f5d8e214
+Create Date: 2026-10-18 18:00:00.000000
+
+- Postgres: unaccent + pg_trgm, f_unaccent() IMMUTABLE e índices GIN de tsvector e trigramas
+- SQLite: tabelas FTS5 de conteúdo externo mantidas por triggers
+
+Se as extensões não puderem ser criadas (comum em Postgres gerenciado sem permissão),
+a migração segue sem o índice e as buscas continuam usando ilike.
+As expressões precisam ser idênticas às de search_index_services.py.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e8d1f6c047'
+down_revision = 'a9c3f5d8e214'
+branch_labels = None
+depends_on = None
+
+PG_MUSICA_TEXTO = "f_unaccent(lower(coalesce(musicas.nome, '') || ' ' || coalesce(musicas.artista, '')))"
+PG_MUSICA_DOCUMENTO = f"to_tsvector('simple', {PG_MUSICA_TEXTO})"
+PG_POTPOURRI_TEXTO = "f_unaccent(lower(coalesce(potpourri.nome_potpourri, '')))"
+PG_POTPOURRI_DOCUMENTO = f"to_tsvector('simple', {PG_POTPOURRI_TEXTO})"
+
+PG_SETUP = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # unaccent() não é IMMUTABLE, então não pode ser usada diretamente em índices
+    """CREATE FUNCTION f_unaccent(text) RETURNS text AS
+       $$ SELECT public.unaccent('public.unaccent', $1) $$
+       LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT""",
+    f"CREATE INDEX ix_musicas_busca_fts ON musicas USING GIN (({PG_MUSICA_DOCUMENTO}))",
+    f"CREATE INDEX ix_musicas_busca_trgm ON musicas USING GIN (({PG_MUSICA_TEXTO}) gin_trgm_ops)",
+    f"CREATE INDEX ix_potpourri_busca_fts ON potpourri USING GIN (({PG_POTPOURRI_DOCUMENTO}))",
+    f"CREATE INDEX ix_potpourri_busca_trgm ON potpourri USING GIN (({PG_POTPOURRI_TEXTO}) gin_trgm_ops)",
+]
+
+PG_TEARDOWN = [
+    "DROP INDEX IF EXISTS ix_potpourri_busca_trgm",
+    "DROP INDEX IF EXISTS ix_potpourri_busca_fts",
+    "DROP INDEX IF EXISTS ix_musicas_busca_trgm",
+    "DROP INDEX IF EXISTS ix_musicas_busca_fts",
+    "DROP FUNCTION IF EXISTS f_unaccent(text)",
+]
+
+# Tabelas FTS5 de conteúdo externo, mantidas em sincronia por triggers
+SQLITE_FTS_TABLES = {
+    'musicas_fts': ('musicas', ['nome', 'artista']),
+    'potpourri_fts': ('potpourri', ['nome_potpourri']),
+}
+
+
+def _sqlite_fts_statements(fts_table, source_table, columns):
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+    return [
+        f"""CREATE VIRTUAL TABLE {fts_table} USING fts5(
+            {cols}, content='{source_table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )""",
+        f"""CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {source_table} BEGIN
+            INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values});
+        END""",
+        f"""CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {source_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+        END""",
+        f"""CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {cols} ON {source_table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_values});
+        END""",
+        # Indexa as linhas que já existiam antes da criação da tabela FTS
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # Savepoint: uma falha nas extensões não aborta a transação das demais migrações
+        savepoint = bind.begin_nested()
+        try:
+            for statement in PG_SETUP:
+                bind.execute(sa.text(statement))
+            savepoint.commit()
+        except sa.exc.SQLAlchemyError as e:
+            savepoint.rollback()
+            print(f"Índice de busca não criado, as buscas vão usar ilike: {e}")
+
+    elif bind.dialect.name == 'sqlite':
+        for fts_table, (source_table, columns) in SQLITE_FTS_TABLES.items():
+            for statement in _sqlite_fts_statements(fts_table, source_table, columns):
+                bind.execute(sa.text(statement))
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # IF EXISTS: o upgrade pode ter seguido sem o índice (extensões indisponíveis).
+        # As extensões ficam: podem estar em uso por outros objetos do banco
+        for statement in PG_TEARDOWN:
+            bind.execute(sa.text(statement))
+
+    elif bind.dialect.name == 'sqlite':
+        for fts_table in SQLITE_FTS_TABLES:
+            for suffix in ('ai', 'ad', 'au'):
+                bind.execute(sa.text(f"DROP TRIGGER {fts_table}_{suffix}"))
+            bind.execute(sa.text(f"DROP TABLE {fts_table}"))
@@ -0,0 +1,57 @@
+"""on delete cascade for musicas_potpourri foreign keys
+
+Revision ID: c7d2e91f4b36
+Revises: 8b4e6d0c5a21
+Create Date: 2026-10-18 12:20:00.000000
+
+Permite remover um potpourri ou uma música com um único DELETE; o banco
+remove as relações em musicas_potpourri.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e91f4b36'
+down_revision = '8b4e6d0c5a21'
+branch_labels = None
+depends_on = None
+
+
+def _musicas_potpourri_table(ondelete):
+    # Definição completa usada pelo SQLite, que precisa recriar a tabela para trocar as FKs
+    return sa.Table(
+        'musicas_potpourri', sa.MetaData(),
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('potpourri_id', sa.Integer(), sa.ForeignKey('potpourri.id', ondelete=ondelete), nullable=False),
+        sa.Column('musica_id', sa.Integer(), sa.ForeignKey('musicas.id', ondelete=ondelete), nullable=False),
+        sa.Column('ordem_tocagem', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Index('uq_musicas_potpourri_potpourri_id_ordem', 'potpourri_id', 'ordem_tocagem', unique=True),
+        sa.Index('ix_musicas_potpourri_musica_id', 'musica_id'),
+    )
+
+
+def _replace_foreign_keys(ondelete):
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        with op.batch_alter_table('musicas_potpourri', recreate='always',
+                                  copy_from=_musicas_potpourri_table(ondelete)):
+            pass
+        return
+
+    for fk in sa.inspect(bind).get_foreign_keys('musicas_potpourri'):
+        op.drop_constraint(fk['name'], 'musicas_potpourri', type_='foreignkey')
+    op.create_foreign_key('musicas_potpourri_potpourri_id_fkey', 'musicas_potpourri', 'potpourri',
+                          ['potpourri_id'], ['id'], ondelete=ondelete)
+    op.create_foreign_key('musicas_potpourri_musica_id_fkey', 'musicas_potpourri', 'musicas',
+                          ['musica_id'], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
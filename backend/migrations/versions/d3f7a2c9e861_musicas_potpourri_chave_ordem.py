@@ -0,0 +1,93 @@
+"""replace musicas_potpourri.ordem_tocagem with a sparse chave_ordem
+
+Revision ID: d3f7a2c9e861
+Revises: b5e8d1f6c047
+Create Date: 2026-10-18 18:30:00.000000
+
+A ordem de tocagem passa a ser guardada só em chave_ordem, uma chave esparsa:
+mover ou inserir uma música grava apenas a linha dela, no meio do vão entre as
+vizinhas. A ordem_tocagem da API vira a posição (1..n) calculada na leitura.
+chave_ordem começa em posição * GAP, na ordem atual (ordem_tocagem, id) de cada
+potpourri; o downgrade recalcula ordem_tocagem como 1..n a partir da chave.
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f7a2c9e861'
+down_revision = 'b5e8d1f6c047'
+branch_labels = None
+depends_on = None
+
+GAP = 1024
+BATCH_SIZE = int(os.getenv('ORDEM_MIGRATION_BATCH_SIZE', '500'))
+
+
+def _numerar(origem, destino, fator):
+    """Grava em destino a posição de cada linha (ordenada por origem, id) no seu potpourri, vezes fator"""
+    bind = op.get_bind()
+    relacoes = sa.table(
+        'musicas_potpourri',
+        sa.column('id', sa.Integer()),
+        sa.column('potpourri_id', sa.Integer()),
+        sa.column(origem, sa.BigInteger()),
+        sa.column(destino, sa.BigInteger()),
+    )
+    update = sa.update(relacoes).where(relacoes.c.id == sa.bindparam('b_id')).values(
+        {destino: sa.bindparam('b_valor')}
+    )
+
+    ultimo_potpourri = 0
+    while True:
+        potpourri_ids = bind.execute(
+            sa.select(relacoes.c.potpourri_id).where(
+                relacoes.c.potpourri_id > ultimo_potpourri
+            ).group_by(relacoes.c.potpourri_id).order_by(relacoes.c.potpourri_id).limit(BATCH_SIZE)
+        ).scalars().all()
+        if not potpourri_ids:
+            break
+
+        rows = bind.execute(
+            sa.select(relacoes.c.id, relacoes.c.potpourri_id).where(
+                relacoes.c.potpourri_id.in_(potpourri_ids)
+            ).order_by(relacoes.c.potpourri_id, relacoes.c[origem], relacoes.c.id)
+        ).all()
+
+        valores = []
+        posicao = 0
+        anterior = None
+        for rel_id, potpourri_id in rows:
+            posicao = posicao + 1 if potpourri_id == anterior else 1
+            anterior = potpourri_id
+            valores.append({'b_id': rel_id, 'b_valor': posicao * fator})
+
+        bind.execute(update, valores)
+        ultimo_potpourri = potpourri_ids[-1]
+        print(f"potpourris numerados até o id {ultimo_potpourri}")
+
+
+def upgrade():
+    op.add_column('musicas_potpourri', sa.Column('chave_ordem', sa.BigInteger(), nullable=True))
+    _numerar('ordem_tocagem', 'chave_ordem', GAP)
+    op.drop_index('uq_musicas_potpourri_potpourri_id_ordem', table_name='musicas_potpourri')
+    with op.batch_alter_table('musicas_potpourri') as batch_op:
+        batch_op.alter_column('chave_ordem', existing_type=sa.BigInteger(), nullable=False)
+        batch_op.drop_column('ordem_tocagem')
+    op.create_index(
+        'ix_musicas_potpourri_potpourri_id_chave', 'musicas_potpourri', ['potpourri_id', 'chave_ordem', 'id']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_musicas_potpourri_potpourri_id_chave', table_name='musicas_potpourri')
+    op.add_column('musicas_potpourri', sa.Column('ordem_tocagem', sa.Integer(), nullable=True))
+    _numerar('chave_ordem', 'ordem_tocagem', 1)
+    with op.batch_alter_table('musicas_potpourri') as batch_op:
+        batch_op.alter_column('ordem_tocagem', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('chave_ordem')
+    op.create_index(
+        'uq_musicas_potpourri_potpourri_id_ordem', 'musicas_potpourri', ['potpourri_id', 'ordem_tocagem'], unique=True
+    )
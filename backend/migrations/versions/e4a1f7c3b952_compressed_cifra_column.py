@@ -0,0 +1,37 @@
+"""store musicas.cifra as compressed binary when CIFRA_COMPRESSION is enabled
+
+Revision ID: e4a1f7c3b952
+Revises: c7d2e91f4b36
+Create Date: 2026-10-18 13:30:00.000000
+
+Com CIFRA_COMPRESSION=zlib ou zstd a cifra passa a ser gravada pelo tipo CompressedText:
+um byte de cabeçalho indica o codec e o dicionário usado. Com none (padrão) nada muda e a
+coluna continua TEXT. As linhas existentes são convertidas em lotes de CIFRA_MIGRATION_BATCH_SIZE.
+O downgrade desfaz exatamente o que o upgrade fez: volta para TEXT só se a coluna ficou binária.
+"""
+import os
+
+from alembic import op
+
+from musica.musica_model.cifra_storage import store_as_text, store_compressed
+from utils.compressed_text.compressed_text import codec_from_env
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1f7c3b952'
+down_revision = 'c7d2e91f4b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    codec = codec_from_env('CIFRA_COMPRESSION')
+    if codec == 'none':
+        return
+    level = int(os.getenv('CIFRA_COMPRESSION_LEVEL')) if os.getenv('CIFRA_COMPRESSION_LEVEL') else None
+    store_compressed(op, op.get_bind(), codec, level)
+
+
+def downgrade():
+    # Antes desta revisão a coluna é sempre TEXT; se o upgrade não converteu (none), não há o que desfazer
+    store_as_text(op, op.get_bind())
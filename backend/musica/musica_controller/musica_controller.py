@@ -1,24 +1,118 @@
 from flask import Blueprint, jsonify, request
 from musica.musica_services.musica_services import MusicaService
+from import_job.import_job_services.import_job_services import ImportJobService
+from suggest.suggest_services.suggest_services import SuggestService
+from utils.json_provider.json_provider import stream_json_array
+from utils.conditional_get.conditional_get import build_etag, not_modified, add_validators
+from utils.response_compression.response_compression import cached_response
 
 musica_bp = Blueprint('musica_bp', __name__)
 
 
 @musica_bp.route('/', methods=['POST'])
 def create_musica():
-    """Create a new musica"""
+    """Create a new musica (with ?async=true the scrape runs as a background job)"""
     try:
         data = request.get_json()
+        
+        if request.args.get('async', 'false').lower() == 'true':
+            job = ImportJobService.enqueue_import(data)
+            return jsonify({
+                'message': 'Importação da música agendada',
+                'job': job.to_dict(),
+                'job_url': f'/api/musicas/jobs/{job.id}'
+            }), 202
     
         musica = MusicaService.create_musica(data)
         return jsonify({
             'message': 'Música criada com sucesso',
-            'musica': musica.to_dict()
+            'musica': musica.to_dict(),
+            'metodo_extracao': getattr(musica, 'metodo_extracao', None)
         }), 201
         
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
+@musica_bp.route('/bulk', methods=['POST'])
+def create_musicas_bulk():
+    """Import a list of musicas by link_musica"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'message': 'Dados não fornecidos'}), 400
+        
+        resultados = MusicaService.create_musicas_bulk(data.get('links_musica'))
+        return jsonify({
+            'message': 'Importação em lote concluída',
+            'resultados': resultados,
+            'total_criadas': sum(1 for r in resultados if r['status'] == 'criada'),
+            'total_existentes': sum(1 for r in resultados if r['status'] == 'existente'),
+            'total_falhas': sum(1 for r in resultados if r['status'] == 'falha')
+        })
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@musica_bp.route('/scrape-metrics', methods=['GET'])
+def get_scrape_metrics():
+    """Get per-stage import timing histograms"""
+    try:
+        return jsonify({
+            'etapas': MusicaService.get_scrape_metrics()
+        })
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@musica_bp.route('/suggest', methods=['GET'])
+def suggest():
+    """Typeahead suggestions for musica name/artist and potpourri name"""
+    try:
+        prefix = request.args.get('prefix', '')
+        limit = request.args.get('limit', 10, type=int)
+        tipo = request.args.get('tipo')
+        
+        return jsonify({
+            'prefix': prefix,
+            'sugestoes': SuggestService.suggest(prefix, limit, tipo)
+        })
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@musica_bp.route('/bulk-delete', methods=['POST'])
+def delete_musicas_bulk():
+    """Delete a list of musicas by ID"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'message': 'Dados não fornecidos'}), 400
+        
+        resultado = MusicaService.delete_musicas_bulk(data.get('ids'))
+        return jsonify({
+            'message': 'Músicas deletadas com sucesso',
+            **resultado
+        })
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+@musica_bp.route('/jobs/<int:job_id>', methods=['GET'])
+def get_import_job(job_id):
+    """Get the status of a background import job"""
+    try:
+        job = ImportJobService.get_job_by_id(job_id)
+        return jsonify({
+            'job': job.to_dict()
+        })
+        
+    except Exception as e:
+        if "não encontrado" in str(e):
+            return jsonify({'message': str(e)}), 404
+        return jsonify({'message': str(e)}), 500
+
 @musica_bp.route('/', methods=['GET'])
 def get_all_musicas():
     """Get all musicas with pagination"""
@@ -26,15 +120,38 @@ def get_all_musicas():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', '')
+        fields = MusicaService.parse_fields(request.args.get('fields'))
+        
+        # Validador da coleção: max(updated_at) e total, sem carregar nenhuma música
+        etag = build_etag('musicas', *MusicaService.get_collection_version())
+        nao_modificado = not_modified(etag)
+        if nao_modificado:
+            return nao_modificado
+        
+        # Catálogo completo em streaming (opcional): um elemento por vez, sem paginação
+        if request.args.get('stream', 'false').lower() == 'true' and not search:
+            return add_validators(
+                stream_json_array('musicas', MusicaService.iter_all_musicas(fields), lambda musica: musica.to_dict(fields)),
+                etag
+            )
+        
+        # Paginação por cursor (opcional): custo constante por página, sem COUNT por padrão
+        if 'cursor' in request.args and not search:
+            include_total = request.args.get('include_total', '0').lower() in ('1', 'true')
+            keyset_page = MusicaService.get_all_musicas_keyset(request.args.get('cursor'), per_page, include_total, fields)
+            return add_validators(jsonify({
+                'musicas': [musica.to_dict(fields) for musica in keyset_page.items],
+                'pagination': keyset_page.pagination_dict()
+            }), etag)
         
         if search:
-            paginated_musicas = MusicaService.search_musicas_by_name(search, page, per_page)
+            paginated_musicas = MusicaService.search_musicas_by_name(search, page, per_page, fields)
         else:
-            paginated_musicas = MusicaService.get_all_musicas(page, per_page)
+            paginated_musicas = MusicaService.get_all_musicas(page, per_page, fields)
         
-        musicas = [musica.to_dict() for musica in paginated_musicas.items]
+        musicas = [musica.to_dict(fields) for musica in paginated_musicas.items]
         
-        return jsonify({
+        return add_validators(jsonify({
             'musicas': musicas,
             'pagination': {
                 'page': paginated_musicas.page,
@@ -44,7 +161,7 @@ def get_all_musicas():
                 'has_next': paginated_musicas.has_next,
                 'has_prev': paginated_musicas.has_prev
             }
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({'message': str(e)}), 500
@@ -53,10 +170,23 @@ def get_all_musicas():
 def get_musica_by_id(musica_id):
     """Get musica by ID"""
     try:
-        musica = MusicaService.get_musica_by_id(musica_id)
-        return jsonify({
-            'musica': musica.to_dict()
-        })
+        fields = MusicaService.parse_fields(request.args.get('fields'))
+        estruturada = MusicaService.parse_format(request.args.get('format'))
+        
+        # Só o updated_at é lido antes de decidir: em 304 a cifra nem sai do banco
+        updated_at = MusicaService.get_musica_version(musica_id)
+        etag = build_etag('musica', musica_id, updated_at.isoformat())
+        nao_modificado = not_modified(etag, updated_at)
+        if nao_modificado:
+            return nao_modificado
+        em_cache = cached_response(etag)
+        if em_cache:
+            return add_validators(em_cache, etag, updated_at)
+        
+        musica = MusicaService.get_musica_by_id(musica_id, fields, estruturada)
+        return add_validators(jsonify({
+            'musica': musica.to_dict(fields, estruturada)
+        }), etag, updated_at)
         
     except Exception as e:
         if "não encontrada" in str(e):
@@ -105,13 +235,20 @@ def search_musicas():
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
+        fields = MusicaService.parse_fields(request.args.get('fields'))
+        
         if not search_term:
             return jsonify({'message': 'Termo de busca é obrigatório'}), 400
         
-        paginated_musicas = MusicaService.search_musicas_by_name(search_term, page, per_page)
-        musicas = [musica.to_dict() for musica in paginated_musicas.items]
+        etag = build_etag('musicas', *MusicaService.get_collection_version())
+        nao_modificado = not_modified(etag)
+        if nao_modificado:
+            return nao_modificado
         
-        return jsonify({
+        paginated_musicas = MusicaService.search_musicas_by_name(search_term, page, per_page, fields)
+        musicas = [musica.to_dict(fields) for musica in paginated_musicas.items]
+        
+        return add_validators(jsonify({
             'musicas': musicas,
             'search_term': search_term,
             'pagination': {
@@ -122,8 +259,42 @@ def search_musicas():
                 'has_next': paginated_musicas.has_next,
                 'has_prev': paginated_musicas.has_prev
             }
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({'message': str(e)}), 500
 
+
+@musica_bp.route('/search/content', methods=['GET'])
+def search_musicas_by_content():
+    """Search musicas by lyric fragment or chord progression"""
+    try:
+        search_term = request.args.get('q', '')
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 10, type=int)
+        
+        fields = MusicaService.parse_fields(request.args.get('fields'))
+        
+        if not search_term.strip():
+            return jsonify({'message': 'Termo de busca é obrigatório'}), 400
+        
+        resultado = MusicaService.search_musicas_by_content(search_term, page, per_page, fields)
+        pages = -(-resultado['total'] // per_page) if per_page > 0 else 0
+        
+        return jsonify({
+            'musicas': resultado['items'],
+            'search_term': search_term,
+            'tipo_busca': resultado['tipo_busca'],
+            'pagination': {
+                'page': page,
+                'pages': pages,
+                'per_page': per_page,
+                'total': resultado['total'],
+                'total_estimado': resultado['total_estimado'],
+                'has_next': resultado['has_next'],
+                'has_prev': page > 1
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
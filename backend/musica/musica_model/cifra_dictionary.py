@@ -0,0 +1,36 @@
+"""Dicionários de compressão das cifras, versionados em cifra_dictionaries/cifra_v<id>.dict
+
+Cada arquivo é um dicionário treinado com zstandard.train_dictionary sobre uma amostra das
+cifras do catálogo (python train_cifra_dictionary.py grava o próximo id). O v1 é o dicionário
+de conteúdo bruto usado antes do treino e continua aqui só para ler as linhas gravadas com ele.
+
+Nunca altere nem remova um dicionário já publicado: as linhas gravadas guardam o id do
+dicionário usado (um byte, 1 a 255). As gravações usam CIFRA_DICTIONARY_ID ou, sem ela, o
+maior id disponível.
+"""
+import os
+import re
+from typing import Dict
+
+DICTIONARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cifra_dictionaries')
+_DICTIONARY_FILE = re.compile(r'^cifra_v(\d+)\.dict$')
+
+
+def dictionary_path(dictionary_id: int) -> str:
+    return os.path.join(DICTIONARY_DIR, f'cifra_v{dictionary_id}.dict')
+
+
+def load_dictionaries() -> Dict[int, bytes]:
+    dictionaries = {}
+    for nome in os.listdir(DICTIONARY_DIR):
+        match = _DICTIONARY_FILE.match(nome)
+        if match:
+            with open(os.path.join(DICTIONARY_DIR, nome), 'rb') as arquivo:
+                dictionaries[int(match.group(1))] = arquivo.read()
+    return dictionaries
+
+
+CIFRA_DICTIONARIES = load_dictionaries()
+CIFRA_DICTIONARY_ID = int(os.getenv('CIFRA_DICTIONARY_ID') or max(CIFRA_DICTIONARIES))
+if CIFRA_DICTIONARY_ID not in CIFRA_DICTIONARIES:
+    raise ValueError(f"CIFRA_DICTIONARY_ID={CIFRA_DICTIONARY_ID} não existe em {DICTIONARY_DIR}")
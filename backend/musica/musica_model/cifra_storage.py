@@ -0,0 +1,93 @@
+"""Armazenamento da coluna musicas.cifra conforme CIFRA_COMPRESSION
+
+Sem compressão (padrão) a coluna é TEXT comum, legível em SQL e em consultas avulsas.
+Com zlib ou zstd ela vira binária ([codec][dicionário][dados], ver CompressedText).
+As conversões rodam em lotes de CIFRA_MIGRATION_BATCH_SIZE e são usadas pelas migrações
+e por convert_cifra_storage.py, que aplica uma troca de CIFRA_COMPRESSION num banco já migrado.
+"""
+import os
+
+import sqlalchemy as sa
+
+from musica.musica_model.cifra_dictionary import CIFRA_DICTIONARIES, CIFRA_DICTIONARY_ID
+from utils.compressed_text.compressed_text import encode_text, decode_text, codec_from_env
+
+BATCH_SIZE = int(os.getenv('CIFRA_MIGRATION_BATCH_SIZE', '500'))
+
+
+def cifra_is_binary(bind) -> bool:
+    for column in sa.inspect(bind).get_columns('musicas'):
+        if column['name'] == 'cifra':
+            return isinstance(column['type'], sa.LargeBinary)
+    return False
+
+
+def _convert(bind, source, source_type, target, target_type, transform):
+    """Copia source para target em lotes por id, aplicando transform a cada valor"""
+    musicas = sa.table(
+        'musicas',
+        sa.column('id', sa.Integer()),
+        sa.column(source, source_type),
+        sa.column(target, target_type),
+    )
+    update = sa.update(musicas).where(musicas.c.id == sa.bindparam('b_id')).values(
+        {target: sa.bindparam('b_valor', type_=target_type)}
+    )
+
+    ultimo_id = 0
+    convertidas = 0
+    while True:
+        rows = bind.execute(
+            sa.select(musicas.c.id, musicas.c[source]).where(
+                musicas.c.id > ultimo_id
+            ).order_by(musicas.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        valores = [{'b_id': musica_id, 'b_valor': transform(valor)} for musica_id, valor in rows if valor is not None]
+        if valores:
+            bind.execute(update, valores)
+        ultimo_id = rows[-1][0]
+        convertidas += len(rows)
+        print(f"cifras convertidas: {convertidas}")
+
+
+def _swap_columns(op, bind, novo_tipo, transform, source_type):
+    op.add_column('musicas', sa.Column('cifra_nova', novo_tipo, nullable=True))
+    _convert(bind, 'cifra', source_type, 'cifra_nova', novo_tipo, transform)
+    op.drop_column('musicas', 'cifra')
+    op.alter_column('musicas', 'cifra_nova', new_column_name='cifra')
+
+
+def store_as_text(op, bind) -> bool:
+    """Decode a binary cifra column back to TEXT; returns False when it already is text"""
+    if not cifra_is_binary(bind):
+        return False
+    _swap_columns(op, bind, sa.Text(), lambda valor: decode_text(valor, CIFRA_DICTIONARIES), sa.LargeBinary())
+    return True
+
+
+def store_compressed(op, bind, codec: str, level=None) -> bool:
+    """Encode a TEXT cifra column into the binary format; returns False when it already is binary
+
+    Rows of a column that is already binary keep their codec: the read path understands all of them.
+    """
+    if cifra_is_binary(bind):
+        return False
+    dictionary = CIFRA_DICTIONARIES[CIFRA_DICTIONARY_ID]
+    _swap_columns(
+        op, bind, sa.LargeBinary(),
+        lambda cifra: encode_text(cifra, codec, level, dictionary, CIFRA_DICTIONARY_ID),
+        sa.Text()
+    )
+    return True
+
+
+def reconcile_cifra_column(op, bind) -> bool:
+    """Make the column match CIFRA_COMPRESSION: TEXT for none, binary for zlib/zstd"""
+    codec = codec_from_env('CIFRA_COMPRESSION')
+    if codec == 'none':
+        return store_as_text(op, bind)
+    level = int(os.getenv('CIFRA_COMPRESSION_LEVEL')) if os.getenv('CIFRA_COMPRESSION_LEVEL') else None
+    return store_compressed(op, bind, codec, level)
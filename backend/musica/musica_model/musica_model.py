@@ -1,14 +1,38 @@
 from datetime import datetime
+import os
 from app import db
+from sqlalchemy.orm import deferred
+from utils.sparse_fields.sparse_fields import select_fields
+from utils.compressed_text.compressed_text import CompressedText, codec_from_env
+from musica.musica_model.cifra_dictionary import CIFRA_DICTIONARIES, CIFRA_DICTIONARY_ID
+
+# Compressão da cifra (opcional): CIFRA_COMPRESSION=none|zlib|zstd e CIFRA_COMPRESSION_LEVEL
+CIFRA_COMPRESSION = codec_from_env('CIFRA_COMPRESSION')
+CIFRA_COMPRESSION_LEVEL = int(os.getenv('CIFRA_COMPRESSION_LEVEL')) if os.getenv('CIFRA_COMPRESSION_LEVEL') else None
 
 class Musica(db.Model):
     __tablename__ = 'musicas'
+    __table_args__ = (
+        db.Index('ix_musicas_updated_at_id', 'updated_at', 'id'),
+    )
+    
+    # Campos aceitos em ?fields=
+    DICT_FIELDS = (
+        'id', 'nome', 'artista', 'link_musica', 'cifra', 'velocidade_rolamento', 'created_at', 'updated_at'
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     nome = db.Column(db.String(255), nullable=True)
     artista = db.Column(db.String(255), nullable=True)
-    link_musica = db.Column(db.String(500), nullable=False)
-    cifra = db.Column(db.Text, nullable=True)
+    link_musica = db.Column(db.String(500), nullable=False, unique=True, index=True)
+    # TEXT sem compressão; binária só quando a compressão está ligada (ver cifra_storage.py).
+    # Adiada: só é lida (e descomprimida) pelas consultas que devolvem a cifra, via MusicaService.load_options
+    cifra = deferred(db.Column(CompressedText(
+        CIFRA_COMPRESSION, CIFRA_COMPRESSION_LEVEL, CIFRA_DICTIONARIES, CIFRA_DICTIONARY_ID
+    ) if CIFRA_COMPRESSION != 'none' else db.Text, nullable=True))
+    cifra_hash = db.Column(db.String(64), nullable=True)  # hash da cifra no último scrape da origem
+    # Cifra já analisada (linhas, acordes com colunas, seções), gerada ao gravar; lida só com ?format=structured
+    cifra_estruturada = deferred(db.Column(db.JSON, nullable=True))
     velocidade_rolamento = db.Column(db.Float, nullable=True, default=1.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -16,15 +40,24 @@ class Musica(db.Model):
     def __repr__(self):
         return f'<Musica {self.nome}>'
     
-    def to_dict(self):
-        """Convert model to dictionary for JSON serialization"""
-        return {
+    def to_dict(self, fields=None, estruturada=False):
+        """Convert model to dictionary for JSON serialization (only the given fields, when informed)
+
+        With estruturada=True the cifra goes out as cifra_estruturada instead of the raw text.
+        """
+        data = select_fields({
             'id': self.id,
             'nome': self.nome,
             'artista': self.artista,
             'link_musica': self.link_musica,
-            'cifra': self.cifra,
             'velocidade_rolamento': self.velocidade_rolamento,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }, fields)
+        # Só acessa a cifra se ela foi pedida: com a coluna adiada, isso evitaria uma consulta por linha
+        if fields is None or 'cifra' in fields:
+            if estruturada:
+                data['cifra_estruturada'] = self.cifra_estruturada
+            else:
+                data['cifra'] = self.cifra
+        return data
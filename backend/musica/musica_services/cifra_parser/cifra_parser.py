@@ -0,0 +1,116 @@
+import re
+import unicodedata
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Acorde: tônica, acidente, qualidade, extensões, alterações entre parênteses e baixo invertido
+CHORD_PATTERN = (
+    r'[A-G](?:#|b)?'
+    r'(?:maj|min|m|dim|aug|sus|add|M|º|°|\+)?'
+    r'[0-9]*'
+    r'(?:(?:maj|sus|add|dim|aug)?[#b+\-]?[0-9]+)*'
+    r'(?:\([^)\s]*\))?'
+    r'(?:/[A-G](?:#|b)?)?'
+)
+CHORD_RE = re.compile(rf'^{CHORD_PATTERN}$')
+SECTION_RE = re.compile(r'^\s*\[([^\]]+)\]')
+TOKEN_RE = re.compile(r'\S+')
+WORD_RE = re.compile(r'\w+')
+
+# Tokens que podem aparecer em linhas de acordes sem torná-las letra
+_CHORD_LINE_NOISE = {'|', '||', '-', '/', '(', ')', 'x', '2x', '3x', '4x', '(2x)', '(3x)', '(4x)'}
+
+_FLAT_TO_SHARP = {
+    'Cb': 'B', 'Db': 'C#', 'Eb': 'D#', 'Fb': 'E', 'Gb': 'F#', 'Ab': 'G#', 'Bb': 'A#',
+}
+
+LINE_EMPTY = 'vazia'
+LINE_SECTION = 'secao'
+LINE_CHORDS = 'acordes'
+LINE_LYRICS = 'letra'
+
+
+def is_chord(token: str) -> bool:
+    return bool(CHORD_RE.match(token))
+
+
+def _normalize_note(note: str) -> str:
+    return _FLAT_TO_SHARP.get(note, note)
+
+
+def normalize_chord(chord: str) -> str:
+    """Normaliza enarmonias (bemóis viram sustenidos) na tônica e no baixo"""
+    root_len = 2 if len(chord) > 1 and chord[1] in '#b' else 1
+    root, rest = chord[:root_len], chord[root_len:]
+
+    bass = ''
+    if '/' in rest:
+        rest, bass = rest.rsplit('/', 1)
+        bass = '/' + _normalize_note(bass)
+    return _normalize_note(root) + rest + bass
+
+
+def normalize_word(word: str) -> str:
+    """Remove acentos e converte para minúsculas"""
+    decomposed = unicodedata.normalize('NFKD', word)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def parse_line(line: str) -> Tuple[str, str, List[Tuple[str, int]]]:
+    """Classifica a linha e retorna (tipo, seção, tokens com suas colunas)
+
+    Uma linha de acordes pode começar com o marcador de seção, ex: "[Intro] Am F C G".
+    """
+    if not line.strip():
+        return LINE_EMPTY, None, []
+
+    section = None
+    offset = 0
+    match = SECTION_RE.match(line)
+    if match:
+        section = match.group(1).strip()
+        offset = match.end()
+
+    tokens = [(m.group(), m.start() + offset) for m in TOKEN_RE.finditer(line[offset:])]
+    if not tokens:
+        return LINE_SECTION, section, []
+
+    chords = [(t, col) for t, col in tokens if t not in _CHORD_LINE_NOISE]
+    if chords and all(is_chord(t) for t, _ in chords):
+        return LINE_CHORDS, section, chords
+
+    words = [(m.group(), m.start()) for m in WORD_RE.finditer(line)]
+    return LINE_LYRICS, section, words
+
+
+def parse_lines(cifra: str) -> Iterator[Tuple[int, str, str, List[Tuple[str, int]]]]:
+    """Percorre a cifra linha a linha, produzindo (índice da linha, tipo, seção, tokens)"""
+    for index, line in enumerate((cifra or '').splitlines()):
+        kind, section, tokens = parse_line(line)
+        yield index, kind, section, tokens
+
+
+# Versão do formato de structure_cifra; mude ao alterar a estrutura gravada
+STRUCTURED_VERSION = 1
+
+
+def structure_cifra(cifra: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Representação estruturada da cifra, pronta para renderizar sem regex no cliente
+
+    Cada linha traz o texto original e o tipo; linhas de acordes trazem cada acorde com a
+    coluna em que aparece no texto, e marcadores como "[Refrão]" viram entradas de seções.
+    """
+    if cifra is None:
+        return None
+
+    linhas: List[Dict[str, Any]] = []
+    secoes: List[Dict[str, Any]] = []
+    texto_linhas = cifra.splitlines()
+    for index, kind, section, tokens in parse_lines(cifra):
+        linha: Dict[str, Any] = {'tipo': kind, 'texto': texto_linhas[index]}
+        if section:
+            linha['secao'] = section
+            secoes.append({'nome': section, 'linha': index})
+        if kind == LINE_CHORDS:
+            linha['acordes'] = [{'acorde': acorde, 'coluna': coluna} for acorde, coluna in tokens]
+        linhas.append(linha)
+    return {'versao': STRUCTURED_VERSION, 'secoes': secoes, 'linhas': linhas}
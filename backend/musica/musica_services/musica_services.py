@@ -1,10 +1,29 @@
 from app import db
 from musica.musica_model.musica_model import Musica
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import or_
+from sqlalchemy import delete, func
+from sqlalchemy.orm import undefer
+from search_index.search_index_services.search_index_services import SearchIndexService
+from cifra_index.cifra_index_services.cifra_index_services import CifraIndexService
+from utils.keyset_pagination.keyset_pagination import paginate_keyset, KeysetPage
+from utils.sparse_fields.sparse_fields import parse_fields
+from suggest.suggest_services.suggest_services import SuggestService
 from musica.musica_services.search_music_by_url.search_music_by_url import search_music_by_url
+from musica.musica_services.cifra_parser.cifra_parser import structure_cifra
+from musica.musica_services.search_music_by_url.scrape_timings import ScrapeTimings, scrape_histograms
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
 import re
-from typing import Dict
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import datetime
+
+BULK_IMPORT_CONCURRENCY = int(os.getenv('BULK_IMPORT_CONCURRENCY', '4'))
+BULK_IMPORT_BATCH_SIZE = int(os.getenv('BULK_IMPORT_BATCH_SIZE', '50'))
+BULK_IMPORT_MAX_LINKS = int(os.getenv('BULK_IMPORT_MAX_LINKS', '200'))
+BULK_DELETE_MAX_IDS = int(os.getenv('BULK_DELETE_MAX_IDS', '1000'))
+# Linhas buscadas por vez do cursor do servidor nas respostas em streaming
+STREAM_YIELD_PER = int(os.getenv('STREAM_YIELD_PER', '200'))
 
 class MusicaService:
     
@@ -18,6 +37,13 @@ class MusicaService:
             return match.group(1).strip(), match.group(2).strip()  # nome da música, artista
         return None, None
 
+    @staticmethod
+    def hash_cifra(cifra):
+        """Hash da cifra como veio da origem, usado pelo recrawl para detectar mudanças na página"""
+        if cifra is None:
+            return None
+        return hashlib.sha256(cifra.encode('utf-8')).hexdigest()
+
     
     @staticmethod
     def create_musica(data):
@@ -25,34 +51,186 @@ class MusicaService:
         
         MusicaService._validate_exists_music_in_app(link_musica)
         
-        search_music: Dict = search_music_by_url(link_musica)
+        timings = ScrapeTimings()
+        search_music: Dict = search_music_by_url(link_musica, timings)
         
         if not search_music:
+            timings.log(link_musica)
             raise Exception("Cifra não encontrada")
         
-        title_music: str = search_music.get('titulo')
-        nome, artista = MusicaService._extract_artist_and_name(title_music)
         """Create a new musica"""
         try:
-            musica = Musica(
-                nome=nome,
-                artista=artista,
-                link_musica=data.get('link_musica'),
-                cifra=search_music.get('cifra')
-            )
+            musica = MusicaService._build_musica(link_musica, search_music)
             
-            db.session.add(musica)
-            db.session.commit()
+            with timings.stage('db_insert'):
+                db.session.add(musica)
+                db.session.flush()
+                CifraIndexService.index_musica(musica)
+                db.session.commit()
+            timings.log(link_musica, search_music.get('metodo'))
+            SuggestService.on_musica_saved(musica)
+
+            # Caminho usado na extração (http ou selenium), apenas para a resposta
+            musica.metodo_extracao = search_music.get('metodo')
             return musica
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Erro ao criar música: {str(e)}")
     
     @staticmethod
-    def get_all_musicas(page=1, per_page=10):
+    def _build_musica(link_musica: str, search_music: Dict) -> Musica:
+        title_music: str = search_music.get('titulo')
+        nome, artista = MusicaService._extract_artist_and_name(title_music)
+        return Musica(
+            nome=nome,
+            artista=artista,
+            link_musica=link_musica,
+            cifra=search_music.get('cifra'),
+            cifra_hash=MusicaService.hash_cifra(search_music.get('cifra')),
+            cifra_estruturada=structure_cifra(search_music.get('cifra'))
+        )
+    
+    @staticmethod
+    def _scrape_safely(link_musica: str):
+        try:
+            return search_music_by_url(link_musica), None
+        except Exception as e:
+            return None, str(e)
+    
+    @staticmethod
+    def create_musicas_bulk(links: List[str]) -> List[Dict[str, Any]]:
+        """Import many musicas at once, scraping in parallel and inserting in batches"""
+        if not isinstance(links, list) or len(links) == 0:
+            raise Exception("Lista de links é obrigatória")
+        if len(links) > BULK_IMPORT_MAX_LINKS:
+            raise Exception(f"Máximo de {BULK_IMPORT_MAX_LINKS} links por importação")
+        
+        resultados: Dict[str, Dict[str, Any]] = {}
+        pendentes: List[str] = []
+        for link in links:
+            if not isinstance(link, str) or not link.strip():
+                continue
+            link = link.strip()
+            if link in resultados:
+                continue
+            resultados[link] = {'link_musica': link, 'status': 'pendente', 'musica_id': None}
+            pendentes.append(link)
+        
+        if not pendentes:
+            raise Exception("Lista de links é obrigatória")
+        
+        # Uma única consulta para descartar os links que já existem
+        try:
+            existentes = Musica.query.with_entities(Musica.id, Musica.link_musica).filter(
+                Musica.link_musica.in_(pendentes)
+            ).all()
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar músicas: {str(e)}")
+        
+        for musica_id, link in existentes:
+            resultados[link].update({'status': 'existente', 'musica_id': musica_id})
+        pendentes = [link for link in pendentes if resultados[link]['status'] == 'pendente']
+        
+        # Scrape concorrente, limitado por BULK_IMPORT_CONCURRENCY
+        novas: List[Tuple[str, Dict]] = []
+        if pendentes:
+            with ThreadPoolExecutor(max_workers=min(BULK_IMPORT_CONCURRENCY, len(pendentes))) as executor:
+                scrapes = list(executor.map(MusicaService._scrape_safely, pendentes))
+            
+            for link, (search_music, erro) in zip(pendentes, scrapes):
+                if not search_music:
+                    resultados[link].update({'status': 'falha', 'erro': erro or "Cifra não encontrada"})
+                    continue
+                resultados[link]['metodo_extracao'] = search_music.get('metodo')
+                novas.append((link, search_music))
+        
+        # Inserção em lotes, um commit por lote
+        for inicio in range(0, len(novas), BULK_IMPORT_BATCH_SIZE):
+            lote = novas[inicio:inicio + BULK_IMPORT_BATCH_SIZE]
+            try:
+                criadas = MusicaService._insert_batch(lote)
+            except SQLAlchemyError:
+                db.session.rollback()
+                # Uma linha em conflito (ex.: link criado por outra importação) derrubou o lote:
+                # refaz uma a uma para que só ela fique com o erro
+                criadas = MusicaService._insert_row_by_row(lote, resultados)
+            for musica in criadas:
+                resultados[musica.link_musica].update({'status': 'criada', 'musica_id': musica.id})
+                SuggestService.on_musica_saved(musica)
+        
+        return list(resultados.values())
+    
+    @staticmethod
+    def _insert_batch(lote: List[Tuple[str, Dict]]) -> List[Musica]:
+        musicas = [MusicaService._build_musica(link, search_music) for link, search_music in lote]
+        with ScrapeTimings().stage('db_insert'):
+            db.session.add_all(musicas)
+            db.session.flush()
+            for musica in musicas:
+                CifraIndexService.index_musica(musica)
+            db.session.commit()
+        return musicas
+    
+    @staticmethod
+    def _insert_row_by_row(lote: List[Tuple[str, Dict]], resultados: Dict[str, Dict[str, Any]]) -> List[Musica]:
+        """Insert each musica in its own SAVEPOINT, marking only the rows that fail; one commit at the end"""
+        criadas: List[Musica] = []
+        for link, search_music in lote:
+            musica = MusicaService._build_musica(link, search_music)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(musica)
+                    db.session.flush()
+                    CifraIndexService.index_musica(musica)
+                criadas.append(musica)
+            except SQLAlchemyError as e:
+                resultados[link].update({'status': 'falha', 'erro': f"Erro ao criar música: {str(e)}"})
+        
+        try:
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            for musica in criadas:
+                resultados[musica.link_musica].update({'status': 'falha', 'erro': f"Erro ao criar música: {str(e)}"})
+            return []
+        return criadas
+    
+    @staticmethod
+    def get_scrape_metrics() -> Dict[str, Any]:
+        """Histograms (in seconds) of each import stage since the process started"""
+        return scrape_histograms.snapshot()
+    
+    @staticmethod
+    def parse_fields(raw: Optional[str]) -> Optional[List[str]]:
+        """Parse the ?fields= parameter of the musica endpoints"""
+        return parse_fields(raw, Musica.DICT_FIELDS)
+    
+    @staticmethod
+    def parse_format(raw: Optional[str]) -> bool:
+        """Parse the ?format= parameter: True for format=structured, False for the raw cifra text"""
+        if raw is None or raw == 'text':
+            return False
+        if raw == 'structured':
+            return True
+        raise Exception(f"Formato inválido: {raw} (use text ou structured)")
+    
+    @staticmethod
+    def load_options(fields: Optional[List[str]] = None, estruturada: bool = False) -> List[Any]:
+        """Query options for the requested fields: only the cifra form that will be returned is read
+
+        Both cifra columns are deferred, so every other query skips reading and decompressing them.
+        """
+        if fields is not None and 'cifra' not in fields:
+            return []
+        if estruturada:
+            return [undefer(Musica.cifra_estruturada)]
+        return [undefer(Musica.cifra)]
+    
+    @staticmethod
+    def get_all_musicas(page=1, per_page=10, fields=None):
         """Get all musicas with pagination"""
         try:
-            paginated_musicas = Musica.query.order_by(Musica.updated_at.desc()).paginate(
+            paginated_musicas = Musica.query.options(*MusicaService.load_options(fields)).order_by(Musica.updated_at.desc()).paginate(
                 page=page,
                 per_page=per_page,
                 error_out=False
@@ -62,10 +240,32 @@ class MusicaService:
             raise Exception(f"Erro ao buscar músicas: {str(e)}")
     
     @staticmethod
-    def get_musica_by_id(musica_id):
+    def get_all_musicas_keyset(cursor=None, per_page=10, include_total=False, fields=None) -> KeysetPage:
+        """Get all musicas with cursor pagination on (updated_at, id)"""
+        try:
+            return paginate_keyset(
+                Musica.query.options(*MusicaService.load_options(fields)),
+                [(Musica.updated_at, True), (Musica.id, True)],
+                cursor,
+                per_page,
+                lambda musica: [musica.updated_at, musica.id],
+                include_total
+            )
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar músicas: {str(e)}")
+    
+    @staticmethod
+    def iter_all_musicas(fields=None):
+        """Iterate over every musica, fetched from a server-side cursor in chunks of STREAM_YIELD_PER"""
+        return Musica.query.options(*MusicaService.load_options(fields)).order_by(
+            Musica.updated_at.desc(), Musica.id.desc()
+        ).yield_per(STREAM_YIELD_PER)
+    
+    @staticmethod
+    def get_musica_by_id(musica_id, fields=None, estruturada=False):
         """Get musica by ID"""
         try:
-            musica = Musica.query.get(musica_id)
+            musica = Musica.query.options(*MusicaService.load_options(fields, estruturada)).get(musica_id)
             if not musica:
                 raise Exception("Música não encontrada")
             return musica
@@ -74,23 +274,37 @@ class MusicaService:
     
     
     @staticmethod
-    def search_musicas_by_name(search_term, page=1, per_page=10):
-        """Search musicas by name"""
+    def get_musica_version(musica_id) -> datetime:
+        """updated_at of a musica, read without loading the row (validator for conditional GETs)"""
         try:
-            paginated_musicas = Musica.query.filter(
-                or_(
-                    Musica.nome.ilike(f'%{search_term}%'),
-                    Musica.artista.ilike(f'%{search_term}%')
-                )
-            ).paginate(
-                page=page,
-                per_page=per_page,
-                error_out=False
-            )
-            return paginated_musicas
+            updated_at = db.session.query(Musica.updated_at).filter(Musica.id == musica_id).scalar()
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar música: {str(e)}")
+        if updated_at is None:
+            raise Exception("Música não encontrada")
+        return updated_at
+    
+    @staticmethod
+    def get_collection_version() -> Tuple[Optional[datetime], int]:
+        """(max(updated_at), count) of all musicas, the validator of the list endpoints"""
+        try:
+            return tuple(db.session.query(func.max(Musica.updated_at), func.count(Musica.id)).one())
         except SQLAlchemyError as e:
             raise Exception(f"Erro ao buscar músicas: {str(e)}")
     
+    @staticmethod
+    def search_musicas_by_name(search_term, page=1, per_page=10, fields=None):
+        """Search musicas by name or artist (accent-insensitive, ranked by relevance)"""
+        try:
+            return SearchIndexService.search_musicas(search_term, page, per_page, MusicaService.load_options(fields))
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar músicas: {str(e)}")
+    
+    @staticmethod
+    def search_musicas_by_content(search_term, page=1, per_page=10, fields=None):
+        """Search musicas by lyric fragment or chord progression inside the cifra"""
+        return CifraIndexService.search_content(search_term, page, per_page, fields)
+    
     @staticmethod
     def update_musica(musica_id, data):
         """Update musica by ID"""
@@ -101,9 +315,12 @@ class MusicaService:
             
             musica.link_musica = data['link_musica']
             musica.cifra = data['cifra']
+            musica.cifra_estruturada = structure_cifra(data['cifra'])
             musica.velocidade_rolamento = data['velocidade_rolamento']
             
+            CifraIndexService.index_musica(musica)
             db.session.commit()
+            SuggestService.on_musica_saved(musica)
             return musica
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -112,17 +329,42 @@ class MusicaService:
     @staticmethod
     def delete_musica(musica_id):
         """Delete musica by ID"""
+        deletadas = MusicaService._delete_musicas_by_ids([musica_id])
+        if not deletadas:
+            raise Exception("Música não encontrada")
+        return True
+    
+    @staticmethod
+    def delete_musicas_bulk(ids: List[int]) -> Dict[str, Any]:
+        """Delete many musicas in a single statement"""
+        if not isinstance(ids, list) or len(ids) == 0:
+            raise Exception("Lista de ids é obrigatória")
+        if len(ids) > BULK_DELETE_MAX_IDS:
+            raise Exception(f"Máximo de {BULK_DELETE_MAX_IDS} ids por remoção")
+        if not all(isinstance(musica_id, int) for musica_id in ids):
+            raise Exception("Os ids devem ser números inteiros")
+        
+        deletadas = MusicaService._delete_musicas_by_ids(ids)
+        return {
+            'deletadas': sorted(deletadas),
+            'nao_encontradas': sorted(set(ids) - set(deletadas))
+        }
+    
+    @staticmethod
+    def _delete_musicas_by_ids(ids: List[int]) -> List[int]:
+        # Um único DELETE; o banco remove relações e índice da cifra via ON DELETE CASCADE
         try:
-            musica = Musica.query.get(musica_id)
-            if not musica:
-                raise Exception("Música não encontrada")
-            
-            db.session.delete(musica)
+            deletadas = db.session.execute(
+                delete(Musica).where(Musica.id.in_(ids)).returning(Musica.id)
+            ).scalars().all()
             db.session.commit()
-            return True
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Erro ao deletar música: {str(e)}")
+        
+        for musica_id in deletadas:
+            SuggestService.on_musica_deleted(musica_id)
+        return deletadas
     
     @staticmethod
     def get_musicas_count():
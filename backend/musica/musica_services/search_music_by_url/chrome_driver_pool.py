@@ -0,0 +1,191 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+
+class _PooledDriver:
+    """Sessão do Chrome mantida pelo pool, com contadores de uso"""
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.pages_served = 0
+        self.last_used = time.monotonic()
+
+
+class ChromeDriverPool:
+    """Pool limitado de sessões headless do Chrome reutilizadas entre os scrapes"""
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_pages: int = 50,
+        idle_timeout: float = 300.0,
+        acquire_timeout: float = 30.0,
+    ):
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: Deque[_PooledDriver] = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._driver_path: Optional[str] = None
+        self._reaper: Optional[threading.Thread] = None
+        self._stop_reaper = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> 'ChromeDriverPool':
+        return cls(
+            size=int(os.getenv('CHROME_POOL_SIZE', '2')),
+            max_pages=int(os.getenv('CHROME_POOL_MAX_PAGES', '50')),
+            idle_timeout=float(os.getenv('CHROME_POOL_IDLE_TIMEOUT', '300')),
+            acquire_timeout=float(os.getenv('CHROME_POOL_ACQUIRE_TIMEOUT', '30')),
+        )
+
+    def _get_driver_path(self) -> str:
+        # O ChromeDriverManager só é consultado uma vez por processo
+        with self._lock:
+            if self._driver_path is None:
+                self._driver_path = ChromeDriverManager().install()
+            return self._driver_path
+
+    def _create_driver(self) -> _PooledDriver:
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless')  # Executa sem interface gráfica
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+
+        service = Service(self._get_driver_path())
+        return _PooledDriver(webdriver.Chrome(service=service, options=options))
+
+    @staticmethod
+    def _is_healthy(pooled: _PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script('return 1')
+            return True
+        except WebDriverException:
+            return False
+
+    @staticmethod
+    def _quit(pooled: _PooledDriver) -> None:
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            print(f"Erro ao encerrar o Chrome: {e}")
+
+    def _take_idle(self) -> Optional[_PooledDriver]:
+        """Retira uma sessão ociosa saudável, descartando as expiradas ou mortas"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                pooled = self._idle.pop()
+
+            expired = time.monotonic() - pooled.last_used > self.idle_timeout
+            if not expired and self._is_healthy(pooled):
+                return pooled
+            self._quit(pooled)
+
+    def _release(self, pooled: _PooledDriver, failed: bool) -> None:
+        pooled.pages_served += 1
+        pooled.last_used = time.monotonic()
+
+        # Um erro durante o scrape só descarta a sessão se o navegador tiver caído
+        crashed = failed and not self._is_healthy(pooled)
+        if crashed or pooled.pages_served >= self.max_pages:
+            self._quit(pooled)
+            return
+
+        try:
+            # Limpa o estado da sessão antes de devolvê-la ao pool
+            pooled.driver.delete_all_cookies()
+            pooled.driver.get('about:blank')
+        except WebDriverException:
+            self._quit(pooled)
+            return
+
+        with self._lock:
+            self._idle.append(pooled)
+            self._start_reaper()
+
+    @contextmanager
+    def driver(self):
+        """Empresta uma sessão do Chrome do pool durante o bloco `with`"""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise Exception("Nenhum navegador disponível no momento, tente novamente")
+
+        pooled: Optional[_PooledDriver] = None
+        failed = False
+        try:
+            self.evict_idle()
+            pooled = self._take_idle() or self._create_driver()
+            yield pooled.driver
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if pooled is not None:
+                self._release(pooled, failed)
+            self._slots.release()
+
+    def evict_idle(self) -> int:
+        """Encerra as sessões ociosas há mais tempo que idle_timeout"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [p for p in self._idle if now - p.last_used > self.idle_timeout]
+            for pooled in expired:
+                self._idle.remove(pooled)
+
+        for pooled in expired:
+            self._quit(pooled)
+        return len(expired)
+
+    def warm_up(self, count: Optional[int] = None) -> None:
+        """Abre sessões antecipadamente para que o primeiro scrape não pague a inicialização"""
+        count = self.size if count is None else min(count, self.size)
+        for _ in range(count - len(self._idle)):
+            pooled = self._create_driver()
+            with self._lock:
+                self._idle.append(pooled)
+                self._start_reaper()
+
+    def _start_reaper(self) -> None:
+        # Chamado com o lock: a thread só existe depois que alguma sessão ficou ociosa
+        if self._reaper is None and self.idle_timeout > 0 and not self._stop_reaper.is_set():
+            self._reaper = threading.Thread(target=self._reap, name='chrome-pool-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap(self) -> None:
+        # Sem scrapes, ninguém chamaria evict_idle e os Chromes ociosos ficariam abertos
+        while not self._stop_reaper.wait(self.idle_timeout / 2):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                print(f"Erro ao encerrar sessões ociosas do Chrome: {e}")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._stop_reaper.set()
+            reaper, self._reaper = self._reaper, None
+            idle = list(self._idle)
+            self._idle.clear()
+
+        if reaper is not None and reaper is not threading.current_thread():
+            reaper.join(timeout=5)
+
+        for pooled in idle:
+            self._quit(pooled)
+
+
+chrome_driver_pool = ChromeDriverPool.from_env()
+atexit.register(chrome_driver_pool.shutdown)
@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+_DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'instance', 'scrape_cache.sqlite3'
+)
+
+
+def normalize_url(url: str) -> str:
+    """Normaliza a URL para servir de chave do cache (host minúsculo, sem fragmento nem barra final)"""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+
+class ScrapeCache:
+    """Cache persistente em SQLite do resultado dos scrapes, com TTL e despejo LRU por tamanho"""
+
+    def __init__(self, path: str, ttl: float, max_bytes: int):
+        self.path = os.path.abspath(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @classmethod
+    def from_env(cls) -> 'ScrapeCache':
+        return cls(
+            path=os.getenv('SCRAPE_CACHE_PATH', _DEFAULT_PATH),
+            ttl=float(os.getenv('SCRAPE_CACHE_TTL', str(7 * 24 * 3600))),
+            max_bytes=int(float(os.getenv('SCRAPE_CACHE_MAX_MB', '200')) * 1024 * 1024),
+        )
+
+    def _create_schema(self) -> None:
+        with self._init_lock:
+            if self._initialized:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            try:
+                conn.execute(
+                    '''CREATE TABLE IF NOT EXISTS scrape_cache (
+                        url TEXT PRIMARY KEY,
+                        titulo TEXT,
+                        cifra TEXT,
+                        html TEXT,
+                        metodo TEXT,
+                        etag TEXT,
+                        last_modified TEXT,
+                        tamanho INTEGER NOT NULL,
+                        fetched_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )'''
+                )
+                conn.execute('CREATE INDEX IF NOT EXISTS ix_scrape_cache_last_access ON scrape_cache (last_access)')
+                conn.commit()
+            finally:
+                conn.close()
+            self._initialized = True
+
+    @contextmanager
+    def _connect(self):
+        self._create_schema()
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Retorna a entrada do cache (mesmo expirada) com o campo `fresco` indicando o TTL"""
+        key = normalize_url(url)
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT * FROM scrape_cache WHERE url = ?', (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute('UPDATE scrape_cache SET last_access = ? WHERE url = ?', (time.time(), key))
+        except sqlite3.Error as e:
+            print(f"Erro ao ler o cache de scrape: {e}")
+            return None
+
+        entry = dict(row)
+        entry['fresco'] = time.time() - entry['fetched_at'] < self.ttl
+        return entry
+
+    def put(
+        self,
+        url: str,
+        resultado: Dict[str, Any],
+        html: Optional[str],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        key = normalize_url(url)
+        tamanho = len(html or '') + len(resultado.get('cifra') or '')
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    '''INSERT OR REPLACE INTO scrape_cache
+                       (url, titulo, cifra, html, metodo, etag, last_modified, tamanho, fetched_at, last_access)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                    (key, resultado.get('titulo'), resultado.get('cifra'), html, resultado.get('metodo'),
+                     etag, last_modified, tamanho, now, now)
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar o cache de scrape: {e}")
+
+    def touch(self, url: str) -> None:
+        """Marca a entrada como revalidada (resposta 304), renovando o TTL"""
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'UPDATE scrape_cache SET fetched_at = ?, last_access = ? WHERE url = ?',
+                    (now, now, normalize_url(url))
+                )
+        except sqlite3.Error as e:
+            print(f"Erro ao gravar o cache de scrape: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # Remove as entradas acessadas há mais tempo até caber em max_bytes
+        total = conn.execute('SELECT COALESCE(SUM(tamanho), 0) FROM scrape_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excesso = total - self.max_bytes
+        for url, tamanho in conn.execute('SELECT url, tamanho FROM scrape_cache ORDER BY last_access').fetchall():
+            if excesso <= 0:
+                break
+            conn.execute('DELETE FROM scrape_cache WHERE url = ?', (url,))
+            excesso -= tamanho
+
+
+SCRAPE_CACHE_ENABLED = os.getenv('SCRAPE_CACHE_ENABLED', 'true').lower() == 'true'
+scrape_cache = ScrapeCache.from_env()
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Any
+
+# Limites superiores (em segundos) dos buckets dos histogramas
+BUCKETS: List[float] = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+
+class _Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        index = len(BUCKETS)
+        for i, limite in enumerate(BUCKETS):
+            if seconds <= limite:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f'le_{limite}': n for limite, n in zip(BUCKETS, self.counts)}
+        buckets['le_inf'] = self.counts[-1]
+        return {
+            'count': self.count,
+            'sum': round(self.total, 4),
+            'avg': round(self.total / self.count, 4) if self.count else None,
+            'max': round(self.max, 4),
+            'buckets': buckets
+        }
+
+
+class ScrapeHistograms:
+    """Histogramas por etapa, acumulados durante a vida do processo"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, _Histogram] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._histograms.setdefault(stage, _Histogram()).observe(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {stage: h.to_dict() for stage, h in self._histograms.items()}
+
+
+scrape_histograms = ScrapeHistograms()
+
+
+class ScrapeTimings:
+    """Tempos das etapas de uma importação (driver, navegação, DOM pronto, parse, insert)"""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._inicio = time.perf_counter()
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        scrape_histograms.observe(stage, seconds)
+
+    @contextmanager
+    def stage(self, stage: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - inicio)
+
+    def log(self, url: str, metodo: str = None) -> None:
+        total = time.perf_counter() - self._inicio
+        scrape_histograms.observe('total', total)
+        print("Tempos do scrape: " + json.dumps({
+            'url': url,
+            'metodo': metodo,
+            'total_ms': round(total * 1000, 1),
+            'etapas_ms': {stage: round(s * 1000, 1) for stage, s in self.stages.items()}
+        }))
@@ -1,68 +1,229 @@
-
-
-
+import os
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
+from musica.musica_services.search_music_by_url.chrome_driver_pool import chrome_driver_pool
+from musica.musica_services.search_music_by_url.scrape_cache import scrape_cache, SCRAPE_CACHE_ENABLED
+from musica.musica_services.search_music_by_url.scrape_timings import ScrapeTimings
+from selenium.common.exceptions import TimeoutException, WebDriverException
 import time
 
-def search_music_by_url(url):
-    """Extrai a cifra usando Selenium para aguardar o carregamento do JavaScript"""
-    
-    # Configuração do Chrome
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')  # Executa sem interface gráfica
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    
-    # Instala e configura o ChromeDriver automaticamente
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    
+METODO_HTTP = 'http'
+METODO_SELENIUM = 'selenium'
+METODO_CACHE = 'cache'
+
+# Modo offline: responde apenas a partir do cache, sem acessar a rede (testes e benchmarks)
+SCRAPE_CACHE_OFFLINE = os.getenv('SCRAPE_CACHE_OFFLINE', 'false').lower() == 'true'
+
+HTTP_FAST_MODE = os.getenv('SCRAPE_HTTP_FAST_MODE', 'true').lower() == 'true'
+HTTP_TIMEOUT = float(os.getenv('SCRAPE_HTTP_TIMEOUT', '5'))
+
+# Prontidão adaptativa: a cifra está pronta quando o conteúdo para de mudar
+READY_DEADLINE = float(os.getenv('SCRAPE_READY_DEADLINE', '10'))
+READY_POLL_INTERVAL = float(os.getenv('SCRAPE_READY_POLL_INTERVAL', '0.2'))
+READY_STABLE_POLLS = int(os.getenv('SCRAPE_READY_STABLE_POLLS', '2'))
+
+
+def _build_http_session():
+    """Sessão HTTP compartilhada, com keep-alive e conexões reaproveitadas"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=int(os.getenv('SCRAPE_HTTP_POOL_SIZE', '10')))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'User-Agent': (
+            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+            '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+        ),
+        'Accept': 'text/html,application/xhtml+xml',
+        'Accept-Encoding': 'gzip, deflate',
+        'Accept-Language': 'pt-BR,pt;q=0.9',
+    })
+    return session
+
+
+_http_session = _build_http_session()
+
+
+def search_music_by_url(url, timings=None, revalidate=False):
+    """Extrai a cifra da página, consultando o cache, depois o HTML estático e por fim o Selenium
+
+    O dicionário retornado informa em `metodo` qual caminho foi usado ('cache', 'http' ou 'selenium').
+    Se `timings` for informado, os tempos das etapas são acumulados nele e o log fica a cargo de quem chamou.
+    Com `revalidate=True` a entrada do cache é sempre revalidada na origem, mesmo dentro do TTL.
+    """
+    if timings is not None:
+        return _search(url, timings, revalidate)
+
+    timings = ScrapeTimings()
+    resultado = _search(url, timings, revalidate)
+    timings.log(url, resultado.get('metodo') if resultado else None)
+    return resultado
+
+
+def _search(url, timings, revalidate=False):
+    with timings.stage('cache_lookup'):
+        cached = scrape_cache.get(url) if SCRAPE_CACHE_ENABLED else None
+    if cached and ((cached['fresco'] and not revalidate) or SCRAPE_CACHE_OFFLINE):
+        return _from_cache(cached)
+
+    if SCRAPE_CACHE_OFFLINE:
+        print("Cifra não encontrada no cache (modo offline)")
+        return None
+
+    if HTTP_FAST_MODE:
+        resultado, response = _extract_with_http(url, cached, timings)
+
+        # Página não mudou desde o último scrape: renova a entrada do cache
+        if cached and response is not None and response.status_code == 304:
+            scrape_cache.touch(url)
+            return _from_cache(cached)
+
+        if resultado:
+            resultado['metodo'] = METODO_HTTP
+            _store_in_cache(url, resultado, response.text, response.headers)
+            return resultado
+        print("Cifra não encontrada no HTML estático, usando o Selenium...")
+
+    # Empresta uma sessão já aberta do pool em vez de iniciar um Chrome novo
+    inicio = time.perf_counter()
+    try:
+        with chrome_driver_pool.driver() as driver:
+            timings.record('driver_acquire', time.perf_counter() - inicio)
+            resultado, html = _extract_with_driver(driver, url, timings)
+    except WebDriverException as e:
+        # A exceção passou pelo pool, que já descartou a sessão se o navegador caiu
+        print(f"Erro ao carregar a página: {e}")
+        return None
+
+    if resultado:
+        resultado['metodo'] = METODO_SELENIUM
+        _store_in_cache(url, resultado, html)
+    return resultado
+
+
+def _from_cache(cached):
+    return {
+        "titulo": cached['titulo'],
+        "cifra": cached['cifra'],
+        "metodo": METODO_CACHE
+    }
+
+
+def _store_in_cache(url, resultado, html, headers=None):
+    if not SCRAPE_CACHE_ENABLED:
+        return
+    headers = headers or {}
+    scrape_cache.put(
+        url,
+        resultado,
+        html,
+        etag=headers.get('ETag'),
+        last_modified=headers.get('Last-Modified')
+    )
+
+
+def _parse_cifra_html(html):
+    """Extrai título e cifra do HTML; retorna None se a div da cifra estiver ausente ou vazia"""
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Extrai o título da página
+    titulo = soup.title.text if soup.title else "Título não encontrado"
+
+    # Extrai a cifra
+    cifra = soup.find("div", class_="cifra_cnt")
+
+    if not cifra or not cifra.get_text().strip():
+        return None
+
+    return {
+        "titulo": titulo,
+        "cifra": cifra.get_text()
+    }
+
+
+def _extract_with_http(url, cached, timings):
+    """Busca a página via HTTP; com uma entrada expirada no cache, faz uma requisição condicional"""
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    try:
+        with timings.stage('http_fetch'):
+            response = _http_session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        if response.status_code == 304:
+            return None, response
+        response.raise_for_status()
+
+        # Sem charset no Content-Type o requests assume ISO-8859-1 e estraga os acentos; o encoding
+        # detectado pelo conteúdo vale para o parse e para o HTML guardado no cache
+        if 'charset' not in response.headers.get('Content-Type', '').lower():
+            response.encoding = response.apparent_encoding
+
+        with timings.stage('html_parse'):
+            return _parse_cifra_html(response.text), response
+
+    except requests.RequestException as e:
+        print(f"Erro ao buscar a página via HTTP: {e}")
+        return None, None
+
+
+class _CifraContentIsStable:
+    """Condição do WebDriverWait: a div da cifra existe e seu conteúdo não mudou nas últimas leituras"""
+
+    def __init__(self, stable_polls):
+        self.stable_polls = stable_polls
+        self.last_size = None
+        self.unchanged = 0
+
+    def __call__(self, driver):
+        elements = driver.find_elements(By.CLASS_NAME, "cifra_cnt")
+        if not elements:
+            return False
+
+        size = driver.execute_script("return arguments[0].innerHTML.length", elements[0])
+        if size and size == self.last_size:
+            self.unchanged += 1
+        else:
+            self.unchanged = 0
+            self.last_size = size
+        return self.unchanged >= self.stable_polls
+
+
+def _extract_with_driver(driver, url, timings):
     try:
         print("Acessando a página...")
-        driver.get(url)
-        
-        # Aguarda até 10 segundos para o conteúdo carregar
+        with timings.stage('navigation'):
+            driver.get(url)
+
+        # Aguarda até o conteúdo da cifra estabilizar, respeitando o prazo total
         print("Aguardando o carregamento da cifra...")
-        wait = WebDriverWait(driver, 10)
-        
-        # Aguarda o elemento da cifra aparecer
-        wait.until(
-            EC.presence_of_element_located((By.CLASS_NAME, "cifra_cnt"))
-        )
-        
-        # Aguarda um pouco mais para garantir que todo o conteúdo foi carregado
-        time.sleep(2)
-        
+        with timings.stage('dom_ready'):
+            wait = WebDriverWait(driver, READY_DEADLINE, poll_frequency=READY_POLL_INTERVAL)
+            try:
+                wait.until(_CifraContentIsStable(READY_STABLE_POLLS))
+            except TimeoutException:
+                print("Prazo de carregamento esgotado, usando o conteúdo disponível")
+
         # Extrai o HTML da página após o carregamento
-        html = driver.page_source
-        soup = BeautifulSoup(html, "html.parser")
-        
-        # Extrai o título da página
-        titulo = soup.title.text if soup.title else "Título não encontrado"
-        
-        # Extrai a cifra
-        cifra = soup.find("div", class_="cifra_cnt")
-        
+        with timings.stage('html_parse'):
+            html = driver.page_source
+            cifra = _parse_cifra_html(html)
+
         if not cifra:
             print("Cifra não encontrada!")
-            return None
-        
-        return {
-            "titulo": titulo,
-            "cifra": cifra.get_text()
-        }
-
-            
+            return None, None
+
+        return cifra, html
+
+    except WebDriverException:
+        # Propaga para o pool marcar a sessão como falha e reciclá-la se o Chrome caiu
+        raise
     except Exception as e:
         print(f"Erro ao carregar a página: {e}")
-        return None
-        
-    finally:
-        driver.quit()
+        return None, None
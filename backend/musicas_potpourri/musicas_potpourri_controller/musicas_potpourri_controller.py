@@ -1,5 +1,9 @@
 from flask import Blueprint, jsonify, request
 from musicas_potpourri.musicas_potpourri_services.musicas_potpourri_services import MusicasPotpourriService
+from musica.musica_services.musica_services import MusicaService
+from utils.json_provider.json_provider import stream_json_array
+from utils.conditional_get.conditional_get import build_etag, not_modified, add_validators
+from utils.response_compression.response_compression import cached_response
 from typing import Dict, Any
 
 musicas_potpourri_bp = Blueprint('musicas_potpourri_bp', __name__)
@@ -7,17 +11,25 @@ musicas_potpourri_bp = Blueprint('musicas_potpourri_bp', __name__)
 
 @musicas_potpourri_bp.route('/', methods=['POST'])
 def create_musicas_potpourri():
-    """Create a new musicas_potpourri relationship"""
+    """Create a new musicas_potpourri relationship, or many at once when the body is a list"""
     try:
         data: Dict[str, Any] = request.get_json()
         
         if not data:
             return jsonify({'message': 'Dados não fornecidos'}), 400
         
+        if isinstance(data, list):
+            musicas_potpourri_list = MusicasPotpourriService.create_musicas_potpourri_batch(data)
+            return jsonify({
+                'message': 'Relacionamentos música-potpourri criados com sucesso',
+                'musicas_potpourri': MusicasPotpourriService.to_dicts(musicas_potpourri_list),
+                'total': len(musicas_potpourri_list)
+            }), 201
+        
         musicas_potpourri = MusicasPotpourriService.create_musicas_potpourri(data)
         return jsonify({
             'message': 'Relacionamento música-potpourri criado com sucesso',
-            'musicas_potpourri': musicas_potpourri.to_dict()
+            'musicas_potpourri': MusicasPotpourriService.to_dicts([musicas_potpourri])[0]
         }), 201
         
     except Exception as e:
@@ -31,10 +43,27 @@ def get_all_musicas_potpourri():
         page: int = request.args.get('page', 1, type=int)
         per_page: int = request.args.get('per_page', 10, type=int)
         
+        # Validador da coleção: max(updated_at) e total, sem carregar nenhum relacionamento
+        etag: str = build_etag('musicas_potpourri', *MusicasPotpourriService.get_collection_version())
+        nao_modificado = not_modified(etag)
+        if nao_modificado:
+            return nao_modificado
+        
+        # Paginação por cursor (opcional): custo constante por página, sem COUNT por padrão
+        if 'cursor' in request.args:
+            include_total: bool = request.args.get('include_total', '0').lower() in ('1', 'true')
+            keyset_page = MusicasPotpourriService.get_all_musicas_potpourri_keyset(
+                request.args.get('cursor'), per_page, include_total
+            )
+            return add_validators(jsonify({
+                'musicas_potpourri': MusicasPotpourriService.to_dicts(keyset_page.items),
+                'pagination': keyset_page.pagination_dict()
+            }), etag)
+        
         paginated_musicas_potpourri = MusicasPotpourriService.get_all_musicas_potpourri(page, per_page)
-        musicas_potpourri_list = [mp.to_dict() for mp in paginated_musicas_potpourri.items]
+        musicas_potpourri_list = MusicasPotpourriService.to_dicts(paginated_musicas_potpourri.items)
         
-        return jsonify({
+        return add_validators(jsonify({
             'musicas_potpourri': musicas_potpourri_list,
             'pagination': {
                 'page': paginated_musicas_potpourri.page,
@@ -44,7 +73,7 @@ def get_all_musicas_potpourri():
                 'has_next': paginated_musicas_potpourri.has_next,
                 'has_prev': paginated_musicas_potpourri.has_prev
             }
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({'message': str(e)}), 500
@@ -56,7 +85,7 @@ def get_musicas_potpourri_by_id(musicas_potpourri_id: int):
     try:
         musicas_potpourri = MusicasPotpourriService.get_musicas_potpourri_by_id(musicas_potpourri_id)
         return jsonify({
-            'musicas_potpourri': musicas_potpourri.to_dict()
+            'musicas_potpourri': MusicasPotpourriService.to_dicts([musicas_potpourri])[0]
         })
         
     except Exception as e:
@@ -67,23 +96,65 @@ def get_musicas_potpourri_by_id(musicas_potpourri_id: int):
 
 @musicas_potpourri_bp.route('/by-potpourri/<int:potpourri_id>', methods=['GET'])
 def get_musicas_by_potpourri_id(potpourri_id: int):
-    """Get all musicas for a specific potpourri with complete music data"""
+    """Get all musicas for a specific potpourri with complete music data (?fields= filters the music data)"""
     try:
         page: int = request.args.get('page', 1, type=int)
         per_page: int = request.args.get('per_page', 10, type=int)
+        fields = MusicaService.parse_fields(request.args.get('fields'))
+        
+        # Uma consulta agregada decide o 304: mudanças no potpourri, nas relações ou nas músicas
+        updated_at, total = MusicasPotpourriService.get_potpourri_musicas_version(potpourri_id)
+        etag: str = build_etag('musicas_potpourri', potpourri_id, updated_at.isoformat(), total)
+        nao_modificado = not_modified(etag, updated_at)
+        if nao_modificado:
+            return nao_modificado
+        # Corpo desta versão já comprimido em uma requisição anterior
+        em_cache = cached_response(etag)
+        if em_cache:
+            return add_validators(em_cache, etag, updated_at)
+        
+        # Potpourri completo em streaming (opcional): uma música por vez, sem paginação
+        if request.args.get('stream', 'false').lower() == 'true':
+            return add_validators(stream_json_array(
+                'musicas_potpourri',
+                enumerate(MusicasPotpourriService.iter_musicas_by_potpourri_id(potpourri_id, fields), start=1),
+                lambda item: {**item[1][0].to_dict(item[0]), 'musica': item[1][1].to_dict(fields)}
+            ), etag, updated_at)
+        
+        # Paginação por cursor (opcional): custo constante por página, sem COUNT por padrão
+        if 'cursor' in request.args:
+            include_total: bool = request.args.get('include_total', '0').lower() in ('1', 'true')
+            keyset_page = MusicasPotpourriService.get_musicas_by_potpourri_id_keyset(
+                potpourri_id, request.args.get('cursor'), per_page, include_total, fields
+            )
+            # O cursor não carrega a posição: ela vem de um row_number() no potpourri
+            posicoes = MusicasPotpourriService.get_posicoes(mp for mp, _ in keyset_page.items)
+            musicas_potpourri_list = []
+            for musicas_potpourri, musica in keyset_page.items:
+                musicas_potpourri_dict = musicas_potpourri.to_dict(posicoes[musicas_potpourri.id])
+                musicas_potpourri_dict['musica'] = musica.to_dict(fields)
+                musicas_potpourri_list.append(musicas_potpourri_dict)
+            
+            return add_validators(jsonify({
+                'potpourri_id': potpourri_id,
+                'musicas_potpourri': musicas_potpourri_list,
+                'pagination': keyset_page.pagination_dict()
+            }), etag, updated_at)
         
         paginated_musicas_potpourri = MusicasPotpourriService.get_musicas_by_potpourri_id(
-            potpourri_id, page, per_page
+            potpourri_id, page, per_page, fields
         )
         
         # Process the joined data to include complete music information
+        # Página em ordem de tocagem: a posição é o deslocamento da página mais o índice
+        inicio = (paginated_musicas_potpourri.page - 1) * paginated_musicas_potpourri.per_page
         musicas_potpourri_list = []
-        for musicas_potpourri, musica in paginated_musicas_potpourri.items:
-            musicas_potpourri_dict = musicas_potpourri.to_dict()
-            musicas_potpourri_dict['musica'] = musica.to_dict()
+        for i, (musicas_potpourri, musica) in enumerate(paginated_musicas_potpourri.items, start=inicio + 1):
+            musicas_potpourri_dict = musicas_potpourri.to_dict(i)
+            musicas_potpourri_dict['musica'] = musica.to_dict(fields)
             musicas_potpourri_list.append(musicas_potpourri_dict)
         
-        return jsonify({
+        return add_validators(jsonify({
             'potpourri_id': potpourri_id,
             'musicas_potpourri': musicas_potpourri_list,
             'pagination': {
@@ -94,7 +165,7 @@ def get_musicas_by_potpourri_id(potpourri_id: int):
                 'has_next': paginated_musicas_potpourri.has_next,
                 'has_prev': paginated_musicas_potpourri.has_prev
             }
-        })
+        }), etag, updated_at)
         
     except Exception as e:
         if "não encontrado" in str(e):
@@ -114,7 +185,7 @@ def update_musicas_potpourri(musicas_potpourri_id: int):
         musicas_potpourri = MusicasPotpourriService.update_musicas_potpourri(musicas_potpourri_id, data)
         return jsonify({
             'message': 'Relacionamento música-potpourri atualizado com sucesso',
-            'musicas_potpourri': musicas_potpourri.to_dict()
+            'musicas_potpourri': MusicasPotpourriService.to_dicts([musicas_potpourri])[0]
         })
         
     except Exception as e:
@@ -1,26 +1,35 @@
+import os
 from datetime import datetime
 from app import db
 
+# Espaçamento da chave interna de ordenação; cada vão comporta ~log2(gap) movimentos
+POTPOURRI_ORDER_GAP = int(os.getenv('POTPOURRI_ORDER_GAP', '1024'))
+
+
 class MusicasPotpourri(db.Model):
     __tablename__ = 'musicas_potpourri'
+    __table_args__ = (
+        db.Index('ix_musicas_potpourri_potpourri_id_chave', 'potpourri_id', 'chave_ordem', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    potpourri_id = db.Column(db.Integer, db.ForeignKey('potpourri.id'), nullable=False)
-    musica_id = db.Column(db.Integer, db.ForeignKey('musicas.id'), nullable=False)
-    ordem_tocagem = db.Column(db.Integer, nullable=False)
+    potpourri_id = db.Column(db.Integer, db.ForeignKey('potpourri.id', ondelete='CASCADE'), nullable=False)
+    musica_id = db.Column(db.Integer, db.ForeignKey('musicas.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Chave esparsa da ordem de tocagem (empates pelo id); não sai na API, que expõe a posição 1..n
+    chave_ordem = db.Column(db.BigInteger, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
     def __repr__(self):
-        return f'<MusicasPotpourri potpourri_id={self.potpourri_id} musica_id={self.musica_id} ordem={self.ordem_tocagem}>'
+        return f'<MusicasPotpourri potpourri_id={self.potpourri_id} musica_id={self.musica_id} chave_ordem={self.chave_ordem}>'
     
-    def to_dict(self):
-        """Convert model to dictionary for JSON serialization"""
+    def to_dict(self, ordem_tocagem: int):
+        """Convert model to dictionary for JSON serialization, with its 1-based position in the potpourri"""
         return {
             'id': self.id,
             'potpourri_id': self.potpourri_id,
             'musica_id': self.musica_id,
-            'ordem_tocagem': self.ordem_tocagem,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'ordem_tocagem': ordem_tocagem,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
         }
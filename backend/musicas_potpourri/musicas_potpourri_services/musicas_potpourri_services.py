@@ -1,13 +1,139 @@
 from app import db
-from musicas_potpourri.musicas_potpourri_model.musicas_potpourri_model import MusicasPotpourri
+from musicas_potpourri.musicas_potpourri_model.musicas_potpourri_model import MusicasPotpourri, POTPOURRI_ORDER_GAP
 from potpourri.potpourri_model.potpourri_model import Potpourri
 from musica.musica_model.musica_model import Musica
+from musica.musica_services.musica_services import MusicaService, STREAM_YIELD_PER
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import or_
-from typing import Dict, Any, Optional
+from sqlalchemy import insert, select, update, func
+from utils.keyset_pagination.keyset_pagination import paginate_keyset, KeysetPage
+from typing import Dict, Any, Iterable, Optional, List, Tuple
+from collections import defaultdict
+from datetime import datetime
+import os
+
+BATCH_INSERT_MAX_ITEMS = int(os.getenv('BATCH_INSERT_MAX_ITEMS', '1000'))
 
 class MusicasPotpourriService:
     
+    @staticmethod
+    def _chaves_entre(inferior: Optional[int], superior: Optional[int], quantidade: int) -> Optional[List[int]]:
+        # Nas pontas (sem vizinho) as chaves avançam um vão inteiro; entre vizinhos, dividem o espaço livre
+        if inferior is None and superior is None:
+            return [(i + 1) * POTPOURRI_ORDER_GAP for i in range(quantidade)]
+        if inferior is None:
+            return [superior - (quantidade - i) * POTPOURRI_ORDER_GAP for i in range(quantidade)]
+        if superior is None:
+            return [inferior + (i + 1) * POTPOURRI_ORDER_GAP for i in range(quantidade)]
+        passo = (superior - inferior) // (quantidade + 1)
+        if passo < 1:
+            return None
+        return [inferior + passo * (i + 1) for i in range(quantidade)]
+    
+    @staticmethod
+    def assign_chaves(chaves: List[Optional[int]]) -> Tuple[List[int], bool]:
+        """Keys for a play order given the current key of each entry, None for entries to (re)place
+
+        Entries with a key keep it (they must already be increasing). When some gap is too small
+        for the entries placed in it, every entry gets a fresh evenly spaced key (rebalance).
+        Returns (keys, rebalanced).
+        """
+        resultado = list(chaves)
+        i = 0
+        while i < len(resultado):
+            if resultado[i] is not None:
+                i += 1
+                continue
+            fim = i
+            while fim < len(resultado) and resultado[fim] is None:
+                fim += 1
+            novas = MusicasPotpourriService._chaves_entre(
+                resultado[i - 1] if i > 0 else None,
+                resultado[fim] if fim < len(resultado) else None,
+                fim - i
+            )
+            if novas is None:
+                return [(j + 1) * POTPOURRI_ORDER_GAP for j in range(len(chaves))], True
+            resultado[i:fim] = novas
+            i = fim
+        return resultado, False
+    
+    @staticmethod
+    def get_chaves_em_ordem(potpourri_id: int, excluir: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(id, chave_ordem) of the relations of a potpourri in play order, optionally leaving one out"""
+        query = select(MusicasPotpourri.id, MusicasPotpourri.chave_ordem).where(
+            MusicasPotpourri.potpourri_id == potpourri_id
+        ).order_by(MusicasPotpourri.chave_ordem, MusicasPotpourri.id)
+        if excluir is not None:
+            query = query.where(MusicasPotpourri.id != excluir)
+        return [tuple(row) for row in db.session.execute(query)]
+    
+    @staticmethod
+    def place_in_order(atuais: List[Tuple[int, int]], novas: List[Tuple[int, Any]]) -> Tuple[List[int], List[Tuple[int, int]], bool]:
+        """Keys for new entries placed at their wanted positions among the current rows
+
+        atuais are the (id, chave_ordem) rows in play order; novas are (posicao, item) with the
+        1-based position each entry should end up in, sorted by posicao. Only the new entries get
+        keys, unless a gap runs out: then the rows rewritten by the rebalance come back too.
+        Returns (keys of the new entries, (id, chave) of rewritten rows, rebalanced).
+        """
+        sequencia: List[Tuple[Optional[int], Optional[int]]] = []
+        i = j = 0
+        while i < len(atuais) or j < len(novas):
+            if j < len(novas) and (i == len(atuais) or novas[j][0] <= len(sequencia) + 1):
+                sequencia.append((None, None))
+                j += 1
+            else:
+                sequencia.append(atuais[i])
+                i += 1
+        
+        chaves, rebalanceado = MusicasPotpourriService.assign_chaves([chave for _, chave in sequencia])
+        novas_chaves = [chave for (rel_id, _), chave in zip(sequencia, chaves) if rel_id is None]
+        reescritas = [
+            (rel_id, chave) for (rel_id, atual), chave in zip(sequencia, chaves) if rel_id is not None and chave != atual
+        ]
+        return novas_chaves, reescritas, rebalanceado
+    
+    @staticmethod
+    def write_chaves(chaves: List[Tuple[int, int]]) -> None:
+        """Store new chave_ordem values, as one executemany UPDATE by primary key"""
+        if chaves:
+            db.session.execute(update(MusicasPotpourri), [
+                {'id': rel_id, 'chave_ordem': chave} for rel_id, chave in chaves
+            ])
+    
+    @staticmethod
+    def lock_potpourris(potpourri_ids: Iterable[int]) -> None:
+        """SELECT ... FOR UPDATE on the potpourris whose order is about to change, in id order"""
+        db.session.execute(
+            select(Potpourri.id).where(Potpourri.id.in_(set(potpourri_ids))).order_by(Potpourri.id).with_for_update()
+        )
+    
+    @staticmethod
+    def get_posicoes(relacoes: Iterable[MusicasPotpourri]) -> Dict[int, int]:
+        """1-based position of each given relation in its potpourri, from row_number() over chave_ordem"""
+        relacoes = list(relacoes)
+        if not relacoes:
+            return {}
+        numeradas = select(
+            MusicasPotpourri.id,
+            func.row_number().over(
+                partition_by=MusicasPotpourri.potpourri_id,
+                order_by=(MusicasPotpourri.chave_ordem, MusicasPotpourri.id)
+            ).label('posicao')
+        ).where(
+            MusicasPotpourri.potpourri_id.in_({mp.potpourri_id for mp in relacoes})
+        ).subquery()
+        return dict(db.session.execute(
+            select(numeradas.c.id, numeradas.c.posicao).where(numeradas.c.id.in_([mp.id for mp in relacoes]))
+        ).all())
+    
+    @staticmethod
+    def to_dicts(relacoes: Iterable[MusicasPotpourri]) -> List[Dict[str, Any]]:
+        """Serialize relations from anywhere in their potpourris, with the position of each one"""
+        relacoes = list(relacoes)
+        posicoes = MusicasPotpourriService.get_posicoes(relacoes)
+        return [mp.to_dict(posicoes[mp.id]) for mp in relacoes]
+    
     @staticmethod
     def _vaildate_data(data: Dict[str, Any]) -> None:
         if not data.get('potpourri_id'):
@@ -25,11 +151,17 @@ class MusicasPotpourriService:
             MusicasPotpourriService._vefify_if_exists_potpourri(data.get('potpourri_id'))
             MusicasPotpourriService._vefify_if_exists_music(data.get('musica_id'))
             
+            # ordem_tocagem é a posição pedida: a linha nova ganha uma chave no vão daquela posição
+            MusicasPotpourriService.lock_potpourris([data['potpourri_id']])
+            (chave,), reescritas, _ = MusicasPotpourriService.place_in_order(
+                MusicasPotpourriService.get_chaves_em_ordem(data['potpourri_id']), [(data['ordem_tocagem'], None)]
+            )
+            MusicasPotpourriService.write_chaves(reescritas)
             
             musicas_potpourri = MusicasPotpourri(
                 potpourri_id=data.get('potpourri_id'),
                 musica_id=data.get('musica_id'),
-                ordem_tocagem=data.get('ordem_tocagem')
+                chave_ordem=chave
             )
             
             db.session.add(musicas_potpourri)
@@ -39,6 +171,86 @@ class MusicasPotpourriService:
             db.session.rollback()
             raise Exception(f"Erro ao criar relacionamento música-potpourri: {str(e)}")
     
+    @staticmethod
+    def _validate_batch_data(items: List[Dict[str, Any]]) -> None:
+        if not isinstance(items, list) or len(items) == 0:
+            raise Exception("Lista de relacionamentos não pode estar vazia")
+        if len(items) > BATCH_INSERT_MAX_ITEMS:
+            raise Exception(f"Máximo de {BATCH_INSERT_MAX_ITEMS} relacionamentos por requisição")
+        
+        for i, item in enumerate(items):
+            if not isinstance(item, dict):
+                raise Exception(f"Item {i+1} da lista deve ser um objeto")
+            if not item.get('potpourri_id'):
+                raise Exception(f"ID do potpourri é obrigatório para o item {i+1}")
+            if not item.get('musica_id'):
+                raise Exception(f"ID da música é obrigatório para o item {i+1}")
+            if not item.get('ordem_tocagem'):
+                raise Exception(f"Ordem de tocagem é obrigatória para o item {i+1}")
+        
+        chaves = [(item['potpourri_id'], item['ordem_tocagem']) for item in items]
+        if len(chaves) != len(set(chaves)):
+            raise Exception("Ordens de tocagem devem ser únicas por potpourri")
+    
+    @staticmethod
+    def _verify_if_exists_batch(items: List[Dict[str, Any]]) -> None:
+        # Uma consulta IN por tabela, em vez de dois query.get por item
+        potpourri_ids = {item['potpourri_id'] for item in items}
+        encontrados = set(db.session.scalars(select(Potpourri.id).where(Potpourri.id.in_(potpourri_ids))))
+        if potpourri_ids - encontrados:
+            raise Exception(f"Potpourri não encontrado: {sorted(potpourri_ids - encontrados)}")
+        
+        musica_ids = {item['musica_id'] for item in items}
+        encontradas = set(db.session.scalars(select(Musica.id).where(Musica.id.in_(musica_ids))))
+        if musica_ids - encontradas:
+            raise Exception(f"Música não encontrada: {sorted(musica_ids - encontradas)}")
+    
+    @staticmethod
+    def create_musicas_potpourri_batch(items: List[Dict[str, Any]], commit: bool = True) -> List[MusicasPotpourri]:
+        """Create many musicas_potpourri relationships with one bulk INSERT
+
+        With commit=False the rows join the caller's transaction and the caller commits.
+        """
+        try:
+            MusicasPotpourriService._validate_batch_data(items)
+            MusicasPotpourriService._verify_if_exists_batch(items)
+            
+            # Cada item entra na posição pedida do seu potpourri; as linhas existentes mantêm a chave
+            por_potpourri: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+            for i, item in enumerate(items):
+                por_potpourri[item['potpourri_id']].append((item['ordem_tocagem'], i))
+            MusicasPotpourriService.lock_potpourris(por_potpourri)
+            chaves: Dict[int, int] = {}
+            for potpourri_id, novas in por_potpourri.items():
+                novas.sort()
+                novas_chaves, reescritas, _ = MusicasPotpourriService.place_in_order(
+                    MusicasPotpourriService.get_chaves_em_ordem(potpourri_id), novas
+                )
+                MusicasPotpourriService.write_chaves(reescritas)
+                chaves.update({i: chave for (_, i), chave in zip(novas, novas_chaves)})
+            
+            musicas_potpourri_list = db.session.scalars(
+                insert(MusicasPotpourri).returning(MusicasPotpourri),
+                [
+                    {
+                        'potpourri_id': item['potpourri_id'],
+                        'musica_id': item['musica_id'],
+                        'chave_ordem': chaves[i]
+                    }
+                    for i, item in enumerate(items)
+                ]
+            ).all()
+            # RETURNING não garante a ordem das linhas: devolve na ordem da lista recebida
+            posicao = {(item['potpourri_id'], chaves[i]): i for i, item in enumerate(items)}
+            musicas_potpourri_list.sort(key=lambda mp: posicao[(mp.potpourri_id, mp.chave_ordem)])
+            
+            if commit:
+                db.session.commit()
+            return musicas_potpourri_list
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Erro ao criar relacionamentos música-potpourri: {str(e)}")
+    
     @staticmethod
     def get_all_musicas_potpourri(page: int = 1, per_page: int = 10) -> Any:
         """Get all musicas_potpourri with pagination"""
@@ -52,6 +264,58 @@ class MusicasPotpourriService:
         except SQLAlchemyError as e:
             raise Exception(f"Erro ao buscar relacionamentos música-potpourri: {str(e)}")
     
+    @staticmethod
+    def get_all_musicas_potpourri_keyset(cursor: Optional[str] = None, per_page: int = 10, include_total: bool = False) -> KeysetPage:
+        """Get all musicas_potpourri with cursor pagination on id"""
+        try:
+            return paginate_keyset(
+                MusicasPotpourri.query,
+                [(MusicasPotpourri.id, False)],
+                cursor,
+                per_page,
+                lambda mp: [mp.id],
+                include_total
+            )
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar relacionamentos música-potpourri: {str(e)}")
+    
+    @staticmethod
+    def get_collection_version() -> Tuple[Optional[datetime], int]:
+        """(max(updated_at), count) of all musicas_potpourri, the validator of the list endpoint"""
+        try:
+            return tuple(db.session.query(func.max(MusicasPotpourri.updated_at), func.count(MusicasPotpourri.id)).one())
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar relacionamentos música-potpourri: {str(e)}")
+    
+    @staticmethod
+    def get_potpourri_musicas_version(potpourri_id: int) -> Tuple[datetime, int]:
+        """Last change of a potpourri, its relations or its musicas, plus the number of relations
+
+        The count catches removals, which do not move max(updated_at).
+        """
+        try:
+            row = db.session.query(
+                Potpourri.updated_at,
+                func.max(MusicasPotpourri.updated_at),
+                func.max(Musica.updated_at),
+                func.count(MusicasPotpourri.id)
+            ).outerjoin(
+                MusicasPotpourri, MusicasPotpourri.potpourri_id == Potpourri.id
+            ).outerjoin(
+                Musica, MusicasPotpourri.musica_id == Musica.id
+            ).filter(
+                Potpourri.id == potpourri_id
+            ).group_by(
+                Potpourri.id, Potpourri.updated_at
+            ).first()
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar músicas do potpourri: {str(e)}")
+        if row is None:
+            raise Exception("Potpourri não encontrado")
+        
+        potpourri_updated_at, relacoes_updated_at, musicas_updated_at, total = row
+        return max(data for data in (potpourri_updated_at, relacoes_updated_at, musicas_updated_at) if data is not None), total
+    
     @staticmethod
     def get_musicas_potpourri_by_id(musicas_potpourri_id: int) -> MusicasPotpourri:
         """Get musicas_potpourri by ID"""
@@ -64,7 +328,7 @@ class MusicasPotpourriService:
             raise Exception(f"Erro ao buscar relacionamento música-potpourri: {str(e)}")
     
     @staticmethod
-    def get_musicas_by_potpourri_id(potpourri_id: int, page: int = 1, per_page: int = 10) -> Any:
+    def get_musicas_by_potpourri_id(potpourri_id: int, page: int = 1, per_page: int = 10, fields: Optional[List[str]] = None) -> Any:
         """Get all musicas for a specific potpourri with complete music data"""
         try:
             # Validate if potpourri exists
@@ -77,10 +341,12 @@ class MusicasPotpourriService:
                 MusicasPotpourri, Musica
             ).join(
                 Musica, MusicasPotpourri.musica_id == Musica.id
+            ).options(
+                *MusicaService.load_options(fields)
             ).filter(
                 MusicasPotpourri.potpourri_id == potpourri_id
             ).order_by(
-                MusicasPotpourri.ordem_tocagem
+                MusicasPotpourri.chave_ordem, MusicasPotpourri.id
             ).paginate(
                 page=page,
                 per_page=per_page,
@@ -90,6 +356,58 @@ class MusicasPotpourriService:
         except SQLAlchemyError as e:
             raise Exception(f"Erro ao buscar músicas do potpourri: {str(e)}")
     
+    @staticmethod
+    def iter_musicas_by_potpourri_id(potpourri_id: int, fields: Optional[List[str]] = None) -> Any:
+        """Iterate over every (musicas_potpourri, musica) of a potpourri in play order, from a server-side cursor"""
+        try:
+            MusicasPotpourriService._vefify_if_exists_potpourri(potpourri_id)
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar músicas do potpourri: {str(e)}")
+        
+        return db.session.query(
+            MusicasPotpourri, Musica
+        ).join(
+            Musica, MusicasPotpourri.musica_id == Musica.id
+        ).options(
+            *MusicaService.load_options(fields)
+        ).filter(
+            MusicasPotpourri.potpourri_id == potpourri_id
+        ).order_by(
+            MusicasPotpourri.chave_ordem, MusicasPotpourri.id
+        ).yield_per(STREAM_YIELD_PER)
+    
+    @staticmethod
+    def get_musicas_by_potpourri_id_keyset(
+        potpourri_id: int,
+        cursor: Optional[str] = None,
+        per_page: int = 10,
+        include_total: bool = False,
+        fields: Optional[List[str]] = None
+    ) -> KeysetPage:
+        """Get the musicas of a potpourri with cursor pagination on (chave_ordem, id)"""
+        try:
+            MusicasPotpourriService._vefify_if_exists_potpourri(potpourri_id)
+            
+            query = db.session.query(
+                MusicasPotpourri, Musica
+            ).join(
+                Musica, MusicasPotpourri.musica_id == Musica.id
+            ).options(
+                *MusicaService.load_options(fields)
+            ).filter(
+                MusicasPotpourri.potpourri_id == potpourri_id
+            )
+            return paginate_keyset(
+                query,
+                [(MusicasPotpourri.chave_ordem, False), (MusicasPotpourri.id, False)],
+                cursor,
+                per_page,
+                lambda row: [row[0].chave_ordem, row[0].id],
+                include_total
+            )
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar músicas do potpourri: {str(e)}")
+    
     @staticmethod
     def _vefify_if_exists_music(musica_id: int) -> None:
         musica = Musica.query.get(musica_id)
@@ -118,11 +436,26 @@ class MusicasPotpourriService:
             MusicasPotpourriService._vefify_if_exists_potpourri(data.get('potpourri_id'))
             
             musicas_potpourri = MusicasPotpourri.query.get(musicas_potpourri_id)
+            MusicasPotpourriService.lock_potpourris([data['potpourri_id']])
+            atuais = MusicasPotpourriService.get_chaves_em_ordem(data['potpourri_id'], excluir=musicas_potpourri_id)
+            posicao = max(1, min(data['ordem_tocagem'], len(atuais) + 1))
+            
+            # Só ganha chave nova se mudou de potpourri ou de posição; as demais linhas não são tocadas
+            atual = (musicas_potpourri.chave_ordem, musicas_potpourri.id)
+            anterior = atuais[posicao - 2] if posicao > 1 else None
+            seguinte = atuais[posicao - 1] if posicao <= len(atuais) else None
+            mesma_posicao = (
+                musicas_potpourri.potpourri_id == data['potpourri_id']
+                and (anterior is None or (anterior[1], anterior[0]) < atual)
+                and (seguinte is None or atual < (seguinte[1], seguinte[0]))
+            )
+            if not mesma_posicao:
+                (chave,), reescritas, _ = MusicasPotpourriService.place_in_order(atuais, [(posicao, None)])
+                MusicasPotpourriService.write_chaves(reescritas)
+                musicas_potpourri.chave_ordem = chave
             musicas_potpourri.potpourri_id = data['potpourri_id']
             musicas_potpourri.musica_id = data['musica_id']
-            musicas_potpourri.ordem_tocagem = data['ordem_tocagem']
 
-            
             db.session.commit()
             return musicas_potpourri
         except SQLAlchemyError as e:
@@ -1,5 +1,9 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from potpourri.potpourri_services.potpourri_services import PotpourriService
+from musica.musica_services.musica_services import MusicaService
+from utils.json_provider.json_provider import stream_json_array
+from utils.conditional_get.conditional_get import build_etag, not_modified, add_validators
+from utils.response_compression.response_compression import cached_response
 from typing import Dict, Any
 
 potpourri_bp = Blueprint('potpourri_bp', __name__)
@@ -31,15 +35,38 @@ def get_all_potpourri():
         page: int = request.args.get('page', 1, type=int)
         per_page: int = request.args.get('per_page', 10, type=int)
         search: str = request.args.get('search', '')
+        fields = PotpourriService.parse_fields(request.args.get('fields'))
+        
+        # Validador da coleção: max(updated_at) e total, sem carregar nenhum potpourri
+        etag: str = build_etag('potpourri', *PotpourriService.get_collection_version())
+        nao_modificado = not_modified(etag)
+        if nao_modificado:
+            return nao_modificado
+        
+        # Lista completa em streaming (opcional): um elemento por vez, sem paginação
+        if request.args.get('stream', 'false').lower() == 'true' and not search:
+            return add_validators(
+                stream_json_array('potpourri', PotpourriService.iter_all_potpourri(), lambda potpourri: potpourri.to_dict(fields)),
+                etag
+            )
+        
+        # Paginação por cursor (opcional): custo constante por página, sem COUNT por padrão
+        if 'cursor' in request.args and not search:
+            include_total: bool = request.args.get('include_total', '0').lower() in ('1', 'true')
+            keyset_page = PotpourriService.get_all_potpourri_keyset(request.args.get('cursor'), per_page, include_total)
+            return add_validators(jsonify({
+                'potpourri': [potpourri.to_dict(fields) for potpourri in keyset_page.items],
+                'pagination': keyset_page.pagination_dict()
+            }), etag)
         
         if search:
             paginated_potpourri = PotpourriService.search_potpourri_by_name(search, page, per_page)
         else:
             paginated_potpourri = PotpourriService.get_all_potpourri(page, per_page)
         
-        potpourri_list = [potpourri.to_dict() for potpourri in paginated_potpourri.items]
+        potpourri_list = [potpourri.to_dict(fields) for potpourri in paginated_potpourri.items]
         
-        return jsonify({
+        return add_validators(jsonify({
             'potpourri': potpourri_list,
             'pagination': {
                 'page': paginated_potpourri.page,
@@ -49,7 +76,7 @@ def get_all_potpourri():
                 'has_next': paginated_potpourri.has_next,
                 'has_prev': paginated_potpourri.has_prev
             }
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({'message': str(e)}), 500
@@ -59,10 +86,46 @@ def get_all_potpourri():
 def get_potpourri_by_id(potpourri_id: int):
     """Get potpourri by ID"""
     try:
+        fields = PotpourriService.parse_fields(request.args.get('fields'))
+        
+        updated_at = PotpourriService.get_potpourri_version(potpourri_id)
+        etag: str = build_etag('potpourri', potpourri_id, updated_at.isoformat())
+        nao_modificado = not_modified(etag, updated_at)
+        if nao_modificado:
+            return nao_modificado
+        em_cache = cached_response(etag)
+        if em_cache:
+            return add_validators(em_cache, etag, updated_at)
+        
         potpourri = PotpourriService.get_potpourri_by_id(potpourri_id)
-        return jsonify({
-            'potpourri': potpourri.to_dict()
-        })
+        return add_validators(jsonify({
+            'potpourri': potpourri.to_dict(fields)
+        }), etag, updated_at)
+        
+    except Exception as e:
+        if "não encontrado" in str(e):
+            return jsonify({'message': str(e)}), 404
+        return jsonify({'message': str(e)}), 500
+
+
+@potpourri_bp.route('/<int:potpourri_id>/setlist', methods=['GET'])
+def get_potpourri_setlist(potpourri_id: int):
+    """Get the potpourri with its ordered musicas and cifras in one call (cached per version)"""
+    try:
+        estruturada: bool = MusicaService.parse_format(request.args.get('format'))
+        updated_at, total = PotpourriService.get_setlist_version(potpourri_id)
+        etag: str = build_etag('setlist', potpourri_id, updated_at.isoformat(), total)
+        nao_modificado = not_modified(etag, updated_at)
+        if nao_modificado:
+            return nao_modificado
+        em_cache = cached_response(etag)
+        if em_cache:
+            return add_validators(em_cache, etag, updated_at)
+        
+        body: bytes = PotpourriService.get_setlist_json(potpourri_id, (updated_at, total), estruturada)
+        return add_validators(
+            current_app.response_class(body, mimetype=current_app.json.mimetype), etag, updated_at
+        )
         
     except Exception as e:
         if "não encontrado" in str(e):
@@ -106,6 +169,25 @@ def delete_potpourri(potpourri_id: int):
         return jsonify({'message': str(e)}), 500
 
 
+@potpourri_bp.route('/bulk-delete', methods=['POST'])
+def delete_potpourri_bulk():
+    """Delete a list of potpourri by ID"""
+    try:
+        data: Dict[str, Any] = request.get_json()
+        
+        if not data:
+            return jsonify({'message': 'Dados não fornecidos'}), 400
+        
+        resultado = PotpourriService.delete_potpourri_bulk(data.get('ids'))
+        return jsonify({
+            'message': 'Potpourris deletados com sucesso',
+            **resultado
+        })
+        
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+
 @potpourri_bp.route('/search', methods=['GET'])
 def search_potpourri():
     """Search potpourri by name"""
@@ -113,14 +195,20 @@ def search_potpourri():
         search_term: str = request.args.get('q', '')
         page: int = request.args.get('page', 1, type=int)
         per_page: int = request.args.get('per_page', 10, type=int)
+        fields = PotpourriService.parse_fields(request.args.get('fields'))
         
         if not search_term:
             return jsonify({'message': 'Termo de busca é obrigatório'}), 400
         
+        etag: str = build_etag('potpourri', *PotpourriService.get_collection_version())
+        nao_modificado = not_modified(etag)
+        if nao_modificado:
+            return nao_modificado
+        
         paginated_potpourri = PotpourriService.search_potpourri_by_name(search_term, page, per_page)
-        potpourri_list = [potpourri.to_dict() for potpourri in paginated_potpourri.items]
+        potpourri_list = [potpourri.to_dict(fields) for potpourri in paginated_potpourri.items]
         
-        return jsonify({
+        return add_validators(jsonify({
             'potpourri': potpourri_list,
             'search_term': search_term,
             'pagination': {
@@ -131,7 +219,7 @@ def search_potpourri():
                 'has_next': paginated_potpourri.has_next,
                 'has_prev': paginated_potpourri.has_prev
             }
-        })
+        }), etag)
         
     except Exception as e:
         return jsonify({'message': str(e)}), 500
@@ -177,3 +265,24 @@ def update_potpourri_replace_musics(potpourri_id: int):
         if "não encontrado" in str(e):
             return jsonify({'message': str(e)}), 404
         return jsonify({'message': str(e)}), 500
+
+
+@potpourri_bp.route('/<int:potpourri_id>/move', methods=['POST'])
+def move_musica_potpourri(potpourri_id: int):
+    """Move one music of the potpourri before or after another one"""
+    try:
+        data: Dict[str, Any] = request.get_json()
+
+        if not data:
+            return jsonify({'message': 'Dados não fornecidos'}), 400
+
+        result = PotpourriService.move_musica_potpourri(potpourri_id, data)
+        return jsonify({
+            'message': 'Música movida com sucesso',
+            'data': result
+        })
+
+    except Exception as e:
+        if "não encontrado" in str(e):
+            return jsonify({'message': str(e)}), 404
+        return jsonify({'message': str(e)}), 500
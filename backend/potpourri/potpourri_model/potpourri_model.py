@@ -1,8 +1,15 @@
 from datetime import datetime
 from app import db
+from utils.sparse_fields.sparse_fields import select_fields
 
 class Potpourri(db.Model):
     __tablename__ = 'potpourri'
+    __table_args__ = (
+        db.Index('ix_potpourri_updated_at_id', 'updated_at', 'id'),
+    )
+    
+    # Campos aceitos em ?fields=
+    DICT_FIELDS = ('id', 'nome_potpourri', 'created_at', 'updated_at')
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     nome_potpourri = db.Column(db.String(255), nullable=False)
@@ -12,11 +19,11 @@ class Potpourri(db.Model):
     def __repr__(self):
         return f'<Potpourri {self.nome_potpourri}>'
     
-    def to_dict(self):
-        """Convert model to dictionary for JSON serialization"""
-        return {
+    def to_dict(self, fields=None):
+        """Convert model to dictionary for JSON serialization (only the given fields, when informed)"""
+        return select_fields({
             'id': self.id,
             'nome_potpourri': self.nome_potpourri,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }, fields)
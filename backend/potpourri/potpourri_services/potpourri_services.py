@@ -1,11 +1,26 @@
 from app import db
+from flask import current_app
 from potpourri.potpourri_model.potpourri_model import Potpourri
 from musicas_potpourri.musicas_potpourri_model.musicas_potpourri_model import MusicasPotpourri
 from musicas_potpourri.musicas_potpourri_services.musicas_potpourri_services import MusicasPotpourriService
 from musica.musica_model.musica_model import Musica
+from musica.musica_services.musica_services import MusicaService, STREAM_YIELD_PER
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import or_
-from typing import Dict, Any, Optional, List
+from sqlalchemy import delete, insert, update, select, func
+import os
+from search_index.search_index_services.search_index_services import SearchIndexService
+from utils.keyset_pagination.keyset_pagination import paginate_keyset, KeysetPage
+from utils.sparse_fields.sparse_fields import parse_fields
+from utils.lru_cache.lru_cache import LRUCache
+from suggest.suggest_services.suggest_services import SuggestService
+from typing import Dict, Any, Optional, List, Tuple
+from collections import defaultdict
+from datetime import datetime
+
+BULK_DELETE_MAX_IDS = int(os.getenv('BULK_DELETE_MAX_IDS', '1000'))
+SETLIST_CACHE_ENTRIES = int(os.getenv('SETLIST_CACHE_ENTRIES', '128'))
+# (potpourri_id, estruturada) -> (versão, setlist serializado); só vale enquanto a versão no banco for a mesma
+_setlist_cache = LRUCache(SETLIST_CACHE_ENTRIES)
 
 class PotpourriService:
     
@@ -22,11 +37,17 @@ class PotpourriService:
             
             db.session.add(potpourri)
             db.session.commit()
+            SuggestService.on_potpourri_saved(potpourri)
             return potpourri
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Erro ao criar potpourri: {str(e)}")
     
+    @staticmethod
+    def parse_fields(raw: Optional[str]) -> Optional[List[str]]:
+        """Parse the ?fields= parameter of the potpourri endpoints"""
+        return parse_fields(raw, Potpourri.DICT_FIELDS)
+    
     @staticmethod
     def get_all_potpourri(page: int = 1, per_page: int = 10) -> Any:
         """Get all potpourri with pagination"""
@@ -40,6 +61,28 @@ class PotpourriService:
         except SQLAlchemyError as e:
             raise Exception(f"Erro ao buscar potpourri: {str(e)}")
     
+    @staticmethod
+    def get_all_potpourri_keyset(cursor: Optional[str] = None, per_page: int = 10, include_total: bool = False) -> KeysetPage:
+        """Get all potpourri with cursor pagination on (updated_at, id)"""
+        try:
+            return paginate_keyset(
+                Potpourri.query,
+                [(Potpourri.updated_at, True), (Potpourri.id, True)],
+                cursor,
+                per_page,
+                lambda potpourri: [potpourri.updated_at, potpourri.id],
+                include_total
+            )
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar potpourri: {str(e)}")
+    
+    @staticmethod
+    def iter_all_potpourri() -> Any:
+        """Iterate over every potpourri, fetched from a server-side cursor in chunks"""
+        return Potpourri.query.order_by(
+            Potpourri.updated_at.desc(), Potpourri.id.desc()
+        ).yield_per(STREAM_YIELD_PER)
+    
     @staticmethod
     def get_potpourri_by_id(potpourri_id: int) -> Potpourri:
         """Get potpourri by ID"""
@@ -52,18 +95,89 @@ class PotpourriService:
         except SQLAlchemyError as e:
             raise Exception(f"Erro ao buscar potpourri: {str(e)}")
     
+    @staticmethod
+    def get_potpourri_version(potpourri_id: int) -> datetime:
+        """updated_at of a potpourri, read without loading the row (validator for conditional GETs)"""
+        try:
+            updated_at = db.session.query(Potpourri.updated_at).filter(Potpourri.id == potpourri_id).scalar()
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar potpourri: {str(e)}")
+        if updated_at is None:
+            raise Exception("Potpourri não encontrado")
+        return updated_at
+    
+    @staticmethod
+    def get_collection_version() -> Tuple[Optional[datetime], int]:
+        """(max(updated_at), count) of all potpourri, the validator of the list endpoints"""
+        try:
+            return tuple(db.session.query(func.max(Potpourri.updated_at), func.count(Potpourri.id)).one())
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar potpourri: {str(e)}")
+    
+    @staticmethod
+    def get_setlist_version(potpourri_id: int) -> Tuple[datetime, int]:
+        """Version of the setlist: last change of the potpourri, its relations or musicas, plus the relation count"""
+        return MusicasPotpourriService.get_potpourri_musicas_version(potpourri_id)
+    
+    @staticmethod
+    def _load_setlist(potpourri_id: int, estruturada: bool = False) -> Tuple[Tuple[datetime, int], Dict[str, Any]]:
+        # Uma única consulta: potpourri, relações e músicas completas, na ordem de tocagem
+        try:
+            rows = db.session.query(
+                Potpourri, MusicasPotpourri, Musica
+            ).outerjoin(
+                MusicasPotpourri, MusicasPotpourri.potpourri_id == Potpourri.id
+            ).outerjoin(
+                Musica, MusicasPotpourri.musica_id == Musica.id
+            ).options(
+                *MusicaService.load_options(None, estruturada)
+            ).filter(
+                Potpourri.id == potpourri_id
+            ).order_by(
+                MusicasPotpourri.chave_ordem, MusicasPotpourri.id
+            ).all()
+        except SQLAlchemyError as e:
+            raise Exception(f"Erro ao buscar setlist do potpourri: {str(e)}")
+        if not rows:
+            raise Exception("Potpourri não encontrado")
+        
+        potpourri = rows[0][0]
+        itens = [(musicas_potpourri, musica) for _, musicas_potpourri, musica in rows if musicas_potpourri is not None]
+        # Mesma versão calculada por get_setlist_version, a partir das linhas lidas
+        datas = [potpourri.updated_at] + [mp.updated_at for mp, _ in itens] + [musica.updated_at for _, musica in itens]
+        setlist = {
+            'potpourri': potpourri.to_dict(),
+            'musicas_potpourri': [
+                {**mp.to_dict(posicao), 'musica': musica.to_dict(None, estruturada)}
+                for posicao, (mp, musica) in enumerate(itens, start=1)
+            ],
+            'total': len(itens)
+        }
+        return (max(datas), len(itens)), setlist
+    
+    @staticmethod
+    def get_setlist_json(potpourri_id: int, version: Tuple[datetime, int], estruturada: bool = False) -> bytes:
+        """Serialized setlist (potpourri plus ordered musicas with cifras), cached per version
+
+        The entry is reused only while it matches the version just read from the database,
+        so changes made by any process (API, worker, recrawl) invalidate it.
+        With estruturada=True each musica carries cifra_estruturada instead of the raw cifra.
+        """
+        chave = (potpourri_id, estruturada)
+        entry = _setlist_cache.get(chave)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        
+        versao, setlist = PotpourriService._load_setlist(potpourri_id, estruturada)
+        body = current_app.json.dumps(setlist).encode('utf-8')
+        _setlist_cache.put(chave, (versao, body))
+        return body
+    
     @staticmethod
     def search_potpourri_by_name(search_term: str, page: int = 1, per_page: int = 10) -> Any:
-        """Search potpourri by name"""
+        """Search potpourri by name (accent-insensitive, ranked by relevance)"""
         try:
-            paginated_potpourri = Potpourri.query.filter(
-                Potpourri.nome_potpourri.ilike(f'%{search_term}%')
-            ).paginate(
-                page=page,
-                per_page=per_page,
-                error_out=False
-            )
-            return paginated_potpourri
+            return SearchIndexService.search_potpourri(search_term, page, per_page)
         except SQLAlchemyError as e:
             raise Exception(f"Erro ao buscar potpourri: {str(e)}")
     
@@ -79,6 +193,7 @@ class PotpourriService:
                 potpourri.nome_potpourri = data['nome_potpourri']
             
             db.session.commit()
+            SuggestService.on_potpourri_saved(potpourri)
             return potpourri
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -87,24 +202,44 @@ class PotpourriService:
     @staticmethod
     def delete_potpourri(potpourri_id: int) -> bool:
         """Delete potpourri by ID and all related musicas_potpourri"""
+        deletados = PotpourriService._delete_potpourri_by_ids([potpourri_id])
+        if not deletados:
+            raise Exception("Potpourri não encontrado")
+        return True
+    
+    @staticmethod
+    def delete_potpourri_bulk(ids: List[int]) -> Dict[str, Any]:
+        """Delete many potpourri in a single statement"""
+        if not isinstance(ids, list) or len(ids) == 0:
+            raise Exception("Lista de ids é obrigatória")
+        if len(ids) > BULK_DELETE_MAX_IDS:
+            raise Exception(f"Máximo de {BULK_DELETE_MAX_IDS} ids por remoção")
+        if not all(isinstance(potpourri_id, int) for potpourri_id in ids):
+            raise Exception("Os ids devem ser números inteiros")
+        
+        deletados = PotpourriService._delete_potpourri_by_ids(ids)
+        return {
+            'deletados': sorted(deletados),
+            'nao_encontrados': sorted(set(ids) - set(deletados))
+        }
+    
+    @staticmethod
+    def _delete_potpourri_by_ids(ids: List[int]) -> List[int]:
+        # Um único DELETE; as relações musicas_potpourri saem via ON DELETE CASCADE
         try:
-            potpourri = Potpourri.query.get(potpourri_id)
-            if not potpourri:
-                raise Exception("Potpourri não encontrado")
-            
-            # Primeiro, excluir todos os relacionamentos musicas_potpourri
-            related_musicas = MusicasPotpourri.query.filter_by(potpourri_id=potpourri_id).all()
-            
-            for musica_potpourri in related_musicas:
-                db.session.delete(musica_potpourri)
-            
-            # Depois, excluir o potpourri
-            db.session.delete(potpourri)
+            deletados = db.session.execute(
+                delete(Potpourri).where(Potpourri.id.in_(ids)).returning(Potpourri.id)
+            ).scalars().all()
             db.session.commit()
-            return True
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Erro ao deletar potpourri: {str(e)}")
+        
+        for potpourri_id in deletados:
+            SuggestService.on_potpourri_deleted(potpourri_id)
+            _setlist_cache.pop((potpourri_id, False))
+            _setlist_cache.pop((potpourri_id, True))
+        return deletados
     
     
     @staticmethod
@@ -148,39 +283,103 @@ class PotpourriService:
             db.session.add(potpourri)
             db.session.flush()  # To get the ID without committing
             
-            # Create musicas_potpourri relationships using existing service
-            musicas_potpourri_list: List[MusicasPotpourri] = []
-            for musica_data in potpourri_data['musicas_potpourri']:
-                # Prepare data for existing create_musicas_potpourri function
-                musica_potpourri_data = {
+            # Valida todas as músicas com uma consulta e insere as relações num único INSERT
+            musicas_potpourri_list = MusicasPotpourriService.create_musicas_potpourri_batch([
+                {
                     'potpourri_id': potpourri.id,
                     'musica_id': musica_data['musica_id'],
                     'ordem_tocagem': musica_data['ordem_tocagem']
                 }
-                
-                # Use existing service function
-                musicas_potpourri = MusicasPotpourriService.create_musicas_potpourri(musica_potpourri_data)
-                musicas_potpourri_list.append(musicas_potpourri)
+                for musica_data in potpourri_data['musicas_potpourri']
+            ], commit=False)
             
-            return {
+            # Serializa antes do commit para não recarregar cada linha expirada
+            result = {
                 'potpourri': potpourri.to_dict(),
-                'musicas_potpourri': [mp.to_dict() for mp in musicas_potpourri_list],
+                'musicas_potpourri': MusicasPotpourriService.to_dicts(musicas_potpourri_list),
                 'total_musicas': len(musicas_potpourri_list)
             }
             
+            # Commit all changes as a single transaction
+            db.session.commit()
+            SuggestService.on_potpourri_saved(potpourri)
+            return result
+            
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Erro ao criar potpourri com músicas: {str(e)}")
+        except Exception:
+            # Nada fica gravado pela metade se alguma música não existir
+            db.session.rollback()
+            raise
+
+
+    @staticmethod
+    def _increasing_subsequence(valores: List[int]) -> set:
+        # Índices de uma maior subsequência estritamente crescente (O(n log n), paciência)
+        finais: List[int] = []
+        anterior: List[Optional[int]] = [None] * len(valores)
+        for i, valor in enumerate(valores):
+            esquerda, direita = 0, len(finais)
+            while esquerda < direita:
+                meio = (esquerda + direita) // 2
+                if valores[finais[meio]] < valor:
+                    esquerda = meio + 1
+                else:
+                    direita = meio
+            anterior[i] = finais[esquerda - 1] if esquerda else None
+            if esquerda == len(finais):
+                finais.append(i)
+            else:
+                finais[esquerda] = i
+
+        indices = set()
+        i = finais[-1] if finais else None
+        while i is not None:
+            indices.add(i)
+            i = anterior[i]
+        return indices
+
+    @staticmethod
+    def _diff_musicas_potpourri(
+        existentes: List[Tuple[int, int, int]],
+        desejadas: List[int]
+    ) -> Tuple[List[Tuple[Optional[int], int, Optional[int]]], List[int]]:
+        """Match the current (id, musica_id, chave_ordem) rows, in play order, with the wanted musica_ids
+
+        Returns (sequencia, remover): the wanted order as (rel_id, musica_id, chave) entries and the
+        ids of the rows that leave. A música que continua no potpourri mantém o id da relação; das
+        que continuam, a maior sequência que já está na ordem pedida mantém também a chave, e só as
+        demais (movidas, com chave None) e as novas (rel_id None) precisam de chave nova.
+        """
+        por_musica: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+        for rel_id, musica_id, chave in existentes:
+            por_musica[musica_id].append((rel_id, chave))
+
+        sequencia: List[Tuple[Optional[int], int, Optional[int]]] = []
+        for musica_id in desejadas:
+            rel_id, chave = por_musica[musica_id].pop(0) if por_musica[musica_id] else (None, None)
+            sequencia.append((rel_id, musica_id, chave))
+        remover = [rel_id for rels in por_musica.values() for rel_id, _ in rels]
 
+        mantidas = [i for i, (rel_id, _, _) in enumerate(sequencia) if rel_id is not None]
+        ficam = PotpourriService._increasing_subsequence([sequencia[i][2] for i in mantidas])
+        for n, i in enumerate(mantidas):
+            if n not in ficam:
+                rel_id, musica_id, _ = sequencia[i]
+                sequencia[i] = (rel_id, musica_id, None)
+        return sequencia, remover
 
     @staticmethod
     def update_potpourri_and_replace_musics(potpourri_id: int, potpourri_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Update potpourri (name optional) and replace all its musics with the provided list"""
+        """Update potpourri (name optional) and replace its musics, applying only the difference
+
+        Only removed, inserted and moved rows are written; rows that keep their relative order keep
+        their chave_ordem, unless a gap runs out and the potpourri is rebalanced.
+        """
         try:
-            # Ensure potpourri exists
-            potpourri = Potpourri.query.get(potpourri_id)
-            if not potpourri:
-                raise Exception("Potpourri não encontrado")
+            # Ensure potpourri exists (locked: moves of the same potpourri wait for this transaction)
+            potpourri = PotpourriService._lock_potpourri(potpourri_id)
 
             PotpourriService._validate_potpourri_data(potpourri_data)
             PotpourriService._validate_musicas_potpourri_data(potpourri_data)
@@ -190,36 +389,147 @@ class PotpourriService:
             ordens = [m['ordem_tocagem'] for m in potpourri_data['musicas_potpourri']]
             if len(ordens) != len(set(ordens)):
                 raise Exception("Ordens de tocagem devem ser únicas")
+            desejadas = sorted(potpourri_data['musicas_potpourri'], key=lambda m: m['ordem_tocagem'])
 
-            # Remove existing relations
-            existing = MusicasPotpourri.query.filter_by(potpourri_id=potpourri_id).all()
-            for rel in existing:
-                db.session.delete(rel)
-            db.session.flush()
-
-            # Add new relations (validate each music exists)
-            musicas_potpourri_list: List[MusicasPotpourri] = []
-            for musica_data in potpourri_data['musicas_potpourri']:
-                # Prepare data for existing create_musicas_potpourri function
-                musica_potpourri_data = {
-                    'potpourri_id': potpourri.id,
-                    'musica_id': musica_data['musica_id'],
-                    'ordem_tocagem': musica_data['ordem_tocagem']
-                }
-                
-                # Use existing service function
-                musicas_potpourri = MusicasPotpourriService.create_musicas_potpourri(musica_potpourri_data)
-                musicas_potpourri_list.append(musicas_potpourri)
+            existentes = db.session.query(
+                MusicasPotpourri.id, MusicasPotpourri.musica_id, MusicasPotpourri.chave_ordem
+            ).filter(
+                MusicasPotpourri.potpourri_id == potpourri_id
+            ).order_by(MusicasPotpourri.chave_ordem, MusicasPotpourri.id).all()
+            posicao_anterior = {row.id: posicao for posicao, row in enumerate(existentes, start=1)}
+            sequencia, remover = PotpourriService._diff_musicas_potpourri(
+                [tuple(row) for row in existentes], [m['musica_id'] for m in desejadas]
+            )
+            chaves, rebalanceado = MusicasPotpourriService.assign_chaves([chave for _, _, chave in sequencia])
 
-            # Commit all changes as a single transaction
-            db.session.commit()
+            if remover:
+                db.session.execute(delete(MusicasPotpourri).where(MusicasPotpourri.id.in_(remover)))
+
+            agora = datetime.utcnow()
+            movidas = [
+                (posicao, rel_id, musica_id, chave)
+                for posicao, ((rel_id, musica_id, atual), chave) in enumerate(zip(sequencia, chaves), start=1)
+                if rel_id is not None and atual is None
+            ]
+            if movidas:
+                db.session.execute(update(MusicasPotpourri), [
+                    {'id': rel_id, 'chave_ordem': chave, 'updated_at': agora} for _, rel_id, _, chave in movidas
+                ])
+            if rebalanceado:
+                MusicasPotpourriService.write_chaves([
+                    (rel_id, chave) for (rel_id, _, atual), chave in zip(sequencia, chaves)
+                    if atual is not None and chave != atual
+                ])
 
-            return {
+            inserir = [
+                {'potpourri_id': potpourri_id, 'musica_id': musica_id, 'chave_ordem': chave}
+                for (rel_id, musica_id, _), chave in zip(sequencia, chaves) if rel_id is None
+            ]
+            if inserir:
+                MusicasPotpourriService._verify_if_exists_batch(inserir)
+            inseridas = db.session.scalars(
+                insert(MusicasPotpourri).returning(MusicasPotpourri.id), inserir
+            ).all() if inserir else []
+
+            musicas_potpourri_list = MusicasPotpourri.query.filter_by(
+                potpourri_id=potpourri_id
+            ).order_by(MusicasPotpourri.chave_ordem, MusicasPotpourri.id).all()
+            result = {
                 'potpourri': potpourri.to_dict(),
-                'musicas_potpourri': [mp.to_dict() for mp in musicas_potpourri_list],
-                'total_musicas': len(musicas_potpourri_list)
+                'musicas_potpourri': [mp.to_dict(posicao) for posicao, mp in enumerate(musicas_potpourri_list, start=1)],
+                'total_musicas': len(musicas_potpourri_list),
+                'alteracoes': {
+                    'inseridas': sorted(inseridas),
+                    'movidas': [
+                        {
+                            'id': rel_id,
+                            'musica_id': musica_id,
+                            'ordem_anterior': posicao_anterior[rel_id],
+                            'ordem_tocagem': posicao
+                        }
+                        for posicao, rel_id, musica_id, _ in movidas
+                    ],
+                    'removidas': sorted(remover),
+                    'inalteradas': len(sequencia) - len(inserir) - len(movidas),
+                    'rebalanceado': rebalanceado
+                }
             }
 
+            # Commit all changes as a single transaction
+            db.session.commit()
+            SuggestService.on_potpourri_saved(potpourri)
+            return result
+
         except SQLAlchemyError as e:
             db.session.rollback()
             raise Exception(f"Erro ao atualizar músicas do potpourri: {str(e)}")
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+    @staticmethod
+    def _lock_potpourri(potpourri_id: int) -> Potpourri:
+        # SELECT ... FOR UPDATE: movimentos e substituições do mesmo potpourri rodam um de cada vez
+        potpourri = db.session.execute(
+            select(Potpourri).where(Potpourri.id == potpourri_id).with_for_update()
+        ).scalar_one_or_none()
+        if not potpourri:
+            raise Exception("Potpourri não encontrado")
+        return potpourri
+
+    @staticmethod
+    def move_musica_potpourri(potpourri_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Move one entry before or after another one, in one transaction under a lock on the potpourri
+
+        Only the moved row is written: its chave_ordem becomes the midpoint between its new
+        neighbours, and the positions of the others follow from the keys when they are read.
+        When the neighbours leave no gap, the keys of the whole potpourri are rebalanced first.
+        """
+        musica_potpourri_id = data.get('musicas_potpourri_id')
+        antes_de = data.get('antes_de')
+        depois_de = data.get('depois_de')
+        if not musica_potpourri_id:
+            raise Exception("musicas_potpourri_id é obrigatório")
+        if bool(antes_de) == bool(depois_de):
+            raise Exception("Informe apenas um entre antes_de e depois_de")
+        ancora_id = antes_de or depois_de
+        if ancora_id == musica_potpourri_id:
+            raise Exception("A música não pode ser movida em relação a ela mesma")
+
+        try:
+            PotpourriService._lock_potpourri(potpourri_id)
+            chaves = MusicasPotpourriService.get_chaves_em_ordem(potpourri_id)
+            ids = [rel_id for rel_id, _ in chaves]
+            if musica_potpourri_id not in ids or ancora_id not in ids:
+                raise Exception("Relacionamento música-potpourri não encontrado neste potpourri")
+
+            outras = [(rel_id, chave) for rel_id, chave in chaves if rel_id != musica_potpourri_id]
+            posicao = next(i for i, (rel_id, _) in enumerate(outras) if rel_id == ancora_id) + (1 if antes_de else 2)
+            movida = MusicasPotpourri.query.get(musica_potpourri_id)
+            if ids.index(musica_potpourri_id) + 1 == posicao:
+                # Já está na posição pedida: só libera o lock
+                result = {'musicas_potpourri': movida.to_dict(posicao), 'rebalanceado': False, 'reordenadas': 0}
+                db.session.rollback()
+                return result
+
+            (nova_chave,), reescritas, rebalanceado = MusicasPotpourriService.place_in_order(
+                outras, [(posicao, None)]
+            )
+            MusicasPotpourriService.write_chaves(reescritas)
+            movida.chave_ordem = nova_chave
+            movida.updated_at = datetime.utcnow()
+            result = {
+                'musicas_potpourri': movida.to_dict(posicao),
+                'rebalanceado': rebalanceado,
+                'reordenadas': len(reescritas)
+            }
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Erro ao mover música do potpourri: {str(e)}")
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return result
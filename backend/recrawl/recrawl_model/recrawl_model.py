@@ -0,0 +1,33 @@
+from datetime import datetime
+from app import db
+
+class RecrawlCheckpoint(db.Model):
+    __tablename__ = 'recrawl_checkpoints'
+
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    ultimo_musica_id = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_RUNNING)
+    processadas = db.Column(db.Integer, nullable=False, default=0)
+    alteradas = db.Column(db.Integer, nullable=False, default=0)
+    falhas = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<RecrawlCheckpoint {self.id} ultimo_musica_id={self.ultimo_musica_id}>'
+
+    def to_dict(self):
+        """Convert model to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'ultimo_musica_id': self.ultimo_musica_id,
+            'status': self.status,
+            'processadas': self.processadas,
+            'alteradas': self.alteradas,
+            'falhas': self.falhas,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
@@ -0,0 +1,132 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+from app import db
+from musica.musica_model.musica_model import Musica
+from musica.musica_services.musica_services import MusicaService
+from musica.musica_services.search_music_by_url.search_music_by_url import search_music_by_url
+from musica.musica_services.cifra_parser.cifra_parser import structure_cifra
+from recrawl.recrawl_model.recrawl_model import RecrawlCheckpoint
+from cifra_index.cifra_index_services.cifra_index_services import CifraIndexService
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+
+RECRAWL_CHUNK_SIZE = int(os.getenv('RECRAWL_CHUNK_SIZE', '100'))
+RECRAWL_CONCURRENCY = int(os.getenv('RECRAWL_CONCURRENCY', '4'))
+
+
+class RecrawlService:
+
+    @staticmethod
+    def _scrape(link_musica: str) -> Optional[Dict]:
+        try:
+            # Revalida na origem mesmo que o cache ainda esteja no TTL
+            return search_music_by_url(link_musica, revalidate=True)
+        except Exception as e:
+            print(f"Erro ao recarregar {link_musica}: {e}")
+            return None
+
+    @staticmethod
+    def get_or_create_checkpoint(checkpoint_id: Optional[int] = None) -> RecrawlCheckpoint:
+        """Resume an existing checkpoint or start a new recrawl from the first musica"""
+        try:
+            if checkpoint_id:
+                checkpoint = RecrawlCheckpoint.query.get(checkpoint_id)
+                if not checkpoint:
+                    raise Exception("Checkpoint de recrawl não encontrado")
+                return checkpoint
+
+            checkpoint = RecrawlCheckpoint(ultimo_musica_id=0)
+            db.session.add(checkpoint)
+            db.session.commit()
+            return checkpoint
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Erro ao criar checkpoint de recrawl: {str(e)}")
+
+    @staticmethod
+    def run_chunk(
+        checkpoint: RecrawlCheckpoint,
+        chunk_size: int = RECRAWL_CHUNK_SIZE,
+        concurrency: int = RECRAWL_CONCURRENCY
+    ) -> bool:
+        """Recrawl the next chunk after the checkpoint; returns False when the catalog is exhausted"""
+        rows = db.session.query(
+            Musica.id, Musica.link_musica, Musica.cifra_hash
+        ).filter(
+            Musica.id > checkpoint.ultimo_musica_id
+        ).order_by(Musica.id).limit(chunk_size).all()
+
+        if not rows:
+            checkpoint.status = RecrawlCheckpoint.STATUS_DONE
+            db.session.commit()
+            return False
+
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(rows)))) as executor:
+            scrapes = list(executor.map(RecrawlService._scrape, [row.link_musica for row in rows]))
+
+        # Músicas antigas sem hash: compara com o hash da cifra armazenada
+        sem_hash = [row.id for row in rows if row.cifra_hash is None]
+        hashes_armazenados: Dict[int, Optional[str]] = {row.id: row.cifra_hash for row in rows}
+        if sem_hash:
+            for musica_id, cifra in db.session.query(Musica.id, Musica.cifra).filter(Musica.id.in_(sem_hash)):
+                hashes_armazenados[musica_id] = MusicaService.hash_cifra(cifra)
+
+        alteradas = falhas = 0
+        try:
+            for row, search_music in zip(rows, scrapes):
+                if not search_music:
+                    falhas += 1
+                    continue
+
+                novo_hash = MusicaService.hash_cifra(search_music.get('cifra'))
+                if novo_hash != hashes_armazenados[row.id]:
+                    db.session.execute(
+                        update(Musica).where(Musica.id == row.id).values(
+                            cifra=search_music.get('cifra'),
+                            cifra_hash=novo_hash,
+                            cifra_estruturada=structure_cifra(search_music.get('cifra')),
+                            updated_at=datetime.utcnow()
+                        )
+                    )
+                    # A busca por conteúdo precisa refletir o texto novo, na mesma transação
+                    CifraIndexService.reindex_cifra(row.id, search_music.get('cifra'))
+                    alteradas += 1
+                elif row.cifra_hash is None:
+                    # Apenas registra o hash, sem alterar updated_at
+                    db.session.execute(
+                        update(Musica).where(Musica.id == row.id).values(
+                            cifra_hash=novo_hash,
+                            updated_at=Musica.updated_at
+                        )
+                    )
+
+            checkpoint.ultimo_musica_id = rows[-1].id
+            checkpoint.processadas += len(rows)
+            checkpoint.alteradas += alteradas
+            checkpoint.falhas += falhas
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Erro ao gravar recrawl: {str(e)}")
+
+        return True
+
+    @staticmethod
+    def run(
+        checkpoint_id: Optional[int] = None,
+        chunk_size: int = RECRAWL_CHUNK_SIZE,
+        concurrency: int = RECRAWL_CONCURRENCY,
+        max_chunks: Optional[int] = None
+    ) -> RecrawlCheckpoint:
+        """Walk the catalog chunk by chunk, saving progress after each one"""
+        checkpoint = RecrawlService.get_or_create_checkpoint(checkpoint_id)
+        executados = 0
+        while max_chunks is None or executados < max_chunks:
+            if not RecrawlService.run_chunk(checkpoint, chunk_size, concurrency):
+                break
+            executados += 1
+            print(f"Recrawl {checkpoint.id}: {checkpoint.to_dict()}")
+        return checkpoint
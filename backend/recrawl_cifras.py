@@ -0,0 +1,16 @@
+from app import app
+from recrawl.recrawl_services.recrawl_services import RecrawlService, RECRAWL_CHUNK_SIZE, RECRAWL_CONCURRENCY
+import argparse
+
+# Recarrega as cifras do catálogo a partir da origem, gravando apenas as que mudaram
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recrawl incremental das cifras armazenadas")
+    parser.add_argument('--checkpoint', type=int, default=None, help="ID do checkpoint a retomar")
+    parser.add_argument('--chunk-size', type=int, default=RECRAWL_CHUNK_SIZE)
+    parser.add_argument('--concurrency', type=int, default=RECRAWL_CONCURRENCY)
+    parser.add_argument('--max-chunks', type=int, default=None, help="Para após N lotes (retomar com --checkpoint)")
+    args = parser.parse_args()
+
+    with app.app_context():
+        checkpoint = RecrawlService.run(args.checkpoint, args.chunk_size, args.concurrency, args.max_chunks)
+        print(f"Recrawl finalizado: {checkpoint.to_dict()}")
@@ -0,0 +1,8 @@
+from app import app
+from cifra_index.cifra_index_services.cifra_index_services import CifraIndexService
+
+# Reconstrói o índice de conteúdo das cifras (músicas importadas antes do índice existir)
+if __name__ == '__main__':
+    with app.app_context():
+        total = CifraIndexService.reindex_all()
+        print(f"Cifras indexadas: {total}")
@@ -1,6 +1,7 @@
 from app import app     
 import os
 from dotenv import load_dotenv
+from import_job.import_job_services.import_job_services import ImportJobService
 load_dotenv()
 
 FLAG_ENV = os.getenv("FLAG_ENV", "dev")
@@ -8,4 +9,11 @@ FLAG_ENV = os.getenv("FLAG_ENV", "dev")
 if __name__ == '__main__':
     print("Ambiente iniciado: ", FLAG_ENV)  
     print("Iniciando o servidor... Potpourri Music API")
+    # Com debug o reloader executa este arquivo duas vezes; os jobs são retomados
+    # só no processo filho, que é o que atende as requisições
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        with app.app_context():
+            # Jobs de importação enfileirados ou interrompidos antes do último reinício
+            ImportJobService.recover_jobs()
+            ImportJobService.start_lease_monitor(app)
     app.run( host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,156 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Sequence
+
+from flask import current_app
+
+from app import db
+from musica.musica_model.musica_model import Musica
+from potpourri.potpourri_model.potpourri_model import Potpourri
+from sqlalchemy import text, Integer, Float
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import column
+
+# Expressões indexadas pela migração b5e8d1f6c047; as consultas precisam usar exatamente as mesmas
+PG_MUSICA_TEXTO = "f_unaccent(lower(coalesce(musicas.nome, '') || ' ' || coalesce(musicas.artista, '')))"
+PG_MUSICA_DOCUMENTO = f"to_tsvector('simple', {PG_MUSICA_TEXTO})"
+PG_POTPOURRI_TEXTO = "f_unaccent(lower(coalesce(potpourri.nome_potpourri, '')))"
+PG_POTPOURRI_DOCUMENTO = f"to_tsvector('simple', {PG_POTPOURRI_TEXTO})"
+
+BACKEND_POSTGRES = 'postgresql'
+BACKEND_SQLITE_FTS = 'sqlite_fts'
+BACKEND_SIMPLE = 'simple'
+
+# URL do banco -> backend detectado; a detecção roda uma vez por processo
+_search_backends: Dict[str, str] = {}
+
+
+def normalize_search_term(term: str) -> str:
+    """Remove acentos e converte para minúsculas"""
+    decomposed = unicodedata.normalize('NFKD', term or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower().strip()
+
+
+def _tokens(term: str) -> List[str]:
+    return re.findall(r'\w+', normalize_search_term(term))
+
+
+class SearchIndexService:
+
+    @staticmethod
+    def _dialect() -> str:
+        return db.engine.dialect.name
+
+    @staticmethod
+    def _detect_backend() -> str:
+        dialect = SearchIndexService._dialect()
+        try:
+            with db.engine.connect() as conn:
+                if dialect == 'postgresql':
+                    ready = conn.execute(text(
+                        "SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL "
+                        "AND EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+                    )).scalar()
+                    if ready:
+                        return BACKEND_POSTGRES
+
+                elif dialect == 'sqlite':
+                    tables = conn.execute(text(
+                        "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name IN ('musicas_fts', 'potpourri_fts')"
+                    )).scalar()
+                    if tables == 2:
+                        return BACKEND_SQLITE_FTS
+
+                else:
+                    return BACKEND_SIMPLE
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f"Não foi possível verificar o índice de busca: {e}")
+
+        current_app.logger.warning(
+            "Índice de busca ausente (rode flask db upgrade ou verifique as extensões unaccent/pg_trgm), usando busca simples"
+        )
+        return BACKEND_SIMPLE
+
+    @staticmethod
+    def search_backend() -> str:
+        """Which search path this database supports: the migrated index or the plain ilike fallback"""
+        url = str(db.engine.url)
+        backend = _search_backends.get(url)
+        if backend is None:
+            backend = SearchIndexService._detect_backend()
+            _search_backends[url] = backend
+        return backend
+
+    @staticmethod
+    def reset_search_backend() -> None:
+        """Forget the detected backend, e.g. after running the search index migration in-process"""
+        _search_backends.clear()
+
+    @staticmethod
+    def _sqlite_match(tokens: List[str]) -> str:
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    @staticmethod
+    def _pg_tsquery(tokens: List[str]) -> str:
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    @staticmethod
+    def search_musicas(search_term: str, page: int = 1, per_page: int = 10, options: Sequence[Any] = ()) -> Any:
+        """Relevance-ranked, accent-insensitive search on nome/artista"""
+        tokens = _tokens(search_term)
+        backend = SearchIndexService.search_backend()
+        query = Musica.query.options(*options)
+
+        if tokens and backend == BACKEND_POSTGRES:
+            termo = normalize_search_term(search_term)
+            query = query.filter(text(
+                f"({PG_MUSICA_DOCUMENTO} @@ to_tsquery('simple', :tsq) OR :termo <% {PG_MUSICA_TEXTO})"
+            ).bindparams(tsq=SearchIndexService._pg_tsquery(tokens), termo=termo)).order_by(text(
+                f"ts_rank({PG_MUSICA_DOCUMENTO}, to_tsquery('simple', :tsq_rank)) "
+                f"+ word_similarity(:termo_rank, {PG_MUSICA_TEXTO}) DESC"
+            ).bindparams(tsq_rank=SearchIndexService._pg_tsquery(tokens), termo_rank=termo), Musica.id)
+
+        elif tokens and backend == BACKEND_SQLITE_FTS:
+            fts = text(
+                "SELECT rowid AS id, bm25(musicas_fts) AS rank FROM musicas_fts WHERE musicas_fts MATCH :q"
+            ).bindparams(q=SearchIndexService._sqlite_match(tokens)).columns(
+                column('id', Integer), column('rank', Float)
+            ).subquery('fts')
+            query = query.join(fts, fts.c.id == Musica.id).order_by(fts.c.rank, Musica.id)
+
+        else:
+            query = query.filter(db.or_(
+                Musica.nome.ilike(f'%{search_term}%'),
+                Musica.artista.ilike(f'%{search_term}%')
+            ))
+
+        return query.paginate(page=page, per_page=per_page, error_out=False)
+
+    @staticmethod
+    def search_potpourri(search_term: str, page: int = 1, per_page: int = 10) -> Any:
+        """Relevance-ranked, accent-insensitive search on nome_potpourri"""
+        tokens = _tokens(search_term)
+        backend = SearchIndexService.search_backend()
+        query = Potpourri.query
+
+        if tokens and backend == BACKEND_POSTGRES:
+            termo = normalize_search_term(search_term)
+            query = query.filter(text(
+                f"({PG_POTPOURRI_DOCUMENTO} @@ to_tsquery('simple', :tsq) OR :termo <% {PG_POTPOURRI_TEXTO})"
+            ).bindparams(tsq=SearchIndexService._pg_tsquery(tokens), termo=termo)).order_by(text(
+                f"ts_rank({PG_POTPOURRI_DOCUMENTO}, to_tsquery('simple', :tsq_rank)) "
+                f"+ word_similarity(:termo_rank, {PG_POTPOURRI_TEXTO}) DESC"
+            ).bindparams(tsq_rank=SearchIndexService._pg_tsquery(tokens), termo_rank=termo), Potpourri.id)
+
+        elif tokens and backend == BACKEND_SQLITE_FTS:
+            fts = text(
+                "SELECT rowid AS id, bm25(potpourri_fts) AS rank FROM potpourri_fts WHERE potpourri_fts MATCH :q"
+            ).bindparams(q=SearchIndexService._sqlite_match(tokens)).columns(
+                column('id', Integer), column('rank', Float)
+            ).subquery('fts')
+            query = query.join(fts, fts.c.id == Potpourri.id).order_by(fts.c.rank, Potpourri.id)
+
+        else:
+            query = query.filter(Potpourri.nome_potpourri.ilike(f'%{search_term}%'))
+
+        return query.paginate(page=page, per_page=per_page, error_out=False)
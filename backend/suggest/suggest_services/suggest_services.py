@@ -0,0 +1,254 @@
+import os
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Any, List, Optional, Tuple
+
+from flask import current_app
+
+from app import db
+from musica.musica_model.musica_model import Musica
+from musica.musica_services.cifra_parser.cifra_parser import normalize_word
+from potpourri.potpourri_model.potpourri_model import Potpourri
+
+# Reconstrução periódica em segundo plano, para refletir o que outros processos gravaram (0 desliga)
+SUGGEST_INDEX_REFRESH = float(os.getenv('SUGGEST_INDEX_REFRESH', '300'))
+# Entradas examinadas por faixa de qualidade antes de ordenar; limita prefixos muito curtos
+SUGGEST_SCAN_LIMIT = int(os.getenv('SUGGEST_SCAN_LIMIT', '2000'))
+SUGGEST_MAX_LIMIT = 50
+
+TIPO_MUSICA = 'musica'
+TIPO_POTPOURRI = 'potpourri'
+
+# Faixas de qualidade, da melhor para a pior: início do título, palavra do título,
+# início do artista, palavra do artista (nome_potpourri conta como título)
+FAIXA_TITULO = 0
+FAIXA_ARTISTA = 2
+FAIXAS = 4
+
+_WORD_START_RE = re.compile(r'\w+')
+
+
+def _normalize(texto: Optional[str]) -> str:
+    return ' '.join(normalize_word(texto or '').split())
+
+
+def _keys_for(titulo: Optional[str], artista: Optional[str] = None) -> List[Tuple[int, str]]:
+    """Chaves indexadas, com a faixa de cada uma: o texto normalizado a partir de cada início de palavra
+
+    Assim "jobim" encontra "Tom Jobim" e "agua de" encontra "Água de Chuva no Mar".
+    Uma chave que aparece no título e no artista fica só na faixa melhor.
+    """
+    faixas: Dict[str, int] = {}
+    for texto, base in ((titulo, FAIXA_TITULO), (artista, FAIXA_ARTISTA)):
+        normalizado = _normalize(texto)
+        for match in _WORD_START_RE.finditer(normalizado):
+            faixa = base if match.start() == 0 else base + 1
+            key = normalizado[match.start():]
+            faixas[key] = min(faixa, faixas.get(key, faixa))
+    return sorted((faixa, key) for key, faixa in faixas.items())
+
+
+class PrefixIndex:
+    """Arrays ordenados de (chave, tipo, id), um por faixa de qualidade, consultados com bisect
+
+    Construído no primeiro uso e mantido pelos hooks dos services; a reconstrução periódica
+    roda numa thread própria e nunca no caminho da requisição.
+    """
+
+    def __init__(self, refresh_interval: float = SUGGEST_INDEX_REFRESH, scan_limit: int = SUGGEST_SCAN_LIMIT):
+        self.refresh_interval = refresh_interval
+        self.scan_limit = scan_limit
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._tiers: List[List[Tuple[str, str, int]]] = [[] for _ in range(FAIXAS)]
+        self._keys: Dict[Tuple[str, int], List[Tuple[int, str]]] = {}
+        self._labels: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._built = False
+        # Alterações feitas enquanto uma reconstrução lê o banco; reaplicadas sobre o resultado
+        self._pending: Optional[List[Tuple[str, Tuple[str, int], Optional[Dict[str, Any]], tuple]]] = None
+        self._refresher: Optional[threading.Thread] = None
+
+    @property
+    def is_built(self) -> bool:
+        return self._built
+
+    def _load(self) -> None:
+        with self._lock:
+            self._pending = []
+
+        tiers: List[List[Tuple[str, str, int]]] = [[] for _ in range(FAIXAS)]
+        keys: Dict[Tuple[str, int], List[Tuple[int, str]]] = {}
+        labels: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        try:
+            for musica_id, nome, artista in db.session.query(Musica.id, Musica.nome, Musica.artista):
+                ref = (TIPO_MUSICA, musica_id)
+                keys[ref] = _keys_for(nome, artista)
+                labels[ref] = {'tipo': TIPO_MUSICA, 'id': musica_id, 'nome': nome, 'artista': artista}
+                for faixa, key in keys[ref]:
+                    tiers[faixa].append((key, TIPO_MUSICA, musica_id))
+
+            for potpourri_id, nome_potpourri in db.session.query(Potpourri.id, Potpourri.nome_potpourri):
+                ref = (TIPO_POTPOURRI, potpourri_id)
+                keys[ref] = _keys_for(nome_potpourri)
+                labels[ref] = {'tipo': TIPO_POTPOURRI, 'id': potpourri_id, 'nome': nome_potpourri}
+                for faixa, key in keys[ref]:
+                    tiers[faixa].append((key, TIPO_POTPOURRI, potpourri_id))
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        for tier in tiers:
+            tier.sort()
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._tiers, self._keys, self._labels = tiers, keys, labels
+            self._built = True
+            for operacao, ref, label, textos in pending:
+                if operacao == 'upsert':
+                    self._upsert_locked(ref, label, textos)
+                else:
+                    self._remove_locked(ref)
+
+    def _ensure_built(self) -> None:
+        if self._built:
+            return
+        # Só a primeira requisição constrói; as concorrentes esperam pelo mesmo resultado
+        with self._build_lock:
+            if not self._built:
+                self._load()
+                self._start_refresher()
+
+    def _start_refresher(self) -> None:
+        if self.refresh_interval <= 0 or self._refresher is not None:
+            return
+        app = current_app._get_current_object()
+        self._refresher = threading.Thread(target=self._refresh_loop, args=(app,), name='suggest-refresh', daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self, app) -> None:
+        while True:
+            time.sleep(self.refresh_interval)
+            self.refresh(app)
+
+    def refresh(self, app) -> None:
+        """Rebuild from the database while the current index keeps serving requests"""
+        with self._build_lock, app.app_context():
+            try:
+                self._load()
+            except Exception as e:
+                app.logger.warning(f"Erro ao reconstruir o índice de sugestões: {e}")
+
+    def _remove_locked(self, ref: Tuple[str, int]) -> None:
+        for faixa, key in self._keys.pop(ref, []):
+            tier = self._tiers[faixa]
+            index = bisect_left(tier, (key, ref[0], ref[1]))
+            if index < len(tier) and tier[index] == (key, ref[0], ref[1]):
+                del tier[index]
+        self._labels.pop(ref, None)
+
+    def _upsert_locked(self, ref: Tuple[str, int], label: Dict[str, Any], textos: tuple) -> None:
+        self._remove_locked(ref)
+        self._keys[ref] = _keys_for(*textos)
+        self._labels[ref] = label
+        for faixa, key in self._keys[ref]:
+            insort(self._tiers[faixa], (key, ref[0], ref[1]))
+
+    def upsert(self, tipo: str, item_id: int, label: Dict[str, Any], *textos: Optional[str]) -> None:
+        """Atualiza uma entrada; não faz nada enquanto o índice não foi construído"""
+        with self._lock:
+            ref = (tipo, item_id)
+            if self._pending is not None:
+                self._pending.append(('upsert', ref, label, textos))
+            if self._built:
+                self._upsert_locked(ref, label, textos)
+
+    def remove(self, tipo: str, item_id: int) -> None:
+        with self._lock:
+            ref = (tipo, item_id)
+            if self._pending is not None:
+                self._pending.append(('remove', ref, None, ()))
+            if self._built:
+                self._remove_locked(ref)
+
+    def refresh_async(self) -> None:
+        """Schedule a background rebuild (e.g. after a bulk import); requests keep the current index"""
+        if not self._built:
+            return
+        app = current_app._get_current_object()
+        threading.Thread(target=self.refresh, args=(app,), name='suggest-rebuild', daemon=True).start()
+
+    def suggest(self, prefix: str, limit: int = 10, tipo: Optional[str] = None) -> List[Dict[str, Any]]:
+        self._ensure_built()
+        prefixo = _normalize(prefix)
+        if not prefixo:
+            return []
+
+        # ref -> melhor faixa em que a entrada casou com o prefixo
+        candidatos: Dict[Tuple[str, int], int] = {}
+        with self._lock:
+            for faixa, tier in enumerate(self._tiers):
+                # As faixas seguintes só perdem para as anteriores: com limit candidatos, para
+                if len(candidatos) >= limit:
+                    break
+                index = bisect_left(tier, (prefixo,))
+                examinadas = 0
+                while index < len(tier) and examinadas < self.scan_limit:
+                    key, entry_tipo, item_id = tier[index]
+                    if not key.startswith(prefixo):
+                        break
+                    index += 1
+                    examinadas += 1
+                    if tipo and entry_tipo != tipo:
+                        continue
+                    candidatos.setdefault((entry_tipo, item_id), faixa)
+
+            # Melhor faixa primeiro; na mesma faixa, o nome mais curto é o mais próximo do que foi digitado
+            ranking = sorted(candidatos.items(), key=lambda item: (
+                item[1], len(self._labels[item[0]]['nome'] or ''), _normalize(self._labels[item[0]]['nome']), item[0]
+            ))
+            return [self._labels[ref] for ref, _ in ranking[:limit]]
+
+
+suggest_index = PrefixIndex()
+
+
+class SuggestService:
+
+    @staticmethod
+    def suggest(prefix: str, limit: int = 10, tipo: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Top-k typeahead suggestions over musica nome/artista and nome_potpourri"""
+        if tipo and tipo not in (TIPO_MUSICA, TIPO_POTPOURRI):
+            raise Exception("Tipo de sugestão inválido")
+        return suggest_index.suggest(prefix, max(1, min(limit, SUGGEST_MAX_LIMIT)), tipo)
+
+    @staticmethod
+    def on_musica_saved(musica) -> None:
+        suggest_index.upsert(
+            TIPO_MUSICA, musica.id,
+            {'tipo': TIPO_MUSICA, 'id': musica.id, 'nome': musica.nome, 'artista': musica.artista},
+            musica.nome, musica.artista
+        )
+
+    @staticmethod
+    def on_musica_deleted(musica_id: int) -> None:
+        suggest_index.remove(TIPO_MUSICA, musica_id)
+
+    @staticmethod
+    def on_potpourri_saved(potpourri) -> None:
+        suggest_index.upsert(
+            TIPO_POTPOURRI, potpourri.id,
+            {'tipo': TIPO_POTPOURRI, 'id': potpourri.id, 'nome': potpourri.nome_potpourri},
+            potpourri.nome_potpourri
+        )
+
+    @staticmethod
+    def on_potpourri_deleted(potpourri_id: int) -> None:
+        suggest_index.remove(TIPO_POTPOURRI, potpourri_id)
+
+    @staticmethod
+    def on_catalog_imported() -> None:
+        # Muitas entradas de uma vez: mais barato reconstruir (em segundo plano) do que inserir uma a uma
+        suggest_index.refresh_async()
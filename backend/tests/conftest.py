@@ -0,0 +1,80 @@
+"""Fixtures da suíte: app Flask sobre um SQLite temporário, com o schema das migrações
+
+O app lê a configuração do ambiente na importação, então as variáveis são definidas
+antes do primeiro `import app`. O scraping é trocado por um dicionário de cifras falsas.
+"""
+import os
+import shutil
+import tempfile
+
+_tmpdir = tempfile.mkdtemp(prefix='potpourri-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+os.environ['SCRAPE_CACHE_ENABLED'] = 'false'
+os.environ['SUGGEST_INDEX_REFRESH'] = '0'
+os.environ['RESPONSE_COMPRESSION'] = 'false'
+os.environ['CIFRA_COMPRESSION'] = 'none'
+
+import flask_migrate
+import pytest
+
+import app as app_module
+from search_index.search_index_services.search_index_services import SearchIndexService
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture(scope='session')
+def app():
+    # Caminho absoluto: a suíte também roda a partir da raiz do repositório
+    app_module.migrate.directory = MIGRATIONS_DIR
+    with app_module.app.app_context():
+        flask_migrate.upgrade()
+        SearchIndexService.reset_search_backend()
+    yield app_module.app
+    with app_module.app.app_context():
+        app_module.db.engine.dispose()
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def _limpa_banco(app):
+    yield
+    # As tabelas FTS acompanham os DELETEs pelos triggers
+    with app.app_context():
+        for table in reversed(app_module.db.metadata.sorted_tables):
+            app_module.db.session.execute(table.delete())
+        app_module.db.session.commit()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def cifras(monkeypatch):
+    """link -> (título da página, cifra) devolvidos no lugar do scraping"""
+    paginas = {}
+
+    def fake_search_music_by_url(link_musica, timings=None, **kwargs):
+        if link_musica not in paginas:
+            return None
+        titulo, cifra = paginas[link_musica]
+        return {'titulo': titulo, 'cifra': cifra, 'metodo': 'http'}
+
+    import musica.musica_services.musica_services as musica_services
+    monkeypatch.setattr(musica_services, 'search_music_by_url', fake_search_music_by_url)
+    return paginas
+
+
+@pytest.fixture
+def criar_musica(client, cifras):
+    """Cria uma música pela API e devolve o JSON dela"""
+    def _criar(nome, artista, cifra):
+        link = f"https://www.cifraclub.com.br/{artista}/{nome}/".lower().replace(' ', '-')
+        cifras[link] = (f"{nome} - {artista} - Cifra Club", cifra)
+        response = client.post('/api/musicas/', json={'link_musica': link})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['musica']
+    return _criar
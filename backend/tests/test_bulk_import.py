@@ -0,0 +1,41 @@
+import sqlalchemy as sa
+
+import musica.musica_services.musica_services as musica_services
+from app import db
+from musica.musica_model.musica_model import Musica
+from musica.musica_services.musica_services import MusicaService
+
+LINKS = [f'https://www.cifraclub.com.br/banda/musica-{i}/' for i in range(3)]
+
+
+def test_conflito_no_lote_so_falha_o_link_em_conflito(client, cifras, monkeypatch):
+    for i, link in enumerate(LINKS):
+        cifras[link] = (f"Música {i} - Banda - Cifra Club", f"C G\nletra {i}")
+    conflito = LINKS[1]
+
+    build_musica = MusicaService._build_musica
+    inserida = []
+
+    def _build_com_concorrente(link_musica, search_music):
+        # Outra importação grava o mesmo link entre a checagem de existência e o INSERT do lote
+        if link_musica == conflito and not inserida:
+            with db.engine.begin() as conn:
+                conn.execute(sa.insert(Musica.__table__).values(
+                    nome='Concorrente', artista='Banda', link_musica=conflito, cifra=None
+                ))
+            inserida.append(True)
+        return build_musica(link_musica, search_music)
+
+    monkeypatch.setattr(musica_services.MusicaService, '_build_musica', staticmethod(_build_com_concorrente))
+
+    response = client.post('/api/musicas/bulk', json={'links_musica': LINKS})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    status = {r['link_musica']: r['status'] for r in body['resultados']}
+    assert status == {LINKS[0]: 'criada', conflito: 'falha', LINKS[2]: 'criada'}
+    assert body['total_criadas'] == 2
+
+    for resultado in body['resultados']:
+        if resultado['status'] == 'criada':
+            musica = client.get(f"/api/musicas/{resultado['musica_id']}").get_json()['musica']
+            assert musica['link_musica'] == resultado['link_musica']
@@ -0,0 +1,44 @@
+import time
+
+from musica.musica_services.search_music_by_url.chrome_driver_pool import ChromeDriverPool, _PooledDriver
+
+
+class _ChromeFalso:
+    def __init__(self):
+        self.encerrado = False
+
+    def execute_script(self, script):
+        return 1
+
+    def quit(self):
+        self.encerrado = True
+
+
+def _pool(monkeypatch, idle_timeout):
+    pool = ChromeDriverPool(size=2, idle_timeout=idle_timeout)
+    monkeypatch.setattr(pool, '_create_driver', lambda: _PooledDriver(_ChromeFalso()))
+    return pool
+
+
+def test_reaper_encerra_sessoes_ociosas_sem_novos_scrapes(monkeypatch):
+    pool = _pool(monkeypatch, idle_timeout=0.1)
+    pool.warm_up(2)
+    chromes = [pooled.driver for pooled in pool._idle]
+
+    limite = time.monotonic() + 2
+    while pool._idle and time.monotonic() < limite:
+        time.sleep(0.02)
+    assert not pool._idle
+    assert all(chrome.encerrado for chrome in chromes)
+    pool.shutdown()
+
+
+def test_shutdown_para_o_reaper(monkeypatch):
+    pool = _pool(monkeypatch, idle_timeout=60)
+    pool.warm_up(1)
+    reaper = pool._reaper
+    assert reaper.is_alive()
+
+    pool.shutdown()
+    assert not reaper.is_alive()
+    assert not pool._idle
@@ -0,0 +1,80 @@
+import random
+
+import flask_migrate
+import pytest
+import sqlalchemy as sa
+
+from app import db
+from musica.musica_model.cifra_dictionary import CIFRA_DICTIONARIES
+from musica.musica_model.cifra_storage import cifra_is_binary
+from musica.musica_services.musica_services import MusicaService
+from train_cifra_dictionary import train
+from utils.compressed_text.compressed_text import encode_text, decode_text, zstandard
+
+ANTES_DA_COMPRESSAO = 'c7d2e91f4b36'
+COMPRESSAO = 'e4a1f7c3b952'
+
+ACORDES = ['C', 'G', 'Am', 'F', 'D', 'Em', 'A7', 'E', 'Dm', 'Bm', 'F#m', 'C7M', 'G/B', 'D/F#']
+PALAVRAS = ['amor', 'coração', 'você', 'vida', 'quero', 'sem', 'mais', 'noite', 'luar', 'saudade', 'mar']
+
+
+def _cifra(gerador):
+    partes = []
+    for secao in ('[Intro]', '[Primeira Parte]', '[Refrão]', '[Segunda Parte]', '[Refrão]'):
+        partes.append(secao)
+        for _ in range(gerador.randint(2, 4)):
+            partes.append('   '.join(gerador.choice(ACORDES) for _ in range(4)))
+            partes.append(' '.join(gerador.choice(PALAVRAS) for _ in range(gerador.randint(4, 8))))
+    return '\n'.join(partes)
+
+
+@pytest.mark.skipif(zstandard is None, reason='zstandard não instalado')
+def test_dicionario_treinado_comprime_melhor():
+    gerador = random.Random(7)
+    amostra = [_cifra(gerador) for _ in range(300)]
+    dictionary = train(amostra, 4096)
+    cifra = _cifra(gerador)
+
+    com_dicionario = encode_text(cifra, 'zstd', None, dictionary, 9)
+    assert com_dicionario[:2] == bytes([2, 9])
+    assert len(com_dicionario) < len(encode_text(cifra, 'zstd'))
+    assert decode_text(com_dicionario, {9: dictionary}) == cifra
+    assert decode_text(encode_text(cifra, 'zlib', None, dictionary, 9), {9: dictionary}) == cifra
+
+
+def test_lista_sem_cifra_nao_le_a_coluna(app, criar_musica):
+    criar_musica('Asa Branca', 'Luiz Gonzaga', 'G D\nquando olhei a terra ardendo')
+    with app.app_context():
+        sem_cifra = MusicaService.get_all_musicas(fields=['nome']).items[0]
+        assert 'cifra' in sa.inspect(sem_cifra).unloaded
+        db.session.expunge_all()
+
+        com_cifra = MusicaService.get_all_musicas().items[0]
+        assert 'cifra' not in sa.inspect(com_cifra).unloaded
+
+
+def test_downgrade_desfaz_a_compressao(app, criar_musica, monkeypatch):
+    cifra = 'Am F C G\n' + 'quando a gente ama ' * 10
+    criar_musica('Exagerado', 'Cazuza', cifra)
+
+    def _coluna():
+        with app.app_context():
+            db.engine.dispose()
+            with db.engine.connect() as conn:
+                return cifra_is_binary(conn), conn.execute(sa.text('SELECT cifra FROM musicas')).scalar()
+
+    monkeypatch.setenv('CIFRA_COMPRESSION', 'zlib')
+    with app.app_context():
+        flask_migrate.downgrade(revision=ANTES_DA_COMPRESSAO)
+        flask_migrate.upgrade(revision=COMPRESSAO)
+    binaria, valor = _coluna()
+    assert binaria and decode_text(valor, CIFRA_DICTIONARIES) == cifra
+
+    with app.app_context():
+        flask_migrate.downgrade(revision=ANTES_DA_COMPRESSAO)
+    assert _coluna() == (False, cifra)
+
+    monkeypatch.setenv('CIFRA_COMPRESSION', 'none')
+    with app.app_context():
+        flask_migrate.upgrade()
+    assert _coluna() == (False, cifra)
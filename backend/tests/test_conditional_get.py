@@ -0,0 +1,70 @@
+def _get(client, url, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(url, headers=headers)
+
+
+def test_detalhe_da_musica_responde_304(client, criar_musica):
+    musica = criar_musica('Asa Branca', 'Luiz Gonzaga', 'G C D\nquando olhei a terra ardendo')
+    url = f"/api/musicas/{musica['id']}"
+
+    primeira = _get(client, url)
+    assert primeira.status_code == 200
+    etag = primeira.headers['ETag'].strip('"')
+    assert etag
+
+    segunda = _get(client, url, primeira.headers['ETag'])
+    assert segunda.status_code == 304
+    assert segunda.data == b''
+
+    # Outra representação (fields) tem outro ETag
+    assert _get(client, f'{url}?fields=nome', primeira.headers['ETag']).status_code == 200
+
+
+def test_etag_muda_quando_o_recurso_muda(client, criar_musica):
+    response = client.post('/api/potpourri/', json={'nome_potpourri': 'Forró'})
+    assert response.status_code == 201, response.get_json()
+    potpourri_id = response.get_json()['potpourri']['id']
+    url = f'/api/potpourri/{potpourri_id}'
+
+    etag = _get(client, url).headers['ETag']
+    assert _get(client, url, etag).status_code == 304
+
+    response = client.put(url, json={'nome_potpourri': 'Forró pé de serra'})
+    assert response.status_code == 200
+
+    atualizado = _get(client, url, etag)
+    assert atualizado.status_code == 200
+    assert atualizado.get_json()['potpourri']['nome_potpourri'] == 'Forró pé de serra'
+    assert atualizado.headers['ETag'] != etag
+
+
+def test_setlist_responde_304_ate_um_move(client, criar_musica):
+    musicas = [criar_musica(f'Xote {i}', 'Trio', f'C G\nverso {i}') for i in range(1, 4)]
+    response = client.post('/api/potpourri/create-with-musics', json={
+        'nome_potpourri': 'Xotes',
+        'musicas_potpourri': [{'musica_id': m['id'], 'ordem_tocagem': i} for i, m in enumerate(musicas, start=1)]
+    })
+    potpourri_id = response.get_json()['data']['potpourri']['id']
+    url = f'/api/potpourri/{potpourri_id}/setlist'
+
+    primeira = _get(client, url)
+    etag = primeira.headers['ETag']
+    assert _get(client, url, etag).status_code == 304
+
+    relacoes = [item['id'] for item in primeira.get_json()['musicas_potpourri']]
+    response = client.post(f'/api/potpourri/{potpourri_id}/move', json={
+        'musicas_potpourri_id': relacoes[2], 'antes_de': relacoes[0]
+    })
+    assert response.status_code == 200
+    assert _get(client, url, etag).status_code == 200
+
+
+def test_listagem_responde_304(client, criar_musica):
+    criar_musica('Baião', 'Luiz Gonzaga', 'A E\neu vou mostrar pra vocês')
+
+    primeira = _get(client, '/api/musicas/')
+    assert primeira.status_code == 200
+    assert _get(client, '/api/musicas/', primeira.headers['ETag']).status_code == 304
+
+    criar_musica('Xote das Meninas', 'Luiz Gonzaga', 'D A\nmandacaru')
+    assert _get(client, '/api/musicas/', primeira.headers['ETag']).status_code == 200
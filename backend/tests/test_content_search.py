@@ -0,0 +1,99 @@
+import cifra_index.cifra_index_services.cifra_index_services as cifra_index_services
+
+
+def _busca(client, termo, **params):
+    response = client.get('/api/musicas/search/content', query_string={'q': termo, **params})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def _nomes(resultado):
+    return [item['musica']['nome'] for item in resultado['musicas']]
+
+
+def test_busca_por_trecho_da_letra(client, criar_musica):
+    criar_musica('Asa Branca', 'Luiz Gonzaga', 'G C\nQuando olhei a terra ardendo\nD G\nqual fogueira de São João')
+    criar_musica('Baião', 'Luiz Gonzaga', 'A E\nEu vou mostrar pra vocês\ncomo se dança o baião')
+
+    resultado = _busca(client, 'terra ardendo')
+    assert resultado['tipo_busca'] == 'letra'
+    assert _nomes(resultado) == ['Asa Branca']
+    hit = resultado['musicas'][0]['hits'][0]
+    assert hit['trecho'] == 'Quando olhei a terra ardendo'
+
+    # Sem acento e fora de ordem não é a mesma sequência
+    assert _nomes(_busca(client, 'sao joao')) == ['Asa Branca']
+    assert _busca(client, 'ardendo terra')['pagination']['total'] == 0
+
+
+def test_busca_por_progressao_de_acordes(client, criar_musica):
+    criar_musica('Primeira', 'Banda', 'Am F C G\nlá lá lá')
+    criar_musica('Segunda', 'Banda', 'C G Am F\nlê lê lê')
+
+    resultado = _busca(client, 'Am F C')
+    assert resultado['tipo_busca'] == 'progressao'
+    assert _nomes(resultado) == ['Primeira']
+    assert sorted(_nomes(_busca(client, 'Am F'))) == ['Primeira', 'Segunda']
+
+
+def test_busca_confere_todas_as_candidatas(client, criar_musica, monkeypatch):
+    # Lotes de uma música: candidatas que não formam a sequência não escondem as seguintes
+    monkeypatch.setattr(cifra_index_services, 'CIFRA_SEARCH_BATCH_SIZE', 1)
+    criar_musica('Fora de ordem 1', 'Banda', 'C\nfogo no mar')
+    criar_musica('Fora de ordem 2', 'Banda', 'C\nfogo e mar no céu')
+    criar_musica('Na ordem', 'Banda', 'C\nmar de fogo')
+    criar_musica('Também na ordem', 'Banda', 'C\num mar de fogo e outro mar de fogo')
+
+    resultado = _busca(client, 'mar de fogo', per_page=1)
+    assert resultado['pagination']['total'] == 2
+    # Mais ocorrências primeiro
+    assert _nomes(resultado) == ['Também na ordem']
+    assert resultado['musicas'][0]['total_hits'] == 2
+    assert _nomes(_busca(client, 'mar de fogo', per_page=1, page=2)) == ['Na ordem']
+
+
+def test_busca_reflete_edicao_da_cifra(client, criar_musica):
+    musica = criar_musica('Editada', 'Banda', 'C\nletra antiga')
+    response = client.put(f"/api/musicas/{musica['id']}", json={
+        'link_musica': musica['link_musica'], 'cifra': 'C\nletra nova', 'velocidade_rolamento': 1
+    })
+    assert response.status_code == 200, response.get_json()
+
+    assert _busca(client, 'letra antiga')['pagination']['total'] == 0
+    assert _nomes(_busca(client, 'letra nova')) == ['Editada']
+
+
+def test_carrega_posicoes_so_para_a_pagina(client, criar_musica, monkeypatch):
+    for i in range(6):
+        criar_musica(f'Fogo {i}', 'Banda', 'C\nmar de fogo')
+    conferidas = []
+    original = cifra_index_services.CifraIndexService._match_sequence
+
+    def _espiao(tipo, termos, distintos, candidatas):
+        conferidas.extend(candidatas)
+        return original(tipo, termos, distintos, candidatas)
+
+    monkeypatch.setattr(cifra_index_services.CifraIndexService, '_match_sequence', staticmethod(_espiao))
+    monkeypatch.setattr(cifra_index_services, 'CIFRA_SEARCH_BATCH_SIZE', 2)
+
+    resultado = _busca(client, 'mar de fogo', per_page=1)
+    # Página 1 com uma música: basta confirmar duas candidatas (a da página e a que indica has_next)
+    assert len(conferidas) == 2
+    assert resultado['pagination']['has_next'] is True
+    assert resultado['pagination']['total_estimado'] is True
+    assert resultado['pagination']['total'] == 6
+
+
+def test_total_estimado_quando_atinge_o_limite(client, criar_musica, monkeypatch):
+    monkeypatch.setattr(cifra_index_services, 'CIFRA_SEARCH_MAX_CANDIDATES', 3)
+    for i in range(5):
+        criar_musica(f'Fogo {i}', 'Banda', 'C\nmar de fogo')
+
+    resultado = _busca(client, 'mar de fogo', per_page=10)
+    assert len(resultado['musicas']) == 3
+    assert resultado['pagination']['total_estimado'] is True
+
+    monkeypatch.setattr(cifra_index_services, 'CIFRA_SEARCH_MAX_CANDIDATES', 10)
+    resultado = _busca(client, 'mar de fogo', per_page=10)
+    assert resultado['pagination']['total'] == 5
+    assert resultado['pagination']['total_estimado'] is False
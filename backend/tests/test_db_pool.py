@@ -0,0 +1,29 @@
+import sqlalchemy as sa
+
+from utils.db_pool.db_pool import InstrumentedQueuePool, pool_stats
+
+
+def test_recreate_mantem_configuracao_e_listeners_e_zera_metricas(tmp_path):
+    engine = sa.create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+        pool_size=2, max_overflow=3, pool_timeout=7, pool_pre_ping=True
+    )
+    checkouts = []
+    sa.event.listen(engine, 'checkout', lambda *args: checkouts.append(1))
+
+    with engine.connect() as conn:
+        conn.execute(sa.text('SELECT 1'))
+    stats = pool_stats(engine)
+    assert stats['checkouts'] == 1
+    assert (stats['size'], stats['max_overflow'], stats['timeout']) == (2, 3, 7)
+
+    engine.pool = engine.pool.recreate()
+    stats = pool_stats(engine)
+    assert isinstance(engine.pool, InstrumentedQueuePool)
+    assert (stats['size'], stats['max_overflow'], stats['timeout'], stats['checkouts']) == (2, 3, 7, 0)
+
+    with engine.connect() as conn:
+        conn.execute(sa.text('SELECT 1'))
+    assert pool_stats(engine)['checkouts'] == 1
+    assert len(checkouts) == 2
+    engine.dispose()
@@ -0,0 +1,85 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import import_job.import_job_services.import_job_services as import_job_services
+import musica.musica_services.musica_services as musica_services
+from app import db
+from import_job.import_job_model.import_job_model import ImportJob
+from import_job.import_job_services.import_job_services import ImportJobService
+from musica.musica_model.musica_model import Musica
+
+LINK = 'https://www.cifraclub.com.br/banda/demorada/'
+
+
+def _job(app, **campos):
+    with app.app_context():
+        job = ImportJob(link_musica=LINK, **campos)
+        db.session.add(job)
+        db.session.commit()
+        return job.id
+
+
+def _status(app, job_id):
+    with app.app_context():
+        return db.session.get(ImportJob, job_id).status
+
+
+def test_importar_o_app_nao_mexe_nos_jobs(app):
+    job_id = _job(app, status=ImportJob.STATUS_RUNNING, started_at=datetime.utcnow() - timedelta(hours=1),
+                  lease_expires_at=datetime.utcnow() - timedelta(minutes=1))
+    import run  # noqa: F401 - o ponto de entrada só retoma jobs quando executado
+    assert _status(app, job_id) == ImportJob.STATUS_RUNNING
+
+
+def test_so_o_lease_vencido_volta_para_a_fila(app):
+    antigo = datetime.utcnow() - timedelta(hours=1)
+    vivo = _job(app, status=ImportJob.STATUS_RUNNING, started_at=antigo,
+                lease_expires_at=datetime.utcnow() + timedelta(minutes=1))
+    vencido = _job(app, status=ImportJob.STATUS_RUNNING, started_at=antigo,
+                   lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+    with app.app_context():
+        assert ImportJobService.requeue_expired_jobs() == [vencido]
+    assert _status(app, vivo) == ImportJob.STATUS_RUNNING
+    assert _status(app, vencido) == ImportJob.STATUS_QUEUED
+
+
+def test_scrape_demorado_mantem_o_lease(app, monkeypatch):
+    monkeypatch.setattr(import_job_services, 'IMPORT_JOBS_LEASE_SECONDS', 0.3)
+
+    def scrape_demorado(link_musica, timings=None, **kwargs):
+        time.sleep(1.2)
+        return {'titulo': 'Demorada - Banda - Cifra Club', 'cifra': 'C\nla', 'metodo': 'http'}
+    monkeypatch.setattr(musica_services, 'search_music_by_url', scrape_demorado)
+
+    job_id = _job(app, status=ImportJob.STATUS_QUEUED)
+    requeued = []
+
+    def reaper():
+        # Outro worker procurando leases vencidos durante todo o scrape
+        for _ in range(10):
+            time.sleep(0.1)
+            with app.app_context():
+                requeued.extend(ImportJobService.requeue_expired_jobs())
+
+    thread = threading.Thread(target=reaper)
+    thread.start()
+    with app.app_context():
+        ImportJobService.run_job(job_id)
+    thread.join()
+
+    assert requeued == []
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        assert job.status == ImportJob.STATUS_DONE
+        assert job.lease_expires_at is None
+        assert db.session.query(Musica).filter_by(link_musica=LINK).count() == 1
+
+
+def test_execucao_que_perdeu_o_job_nao_renova_o_lease(app):
+    claimed_at = datetime.utcnow() - timedelta(minutes=5)
+    job_id = _job(app, status=ImportJob.STATUS_RUNNING, started_at=datetime.utcnow(),
+                  lease_expires_at=datetime.utcnow() + timedelta(minutes=1))
+    with app.app_context():
+        assert not ImportJobService.renew_lease(job_id, claimed_at)
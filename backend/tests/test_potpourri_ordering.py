@@ -0,0 +1,143 @@
+import pytest
+
+import musicas_potpourri.musicas_potpourri_services.musicas_potpourri_services as musicas_potpourri_services
+from musicas_potpourri.musicas_potpourri_model.musicas_potpourri_model import MusicasPotpourri
+from app import db
+
+
+@pytest.fixture
+def vao_pequeno(monkeypatch):
+    """Chaves internas com vão 2: o segundo movimento para o mesmo ponto já não tem chave livre"""
+    monkeypatch.setattr(musicas_potpourri_services, 'POTPOURRI_ORDER_GAP', 2)
+
+
+@pytest.fixture
+def potpourri(client, criar_musica):
+    """Potpourri com quatro músicas, nas ordens 1..4"""
+    musicas = [criar_musica(f'Musica {i}', 'Artista', f'Am F\nverso {i}') for i in range(1, 5)]
+    response = client.post('/api/potpourri/create-with-musics', json={
+        'nome_potpourri': 'Roda de samba',
+        'musicas_potpourri': [
+            {'musica_id': m['id'], 'ordem_tocagem': i} for i, m in enumerate(musicas, start=1)
+        ]
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['data']['potpourri']['id'], [m['id'] for m in musicas]
+
+
+def _setlist(client, potpourri_id):
+    response = client.get(f'/api/potpourri/{potpourri_id}/setlist')
+    assert response.status_code == 200
+    return response.get_json()['musicas_potpourri']
+
+
+def _musicas_em_ordem(client, potpourri_id):
+    itens = _setlist(client, potpourri_id)
+    assert [item['ordem_tocagem'] for item in itens] == list(range(1, len(itens) + 1))
+    return [item['musica_id'] for item in itens]
+
+
+def _chaves(app, potpourri_id):
+    with app.app_context():
+        return dict(db.session.query(MusicasPotpourri.id, MusicasPotpourri.chave_ordem).filter_by(
+            potpourri_id=potpourri_id
+        ).all())
+
+
+def _relacao_id(client, potpourri_id, musica_id):
+    return next(item['id'] for item in _setlist(client, potpourri_id) if item['musica_id'] == musica_id)
+
+
+def _move(client, potpourri_id, musica_id, **destino):
+    body = {'musicas_potpourri_id': _relacao_id(client, potpourri_id, musica_id)}
+    body.update({chave: _relacao_id(client, potpourri_id, alvo) for chave, alvo in destino.items()})
+    response = client.post(f'/api/potpourri/{potpourri_id}/move', json=body)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['data']
+
+
+def test_move_mantem_ordens_contiguas(client, potpourri):
+    potpourri_id, (a, b, c, d) = potpourri
+
+    _move(client, potpourri_id, d, antes_de=a)
+    assert _musicas_em_ordem(client, potpourri_id) == [d, a, b, c]
+
+    _move(client, potpourri_id, d, depois_de=b)
+    assert _musicas_em_ordem(client, potpourri_id) == [a, b, d, c]
+
+    resultado = _move(client, potpourri_id, a, depois_de=c)
+    assert _musicas_em_ordem(client, potpourri_id) == [b, d, c, a]
+    assert resultado['musicas_potpourri']['ordem_tocagem'] == 4
+
+
+def test_move_grava_apenas_a_linha_movida(app, client, potpourri):
+    potpourri_id, (a, b, c, d) = potpourri
+    antes = _chaves(app, potpourri_id)
+
+    resultado = _move(client, potpourri_id, a, depois_de=c)
+    assert resultado['reordenadas'] == 0
+    assert resultado['musicas_potpourri']['ordem_tocagem'] == 3
+
+    depois = _chaves(app, potpourri_id)
+    assert [rel_id for rel_id in antes if antes[rel_id] != depois[rel_id]] == [resultado['musicas_potpourri']['id']]
+    assert _musicas_em_ordem(client, potpourri_id) == [b, c, a, d]
+
+
+def test_move_rebalanceia_quando_acaba_o_espaco(vao_pequeno, client, potpourri):
+    potpourri_id, (a, b, c, d) = potpourri
+
+    rebalanceados = [
+        _move(client, potpourri_id, musica, antes_de=b)['rebalanceado'] for musica in (d, c)
+    ]
+    assert rebalanceados == [False, True]
+    assert _musicas_em_ordem(client, potpourri_id) == [a, d, c, b]
+
+
+def test_criar_na_posicao_pedida(app, client, potpourri, criar_musica):
+    potpourri_id, (a, b, c, d) = potpourri
+    e = criar_musica('Musica 5', 'Artista', 'G D\nrefrão')['id']
+    antes = _chaves(app, potpourri_id)
+
+    response = client.post('/api/musicas-potpourri/', json={
+        'potpourri_id': potpourri_id, 'musica_id': e, 'ordem_tocagem': 2
+    })
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['musicas_potpourri']['ordem_tocagem'] == 2
+    assert _musicas_em_ordem(client, potpourri_id) == [a, e, b, c, d]
+    assert all(_chaves(app, potpourri_id)[rel_id] == chave for rel_id, chave in antes.items())
+
+    pagina = client.get(f'/api/musicas-potpourri/by-potpourri/{potpourri_id}?page=2&per_page=2').get_json()
+    assert [item['ordem_tocagem'] for item in pagina['musicas_potpourri']] == [3, 4]
+
+
+def test_move_recusa_relacao_de_outro_potpourri(client, potpourri):
+    potpourri_id, (a, b, _, _) = potpourri
+    response = client.post(f'/api/potpourri/{potpourri_id}/move', json={
+        'musicas_potpourri_id': _relacao_id(client, potpourri_id, a), 'antes_de': 999999
+    })
+    assert response.status_code == 404
+
+
+def test_replace_reordena_insere_e_remove(client, potpourri, criar_musica):
+    potpourri_id, (a, b, c, d) = potpourri
+    e = criar_musica('Musica 5', 'Artista', 'G D\nrefrão')['id']
+
+    nova_ordem = [c, e, a, d]
+    response = client.put(f'/api/potpourri/{potpourri_id}/replace-musics', json={
+        'nome_potpourri': 'Roda de samba',
+        'musicas_potpourri': [
+            {'musica_id': musica_id, 'ordem_tocagem': i} for i, musica_id in enumerate(nova_ordem, start=1)
+        ]
+    })
+    assert response.status_code == 200, response.get_json()
+    assert _musicas_em_ordem(client, potpourri_id) == nova_ordem
+    # Só uma das músicas que ficaram precisa de chave nova; as outras duas já estão em ordem entre si
+    alteracoes = response.get_json()['data']['alteracoes']
+    assert len(alteracoes['inseridas']) == 1
+    assert len(alteracoes['removidas']) == 1
+    assert len(alteracoes['movidas']) == 1
+    assert alteracoes['inalteradas'] == 2
+
+    # O /move continua consistente depois de um replace que só trocou posições
+    _move(client, potpourri_id, d, antes_de=c)
+    assert _musicas_em_ordem(client, potpourri_id) == [d, c, e, a]
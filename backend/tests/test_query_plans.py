@@ -0,0 +1,46 @@
+import flask_migrate
+import pytest
+
+from check_query_plans import HOT_QUERIES, explain
+from app import db
+
+BASELINE = '3f1c9a2b7d10'
+# chave_ordem só existe a partir da migração que a cria: no baseline não há o que comparar
+QUERIES_DO_BASELINE = [query for query in HOT_QUERIES if 'chave_ordem' not in query[2]]
+
+
+def _planos(app, queries=HOT_QUERIES):
+    with app.app_context():
+        # Conexões novas: o EXPLAIN QUERY PLAN em cache numa conexão antiga não vê a mudança de schema
+        db.engine.dispose()
+        planos = {indice: explain(sql) for _, indice, sql in queries}
+        db.session.rollback()
+    return planos
+
+
+@pytest.fixture
+def schema_baseline(app):
+    """Volta o schema para antes das migrações de índice e restaura o head no final"""
+    with app.app_context():
+        flask_migrate.downgrade(revision=BASELINE)
+    yield
+    with app.app_context():
+        flask_migrate.upgrade()
+
+
+@pytest.mark.parametrize('nome, indice, sql', HOT_QUERIES, ids=[q[1] for q in HOT_QUERIES])
+def test_consulta_quente_usa_indice(app, nome, indice, sql):
+    assert indice in _planos(app)[indice]
+
+
+def test_migracoes_criam_os_indices(app, schema_baseline):
+    antes = _planos(app, QUERIES_DO_BASELINE)
+    for _, indice, _ in QUERIES_DO_BASELINE:
+        assert indice not in antes[indice]
+        assert 'SCAN' in antes[indice]
+
+    with app.app_context():
+        flask_migrate.upgrade()
+    depois = _planos(app, QUERIES_DO_BASELINE)
+    for _, indice, _ in QUERIES_DO_BASELINE:
+        assert indice in depois[indice]
@@ -0,0 +1,37 @@
+import requests
+
+import musica.musica_services.search_music_by_url.search_music_by_url as search_music_by_url
+from musica.musica_services.search_music_by_url.scrape_timings import ScrapeTimings
+
+HTML = (
+    '<html><head><meta charset="utf-8"><title>Asa Branca - Luiz Gonzaga - Cifra Club</title></head>'
+    '<body><div class="cifra_cnt">G D\nQuando olhei a terra ardendo, qual fogueira de São João,\n'
+    'eu perguntei a Deus do céu, ai, por que tamanha judiação</div></body></html>'
+)
+
+
+def _resposta(content_type):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = HTML.encode('utf-8')
+    response.headers['Content-Type'] = content_type
+    # Como o adapter do requests: text/* sem charset vira ISO-8859-1
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+def test_html_sem_charset_no_cabecalho_mantem_os_acentos(monkeypatch):
+    monkeypatch.setattr(search_music_by_url._http_session, 'get', lambda *a, **k: _resposta('text/html'))
+
+    resultado, response = search_music_by_url._extract_with_http('https://x/y/', None, ScrapeTimings())
+    assert 'São João' in resultado['cifra']
+    assert 'judiação' in response.text
+
+
+def test_charset_do_cabecalho_e_respeitado(monkeypatch):
+    monkeypatch.setattr(
+        search_music_by_url._http_session, 'get', lambda *a, **k: _resposta('text/html; charset=utf-8')
+    )
+
+    resultado, _ = search_music_by_url._extract_with_http('https://x/y/', None, ScrapeTimings())
+    assert 'São João' in resultado['cifra']
@@ -0,0 +1,42 @@
+import os
+import sys
+
+from app import app, db
+from musica.musica_model.cifra_dictionary import CIFRA_DICTIONARIES, dictionary_path
+from musica.musica_model.musica_model import Musica
+from sqlalchemy import func
+from utils.compressed_text.compressed_text import zstandard
+
+# 32 KiB: o zlib só enxerga a janela final de 32 KiB do dicionário
+DICTIONARY_SIZE = int(os.getenv('CIFRA_DICTIONARY_SIZE', str(32 * 1024)))
+SAMPLE_SIZE = 2000
+
+
+def train(cifras, size=DICTIONARY_SIZE) -> bytes:
+    """Train a zstd dictionary on the given cifras"""
+    return zstandard.train_dictionary(size, [cifra.encode('utf-8') for cifra in cifras]).as_bytes()
+
+
+# Treina um dicionário com uma amostra aleatória das cifras do banco e grava o próximo id em
+# musica/musica_model/cifra_dictionaries; as gravações passam a usá-lo depois do deploy
+if __name__ == '__main__':
+    if zstandard is None:
+        raise SystemExit("O treino usa o pacote zstandard (pip install -r requirements.txt)")
+    limite = int(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE_SIZE
+    with app.app_context():
+        cifras = [
+            cifra for (cifra,) in db.session.query(Musica.cifra).filter(
+                Musica.cifra.isnot(None)
+            ).order_by(func.random()).limit(limite)
+        ]
+    if not cifras:
+        raise SystemExit("Nenhuma cifra cadastrada para treinar o dicionário")
+
+    novo_id = max(CIFRA_DICTIONARIES) + 1
+    if novo_id > 255:
+        raise SystemExit("O cabeçalho da cifra guarda o id do dicionário em um byte (máximo 255)")
+    dictionary = train(cifras)
+    with open(dictionary_path(novo_id), 'wb') as arquivo:
+        arquivo.write(dictionary)
+    print(f"Dicionário {novo_id} treinado com {len(cifras)} cifras ({len(dictionary)} bytes): {dictionary_path(novo_id)}")
+    print("Confira com python benchmark_cifra_compression.py e faça commit do arquivo")
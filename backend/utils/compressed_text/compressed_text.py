@@ -0,0 +1,131 @@
+import os
+import zlib
+from typing import Dict, Optional, Union
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional; sem o pacote, zlib é usado
+    zstandard = None
+
+# Primeiro byte de cada valor: indica como o restante foi gravado
+CODEC_RAW = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+CODECS = {'none': CODEC_RAW, 'zlib': CODEC_ZLIB, 'zstd': CODEC_ZSTD}
+
+# Textos curtos não compensam o custo de compressão
+MIN_COMPRESS_BYTES = 64
+
+
+def _zstd_dict(dictionary: bytes):
+    # Treinado (train_dictionary) ou só conteúdo bruto: o zstd reconhece pelo número mágico
+    return zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_AUTO)
+
+
+def encode_text(
+    value: str,
+    codec: str = 'none',
+    level: Optional[int] = None,
+    dictionary: bytes = b'',
+    dictionary_id: int = 0
+) -> bytes:
+    """Serializa o texto como [codec][id do dicionário][dados] (ou [0][utf-8] sem compressão)"""
+    data = value.encode('utf-8')
+    if codec == 'none' or len(data) < MIN_COMPRESS_BYTES:
+        return bytes([CODEC_RAW]) + data
+
+    if codec == 'zstd':
+        compressor = zstandard.ZstdCompressor(
+            level=level or 3, dict_data=_zstd_dict(dictionary) if dictionary else None
+        )
+        return bytes([CODEC_ZSTD, dictionary_id]) + compressor.compress(data)
+
+    if dictionary:
+        compressor = zlib.compressobj(level if level is not None else 6, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level if level is not None else 6)
+    return bytes([CODEC_ZLIB, dictionary_id]) + compressor.compress(data) + compressor.flush()
+
+
+def decode_text(value: Union[bytes, str], dictionaries: Optional[Dict[int, bytes]] = None) -> str:
+    """Inverso de encode_text; valores ainda em texto (coluna não migrada) passam direto"""
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value:
+        return ''
+
+    codec = value[0]
+    if codec == CODEC_RAW:
+        return value[1:].decode('utf-8')
+
+    dictionary = (dictionaries or {}).get(value[1], b'') if value[1] else b''
+    if value[1] and not dictionary:
+        raise ValueError(f"Dicionário de compressão {value[1]} não encontrado")
+
+    if codec == CODEC_ZLIB:
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return (decompressor.decompress(value[2:]) + decompressor.flush()).decode('utf-8')
+
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("Valor comprimido com zstd, mas o pacote zstandard não está instalado")
+        decompressor = zstandard.ZstdDecompressor(dict_data=_zstd_dict(dictionary) if dictionary else None)
+        return decompressor.decompress(value[2:]).decode('utf-8')
+
+    raise ValueError(f"Codec de compressão desconhecido: {codec}")
+
+
+def codec_from_env(env_var: str) -> str:
+    codec = os.getenv(env_var, 'none').lower()
+    if codec not in CODECS:
+        raise ValueError(f"{env_var} deve ser um de: {', '.join(CODECS)}")
+    if codec == 'zstd' and zstandard is None:
+        print(f"{env_var}=zstd, mas o pacote zstandard não está instalado; usando zlib")
+        return 'zlib'
+    return codec
+
+
+class CompressedText(TypeDecorator):
+    """Texto gravado como binário, comprimido na escrita e descomprimido na leitura
+
+    Para o código da aplicação a coluna continua sendo um str. O codec de escrita é
+    configurável; a leitura entende qualquer codec, então linhas antigas continuam válidas
+    quando o codec muda.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(
+        self,
+        codec: str = 'none',
+        level: Optional[int] = None,
+        dictionaries: Optional[Dict[int, bytes]] = None,
+        dictionary_id: int = 0
+    ):
+        super().__init__()
+        self.codec = codec
+        self.level = level
+        # Tupla (hashable) porque os argumentos do tipo fazem parte da chave do cache de SQL
+        self.dictionaries = tuple(sorted((dictionaries or {}).items()))
+        self.dictionary_id = dictionary_id
+        self._dictionary_lookup = dict(self.dictionaries)
+
+    def encode(self, value: str) -> bytes:
+        return encode_text(
+            value, self.codec, self.level, self._dictionary_lookup.get(self.dictionary_id, b''), self.dictionary_id
+        )
+
+    def decode(self, value: Union[bytes, str]) -> str:
+        return decode_text(value, self._dictionary_lookup)
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else self.encode(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.decode(value)
@@ -0,0 +1,64 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Optional
+
+from flask import Response, current_app, request
+from werkzeug.http import is_resource_modified
+
+# Codificações que ganham um sufixo no ETag: cada representação comprimida tem o seu
+ETAG_ENCODINGS = ('gzip', 'br')
+
+
+def build_etag(*parts: Any) -> str:
+    """ETag forte a partir da versão do recurso e dos parâmetros que mudam a representação"""
+    variante = sorted(request.args.items(multi=True))
+    raw = '|'.join(str(part) for part in parts) + '|' + repr(variante)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    return f'{etag}-{encoding}'
+
+
+def _base_etag(tag: str) -> str:
+    for encoding in ETAG_ENCODINGS:
+        if tag.endswith(f'-{encoding}'):
+            return tag[:-len(encoding) - 1]
+    return tag
+
+
+def _matching_tag(etag: str) -> Optional[str]:
+    """Tag de If-None-Match que corresponde ao recurso, em qualquer uma das codificações"""
+    if request.if_none_match.star_tag:
+        return etag
+    for tag in request.if_none_match.as_set(include_weak=True):
+        if _base_etag(tag) == etag:
+            return tag
+    return None
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """Resposta 304 quando If-None-Match/If-Modified-Since ainda valem; None caso contrário
+
+    Chamado antes de carregar e serializar o recurso, usando só a consulta de versão.
+    If-None-Match tem precedência sobre If-Modified-Since.
+    """
+    if request.if_none_match:
+        tag = _matching_tag(etag)
+        if tag is None:
+            return None
+    elif last_modified is None or is_resource_modified(request.environ, last_modified=last_modified):
+        return None
+    else:
+        tag = etag
+    # Devolve a tag que o cliente já tem, inclusive o sufixo da codificação
+    return add_validators(current_app.response_class(status=304), tag, last_modified)
+
+
+def add_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # O navegador pode guardar a resposta, mas precisa revalidar antes de reutilizá-la
+    response.cache_control.no_cache = True
+    return response
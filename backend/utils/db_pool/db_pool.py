@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mede quanto tempo cada checkout esperou por uma conexão livre"""
+
+    # O QueuePool.recreate (chamado pelo engine após erros de conexão) instancia self.__class__ com a
+    # mesma configuração e os mesmos listeners; as métricas recomeçam no pool novo
+    def __init__(self, creator, pool_size: int = 5, max_overflow: int = 10, **kwargs):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._stats_lock:
+                self._checkouts += 1
+                self._wait_total += espera
+                self._wait_max = max(self._wait_max, espera)
+
+    def wait_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'wait_total_ms': round(self._wait_total * 1000, 3),
+                'wait_avg_ms': round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 3)
+            }
+
+
+def engine_options_from_env(database_url: str) -> Dict[str, Any]:
+    """Opções do create_engine lidas das variáveis DB_POOL_* e DB_STATEMENT_TIMEOUT_MS"""
+    options: Dict[str, Any] = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', 'true'),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    }
+
+    # SQLite em memória usa um pool próprio; os demais bancos usam o QueuePool instrumentado
+    if database_url.rstrip('/') not in ('sqlite:', 'sqlite:/:memory:'):
+        options.update({
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+            'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        })
+
+    statement_timeout_ms = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))
+    if statement_timeout_ms > 0 and database_url.startswith('postgresql'):
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout_ms}'}
+
+    return options
+
+
+def pool_stats(engine) -> Dict[str, Any]:
+    """Fotografia do pool: conexões em uso, overflow e tempo de espera nos checkouts"""
+    pool = engine.pool
+    stats: Dict[str, Any] = {'pool_class': type(pool).__name__, 'status': pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'timeout': pool.timeout()
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats['max_overflow'] = pool.max_overflow
+        stats.update(pool.wait_stats())
+    return stats
@@ -0,0 +1,80 @@
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Optional
+
+from flask import Response, current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele, o json da stdlib é usado
+    orjson = None
+
+
+class IsoDefaultJSONProvider(DefaultJSONProvider):
+    """Provider da stdlib que serializa datas em ISO 8601, no mesmo formato do orjson"""
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
+class OrjsonProvider(IsoDefaultJSONProvider):
+    """Provider baseado no orjson; datetime, date e UUID são serializados nativamente"""
+
+    option = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=IsoDefaultJSONProvider.default, option=self.option)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # Evita a ida e volta bytes -> str -> bytes do provider padrão
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def json_provider_class_from_env() -> type:
+    """JSON_PROVIDER=auto (orjson se instalado), orjson ou stdlib"""
+    escolha = os.getenv('JSON_PROVIDER', 'auto').lower()
+    if escolha == 'stdlib':
+        return IsoDefaultJSONProvider
+    if orjson is None:
+        if escolha == 'orjson':
+            print("JSON_PROVIDER=orjson, mas o pacote orjson não está instalado; usando a stdlib")
+        return IsoDefaultJSONProvider
+    return OrjsonProvider
+
+
+def stream_json_array(key: str, items: Iterable[Any], serialize: Callable[[Any], Any]) -> Response:
+    """Responde {"<key>": [...]} gerando um elemento por vez, sem montar a lista em memória"""
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '{' + dumps(key) + ':['
+        for index, item in enumerate(items):
+            yield (',' if index else '') + dumps(serialize(item))
+        yield ']}\n'
+
+    return Response(stream_with_context(generate()), mimetype=current_app.json.mimetype)
+
+
+def stream_ndjson(records: Iterable[Any], filename: Optional[str] = None) -> Response:
+    """Responde um objeto JSON por linha (NDJSON), gerado à medida que os registros são lidos"""
+    dumps = current_app.json.dumps
+
+    def generate():
+        for record in records:
+            yield dumps(record) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if filename:
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy import DateTime, tuple_
+
+
+class KeysetPage:
+    """Página de resultados paginada por cursor (keyset)"""
+
+    def __init__(self, items: List[Any], per_page: int, next_cursor: Optional[str], total: Optional[int]):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self.total = total
+
+    def pagination_dict(self) -> dict:
+        pagination = {
+            'per_page': self.per_page,
+            'next_cursor': self.next_cursor,
+            'has_next': self.has_next
+        }
+        if self.total is not None:
+            pagination['total'] = self.total
+        return pagination
+
+
+def encode_cursor(values: List[Any]) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, columns: List[Any]) -> Optional[List[Any]]:
+    """Decodifica o cursor opaco; cursor vazio significa a primeira página"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [
+            datetime.fromisoformat(v) if isinstance(column.type, DateTime) and v is not None else v
+            for v, column in zip(values, columns)
+        ]
+    except (ValueError, TypeError):
+        raise Exception("Cursor inválido")
+
+
+def paginate_keyset(
+    query: Any,
+    order_by: List[Tuple[Any, bool]],
+    cursor: Optional[str],
+    per_page: int,
+    row_key: Callable[[Any], List[Any]],
+    include_total: bool = False
+) -> KeysetPage:
+    """Pagina `query` pela chave `order_by` ([(coluna, descendente)], todas na mesma direção)
+
+    Não usa OFFSET, então o custo de cada página é constante; o COUNT(*) só roda com include_total.
+    """
+    columns = [column for column, _ in order_by]
+    descending = order_by[0][1]
+    per_page = max(1, per_page)
+
+    total = query.order_by(None).count() if include_total else None
+
+    after = decode_cursor(cursor, columns)
+    if after is not None:
+        chave = tuple_(*columns)
+        query = query.filter(chave < tuple_(*after) if descending else chave > tuple_(*after))
+
+    query = query.order_by(*[column.desc() if desc else column.asc() for column, desc in order_by])
+    rows = query.limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(row_key(rows[-1]))
+
+    return KeysetPage(rows, per_page, next_cursor, total)
@@ -0,0 +1,126 @@
+import gzip
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import Flask, Response, current_app, request
+
+from utils.conditional_get.conditional_get import encoded_etag
+from utils.lru_cache.lru_cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional; sem o pacote, só gzip é oferecido
+    brotli = None
+
+# Respostas menores que isso não compensam o custo de compressão
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '500'))
+RESPONSE_COMPRESSION_GZIP_LEVEL = int(os.getenv('RESPONSE_COMPRESSION_GZIP_LEVEL', '6'))
+RESPONSE_COMPRESSION_BROTLI_QUALITY = int(os.getenv('RESPONSE_COMPRESSION_BROTLI_QUALITY', '5'))
+# Corpos comprimidos guardados por (ETag, codificação); 0 desliga o cache
+RESPONSE_COMPRESSION_CACHE_ENTRIES = int(os.getenv('RESPONSE_COMPRESSION_CACHE_ENTRIES', '256'))
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/csv', 'application/x-ndjson')
+
+# (ETag, codificação) -> (corpo, mimetype): cada versão de um recurso é comprimida uma única vez
+compressed_body_cache = LRUCache(RESPONSE_COMPRESSION_CACHE_ENTRIES)
+
+
+def negotiate_encoding() -> Optional[str]:
+    """Codificação escolhida pelo Accept-Encoding: br (se instalado) antes de gzip"""
+    accept = request.accept_encodings
+    candidatas = (['br'] if brotli is not None else []) + ['gzip']
+    melhor = accept.best_match(candidatas)
+    if melhor is None or accept.quality(melhor) <= 0:
+        return None
+    return melhor
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=RESPONSE_COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=RESPONSE_COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Comprime um corpo em streaming, liberando cada pedaço assim que ele é gerado"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=RESPONSE_COMPRESSION_BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(RESPONSE_COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _encode(response: Response, encoding: str) -> Response:
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak and not etag.endswith(f'-{encoding}'):
+        response.set_etag(encoded_etag(etag, encoding))
+    return response
+
+
+def cached_response(etag: str) -> Optional[Response]:
+    """Resposta pronta com o corpo já comprimido desta versão, sem carregar nem serializar nada"""
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return None
+    entry = compressed_body_cache.get((etag, encoding))
+    if entry is None:
+        return None
+    body, mimetype = entry
+    response = current_app.response_class(body, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    return _encode(response, encoding)
+
+
+def compress_response(response: Response) -> Response:
+    """after_request: comprime respostas 2xx de texto/JSON conforme o Accept-Encoding"""
+    if not 200 <= response.status_code < 300 or response.status_code == 204 or response.direct_passthrough:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if 'Content-Encoding' in response.headers:
+        # Veio de cached_response: só falta o sufixo no ETag definido depois pelo controller
+        return _encode(response, response.headers['Content-Encoding'])
+
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+        return _encode(response, encoding)
+
+    data = response.get_data()
+    if len(data) < RESPONSE_COMPRESSION_MIN_BYTES:
+        return response
+
+    # Com ETag forte o corpo identifica uma versão imutável: comprime uma vez e reaproveita
+    etag, weak = response.get_etag()
+    key = (etag, encoding) if etag and not weak else None
+    entry = compressed_body_cache.get(key) if key else None
+    if entry is not None:
+        body = entry[0]
+    else:
+        body = compress(data, encoding)
+        if key:
+            compressed_body_cache.put(key, (body, response.mimetype))
+
+    response.set_data(body)
+    return _encode(response, encoding)
+
+
+def init_response_compression(app: Flask) -> None:
+    """Liga a compressão das respostas (RESPONSE_COMPRESSION=false desliga)"""
+    if os.getenv('RESPONSE_COMPRESSION', 'true').lower() != 'true':
+        return
+    app.after_request(compress_response)
@@ -0,0 +1,20 @@
+from typing import Iterable, List, Optional
+
+
+def parse_fields(raw: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Lê o parâmetro fields= (nomes separados por vírgula); None quando ausente, ou seja, todos os campos"""
+    if raw is None:
+        return None
+
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    invalidos = [field for field in fields if field not in allowed]
+    if invalidos:
+        raise Exception(f"Campos inválidos em fields: {', '.join(invalidos)}")
+    return fields
+
+
+def select_fields(data: dict, fields: Optional[List[str]]) -> dict:
+    """Mantém apenas os campos pedidos; o id é sempre devolvido"""
+    if fields is None:
+        return data
+    return {key: value for key, value in data.items() if key == 'id' or key in fields}
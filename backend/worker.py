@@ -0,0 +1,18 @@
+from app import app
+from import_job.import_job_services.import_job_services import ImportJobService
+import os
+import time
+from dotenv import load_dotenv
+load_dotenv()
+
+POLL_INTERVAL = float(os.getenv("IMPORT_JOBS_POLL_INTERVAL", "1"))
+
+# Worker separado para os jobs de importação (use com IMPORT_JOBS_MODE=process na API)
+if __name__ == '__main__':
+    print("Iniciando o worker de importação... Potpourri Music API")
+    with app.app_context():
+        while True:
+            if not ImportJobService.run_next_queued():
+                # Fila vazia: aproveita para resgatar jobs cujo worker parou de renovar o lease
+                ImportJobService.requeue_expired_jobs()
+                time.sleep(POLL_INTERVAL)
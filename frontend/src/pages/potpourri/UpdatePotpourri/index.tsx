@@ -96,7 +96,8 @@ export const UpdatePotpourri: React.FC = () => {
       // Convert API response with details to our simplified selectedMusics structure
       const items: MusicaPotpourri[] = potpourriMusics.musicas_potpourri
         .sort((a, b) => a.ordem_tocagem - b.ordem_tocagem)
-        .map((item) => ({ musica_id: item.musica_id, ordem_tocagem: item.ordem_tocagem }));
+        // Posições 1..n, as mesmas que handleAddMusic e a reordenação usam
+        .map((item, index) => ({ musica_id: item.musica_id, ordem_tocagem: index + 1 }));
       setSelectedMusics(items);
 
       // Populate music cache with names from response
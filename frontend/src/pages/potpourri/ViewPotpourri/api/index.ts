@@ -1,9 +1,9 @@
 import { api } from "../../../../services/endpoint";
-import type { ViewPotpourriResponse } from "../../../../types/potpourri";
+import type { PotpourriSetlistResponse } from "../../../../types/potpourri";
 
-export const getPotpourriMusics = async (potpourriId: number, page: number = 1, perPage: number = 50): Promise<ViewPotpourriResponse> => {
-  const response = await api.get(`/musicas-potpourri/by-potpourri/${potpourriId}`, {
-    params: { page, per_page: perPage }
+export const getPotpourriSetlist = async (potpourriId: number): Promise<PotpourriSetlistResponse> => {
+  const response = await api.get(`/potpourri/${potpourriId}/setlist`, {
+    params: { format: "structured" }
   });
   return response.data;
 };
@@ -1,7 +1,7 @@
 import { useQuery } from "@tanstack/react-query";
 import React, { useState, useCallback, useEffect } from "react";
 import { useParams, useNavigate } from "react-router-dom";
-import { getPotpourriMusics } from "./api";
+import { getPotpourriSetlist } from "./api";
 import {
   Card,
   CardHeader,
@@ -9,6 +9,7 @@ import {
   CardContent,
 } from "../../../components/ui/card";
 import { FloatingControls } from "../../../components/FloatingControls";
+import type { CifraEstruturada } from "../../../types/potpourri";
 
 export const ViewPotpourri: React.FC = () => {
   const { id } = useParams();
@@ -21,50 +22,39 @@ export const ViewPotpourri: React.FC = () => {
 
   const { data, isLoading, error } = useQuery({
     queryKey: ["potpourri", id],
-    queryFn: () => getPotpourriMusics(Number(id)),
+    queryFn: () => getPotpourriSetlist(Number(id)),
   });
 
   const potpourri = data?.musicas_potpourri;
-  const processarLinha = (linha: string) => {
-    // Regex para identificar cifras musicais
-    const regexCifra =
-      /\b([A-G][#b]?(?:m|maj|dim|aug|sus|7M|°)?[0-9]*(?:\/[A-G][#b]?)?)\b/g;
-
-    const partes = [];
-    let ultimoIndex = 0;
-    let match;
-
-    while ((match = regexCifra.exec(linha)) !== null) {
-      // Adiciona o texto antes da cifra
-      if (match.index > ultimoIndex) {
+  // A cifra chega já analisada: cada acorde traz a coluna, sem regex no cliente
+  const renderizarCifra = (cifra: CifraEstruturada | null) => {
+    if (!cifra) return null;
+
+    return cifra.linhas.map((linha, indiceLinha) => {
+      if (linha.tipo !== "acordes" || !linha.acordes) {
+        return <React.Fragment key={indiceLinha}>{linha.texto + "\n"}</React.Fragment>;
+      }
+
+      const partes = [];
+      let ultimoIndex = 0;
+      for (const { acorde, coluna } of linha.acordes) {
+        if (coluna > ultimoIndex) {
+          partes.push(linha.texto.substring(ultimoIndex, coluna));
+        }
         partes.push(
-          <span key={`text-${ultimoIndex}`}>
-            {linha.substring(ultimoIndex, match.index)}
+          <span
+            key={`cifra-${coluna}`}
+            style={{ color: "#2563eb", fontWeight: "bolder" }}
+          >
+            {acorde}
           </span>
         );
+        ultimoIndex = coluna + acorde.length;
       }
+      partes.push(linha.texto.substring(ultimoIndex) + "\n");
 
-      // Adiciona a cifra colorida
-      partes.push(
-        <span
-          key={`cifra-${match.index}`}
-          style={{ color: "#2563eb", fontWeight: "bolder" }}
-        >
-          {match[0]}
-        </span>
-      );
-
-      ultimoIndex = match.index + match[0].length;
-    }
-
-    // Adiciona o texto restante após a última cifra
-    if (ultimoIndex < linha.length) {
-      partes.push(
-        <span key={`text-${ultimoIndex}`}>{linha.substring(ultimoIndex)}</span>
-      );
-    }
-
-    return partes.length > 0 ? partes : linha;
+      return <React.Fragment key={indiceLinha}>{partes}</React.Fragment>;
+    });
   };
 
   // Função para iniciar o scroll automático
@@ -156,7 +146,7 @@ export const ViewPotpourri: React.FC = () => {
                 <div>
                   <strong>Cifra:</strong>
                   <pre className="font-mono text-[13px] bg-gray-50 py-4 rounded-md mt-2 whitespace-pre-wrap">
-                    {processarLinha(music.musica.cifra)}
+                    {renderizarCifra(music.musica.cifra_estruturada)}
                   </pre>
                 </div>
               </div>
@@ -68,3 +68,34 @@ export interface ViewPotpourriResponse {
   };
   potpourri_id: number;
 }
+
+// Cifra já analisada pelo servidor (?format=structured): acordes com a coluna em que aparecem
+export interface AcordeCifra {
+  acorde: string;
+  coluna: number;
+}
+
+export interface LinhaCifra {
+  tipo: "vazia" | "secao" | "acordes" | "letra";
+  texto: string;
+  secao?: string;
+  acordes?: AcordeCifra[];
+}
+
+export interface CifraEstruturada {
+  versao: number;
+  secoes: { nome: string; linha: number }[];
+  linhas: LinhaCifra[];
+}
+
+export interface MusicaPotpourriSetlist extends Omit<MusicaPotpourriWithDetails, "musica"> {
+  musica: Omit<MusicaPotpourriWithDetails["musica"], "cifra"> & {
+    cifra_estruturada: CifraEstruturada | null;
+  };
+}
+
+export interface PotpourriSetlistResponse {
+  potpourri: Potpourri;
+  musicas_potpourri: MusicaPotpourriSetlist[];
+  total: number;
+}